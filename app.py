@@ -1,15 +1,46 @@
 import streamlit as st
 import os
-import time
+from collections import deque
 from dotenv import load_dotenv
-from src.scraper import scrape_able_website, get_fallback_data
-from src.data_processor import process_scraped_data
-from src.embeddings import create_vector_store
+from src.data_processor import PROCESSED_DATA_FILE, processed_data_is_current
+from src.embeddings import (MANIFEST_FILE, VECTOR_STORE_DIR, SharedVectorStore, migrate_pickle_store,
+                            resolve_vector_store)
+from src.ingestion import get_ingestion_worker
 from src.chatbot import AbleSupportChatbot
+from src.session_store import get_session_store
 
 # Load environment variables
 load_dotenv()
 
+# Retrieval settings: up to 3 diverse chunks, dropping ones unrelated to the question
+SEARCH_KWARGS = {"k": 3, "mmr": True, "min_score": 0.2}
+
+# Messages shown on screen per session; older ones scroll off (the model's memory is kept separately)
+MAX_DISPLAY_MESSAGES = 100
+
+@st.cache_resource
+def get_shared_vector_store() -> SharedVectorStore:
+    """Load the vector store once per process; every session searches this one copy"""
+    manifest_file = os.path.join(resolve_vector_store(VECTOR_STORE_DIR), MANIFEST_FILE)
+    if not os.path.exists(manifest_file):
+        migrate_pickle_store()
+    
+    shared_store = SharedVectorStore()
+    
+    # Build or refresh the store in the background; sessions use the current one meanwhile
+    worker = get_ingestion_worker()
+    worker.on_swap = lambda: shared_store.reload()
+    if not os.path.exists(manifest_file):
+        # Use fallback data for first-time use
+        worker.submit("fallback")
+    elif os.path.exists(PROCESSED_DATA_FILE) and (
+            os.path.getmtime(PROCESSED_DATA_FILE) > os.path.getmtime(manifest_file)
+            or not processed_data_is_current(PROCESSED_DATA_FILE)):
+        # Newer processed data, or data chunked with another tokenizer, is (re-chunked and) re-indexed
+        worker.submit("processed")
+    
+    return shared_store
+
 # Set page config
 st.set_page_config(
     page_title="Able Support Chatbot",
@@ -83,58 +114,37 @@ with st.sidebar:
         ["Use fallback data (quick start)", "Scrape Able website (takes longer)"]
     )
     
-    # Initialize or refresh data button
+    # Initialize or refresh data button: ingestion runs in the background and the new
+    # store is swapped in for every session once it is complete
+    get_shared_vector_store()
+    worker = get_ingestion_worker()
     if st.button("Initialize/Refresh Data"):
-        with st.spinner("Preparing data..."):
-            if "Use fallback" in data_option:
-                st.session_state.data_status = "Using fallback data..."
-                get_fallback_data()
-            else:
-                st.session_state.data_status = "Scraping Able website..."
-                try:
-                    scrape_able_website()
-                except Exception as e:
-                    st.error(f"Error scraping website: {e}")
-                    st.session_state.data_status = "Falling back to pre-defined data..."
-                    get_fallback_data()
-            
-            st.session_state.data_status = "Processing data..."
-            process_scraped_data()
-            
-            st.session_state.data_status = "Creating vector embeddings..."
-            st.session_state.vector_store = create_vector_store()
-            
-            st.session_state.data_status = "Done! Chatbot ready."
-            st.session_state.chatbot = AbleSupportChatbot(
-                retriever=st.session_state.vector_store.as_retriever(search_kwargs={"k": 3})
-            )
+        worker.submit("fallback" if "Use fallback" in data_option else "scrape")
     
-    if 'data_status' in st.session_state:
-        st.write(st.session_state.data_status)
+    job = worker.latest()
+    if job:
+        st.progress(job.progress, text=job.message)
+        if job.error:
+            st.error(job.error)
+        if job.warning:
+            st.warning(job.warning)
+        if not job.done:
+            col1, col2 = st.columns(2)
+            col1.button("Refresh status")
+            if col2.button("Cancel"):
+                worker.cancel(job.id)
 
-# Initialize session state for chat history
+# Initialize session state for the displayed chat history, separate from what the model remembers
 if "messages" not in st.session_state:
-    st.session_state.messages = []
+    st.session_state.messages = deque(maxlen=MAX_DISPLAY_MESSAGES)
 
-# Initialize session state for chatbot
+# Initialize session state for chatbot: the conversation memory lives in the shared session store
+# (bounded, spilling idle sessions to disk) and the store and retriever are shared by all sessions
 if "chatbot" not in st.session_state:
-    # Check if we have vectorstore and processed data
-    if os.path.exists("data/vector_store.pkl"):
-        # Load existing vector store
-        vector_store = create_vector_store()
-        st.session_state.vector_store = vector_store
-        st.session_state.chatbot = AbleSupportChatbot(
-            retriever=vector_store.as_retriever(search_kwargs={"k": 3})
-        )
-    else:
-        # Use fallback data for first-time use
-        get_fallback_data()
-        process_scraped_data()
-        vector_store = create_vector_store()
-        st.session_state.vector_store = vector_store
-        st.session_state.chatbot = AbleSupportChatbot(
-            retriever=vector_store.as_retriever(search_kwargs={"k": 3})
-        )
+    st.session_state.chatbot = AbleSupportChatbot(
+        retriever=get_shared_vector_store().as_retriever(search_kwargs=SEARCH_KWARGS),
+        session_store=get_session_store()
+    )
 
 # Main chat interface
 st.title("Able Support Chatbot")
@@ -154,27 +164,9 @@ if prompt := st.chat_input("What would you like to know about Able?"):
     with st.chat_message("user"):
         st.markdown(prompt)
     
-    # Generate and display assistant response
+    # Generate and display assistant response as tokens arrive
     with st.chat_message("assistant"):
-        message_placeholder = st.empty()
-        
-        # Show thinking animation
-        thinking_msgs = ["Thinking.", "Thinking..", "Thinking..."]
-        for i in range(3):
-            message_placeholder.markdown(thinking_msgs[i])
-            time.sleep(0.3)
-        
-        # Get response from chatbot
-        response = st.session_state.chatbot.get_response(prompt)
-        
-        # Display response with typing effect
-        full_response = ""
-        for chunk in response.split():
-            full_response += chunk + " "
-            message_placeholder.markdown(full_response + "▌")
-            time.sleep(0.05)
-        
-        message_placeholder.markdown(full_response)
+        response = st.write_stream(st.session_state.chatbot.stream_response(prompt))
     
     # Add assistant response to chat history
     st.session_state.messages.append({"role": "assistant", "content": response})
@@ -1,8 +1,16 @@
-import os
+import hashlib
 import json
-from typing import List, Dict, Any, Optional
-import requests
+import os
+import uuid
+import zlib
+from collections import deque
+from typing import Callable, Deque, Hashable, Iterator, List, Dict, Any, Optional
 from dotenv import load_dotenv
+from .openai_client import get_client
+from .lexical import LocalAnswerEngine, get_local_engine
+from .response_cache import ResponseCache, get_response_cache
+from .session_store import SessionStore
+from .tokens import count_tokens
 
 # Load environment variables from .env file
 load_dotenv()
@@ -10,11 +18,18 @@ load_dotenv()
 # Get OpenAI API key from environment
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# Tokens the chat format adds around every message (role, separators)
+MESSAGE_TOKEN_OVERHEAD = 4
+
 class Message:
     """Represents a message in a conversation"""
-    def __init__(self, role: str, content: str):
+    __slots__ = ("role", "content", "tokens")
+    
+    def __init__(self, role: str, content: str, tokens: Optional[int] = None):
         self.role = role
         self.content = content
+        # Counted once, since the message is re-sent on every later turn
+        self.tokens = tokens if tokens is not None else count_tokens(content) + MESSAGE_TOKEN_OVERHEAD
     
     def to_dict(self) -> Dict[str, str]:
         """Convert message to dictionary format for OpenAI API"""
@@ -24,55 +39,240 @@ class Message:
         }
 
 class ConversationMemory:
-    """Manages conversation history"""
-    def __init__(self, max_tokens: int = 4000):
-        self.messages: List[Message] = []
+    """
+    Manages conversation history within a token budget. When the history grows
+    past max_tokens, the oldest messages are evicted and folded into a rolling
+    summary of at most summary_tokens, which is sent ahead of the remaining turns.
+    By default the summary keeps the user's earlier questions; pass a summarizer
+    (previous summary, evicted messages) -> new summary to use e.g. an LLM instead.
+    """
+    def __init__(self, max_tokens: int = 4000, summary_tokens: int = 400,
+                 summarizer: Optional[Callable[[str, List[Message]], str]] = None):
+        self.messages: Deque[Message] = deque()
         self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+        self.summarizer = summarizer
+        self.summary: Optional[Message] = None
+        # Running total of the tokens in messages and summary
+        self.total_tokens = 0
+        self._summary_lines: Deque[str] = deque()
     
     def add_message(self, role: str, content: str):
-        """Add a message to the conversation history"""
-        self.messages.append(Message(role, content))
-        # In a more sophisticated implementation, we would track token count
-        # and trim older messages if needed to stay under max_tokens
+        """Add a message to the conversation history, evicting old turns if over budget"""
+        message = Message(role, content)
+        self.messages.append(message)
+        self.total_tokens += message.tokens
+        
+        if self.total_tokens > self.max_tokens:
+            self._evict()
+    
+    def _evict(self):
+        """Fold the oldest messages into the summary until the history fits the budget"""
+        # Always keep the latest message, even if it alone is over budget
+        while self.total_tokens > self.max_tokens and len(self.messages) > 1:
+            evicted = []
+            while self.total_tokens > self.max_tokens and len(self.messages) > 1:
+                message = self.messages.popleft()
+                self.total_tokens -= message.tokens
+                evicted.append(message)
+            # The summary may grow past the room just made; the next pass folds in more messages
+            self._set_summary(self._summarize(evicted))
+    
+    def _summarize(self, evicted: List[Message]) -> str:
+        """Merge evicted messages into the rolling summary text"""
+        previous = self.summary.content if self.summary else ""
+        if self.summarizer:
+            return self.summarizer(previous, evicted)
+        
+        for message in evicted:
+            if message.role == "user":
+                self._summary_lines.append(f"- The user asked: {message.content}")
+        
+        # Drop the oldest questions once the summary is over its own budget
+        while len(self._summary_lines) > 1 and count_tokens("\n".join(self._summary_lines)) > self.summary_tokens:
+            self._summary_lines.popleft()
+        return "\n".join(self._summary_lines)
+    
+    def _set_summary(self, text: str):
+        """Replace the summary message and update the token total"""
+        if self.summary:
+            self.total_tokens -= self.summary.tokens
+        self.summary = Message("system", f"Summary of the earlier conversation:\n{text}") if text else None
+        if self.summary:
+            self.total_tokens += self.summary.tokens
     
     def get_messages(self) -> List[Dict[str, str]]:
-        """Get all messages in the conversation history in API format"""
-        return [message.to_dict() for message in self.messages]
+        """Get the summary (if any) and the retained messages in API format"""
+        messages = [self.summary.to_dict()] if self.summary else []
+        messages.extend(message.to_dict() for message in self.messages)
+        return messages
     
     def get_chat_history(self) -> List[Dict[str, str]]:
         """Get formatted chat history for display"""
         return [{"role": msg.role, "content": msg.content} for msg in self.messages]
+    
+    def to_bytes(self) -> bytes:
+        """Serialize the history, summary and token counts as compressed JSON for a session store"""
+        state = {
+            "messages": [[message.role, message.content, message.tokens] for message in self.messages],
+            "summary": [self.summary.content, self.summary.tokens] if self.summary else None,
+            "summary_lines": list(self._summary_lines)
+        }
+        return zlib.compress(json.dumps(state, separators=(",", ":")).encode("utf-8"))
+    
+    @classmethod
+    def from_bytes(cls, data: bytes, **kwargs) -> "ConversationMemory":
+        """Restore a memory serialized with to_bytes; kwargs are passed to the constructor"""
+        state = json.loads(zlib.decompress(data))
+        memory = cls(**kwargs)
+        memory.messages.extend(Message(role, content, tokens) for role, content, tokens in state["messages"])
+        if state["summary"]:
+            memory.summary = Message("system", *state["summary"])
+        memory._summary_lines.extend(state["summary_lines"])
+        memory.total_tokens = sum(message.tokens for message in memory.messages)
+        memory.total_tokens += memory.summary.tokens if memory.summary else 0
+        if memory.total_tokens > memory.max_tokens:
+            memory._evict()
+        return memory
 
 class AbleSupportChatbot:
-    """Main chatbot class that processes queries and generates responses"""
-    def __init__(self, retriever=None):
+    """
+    Main chatbot class that processes queries and generates responses. With a
+    session_store, the conversation is loaded from the store at the start of
+    each turn and written back at the end, so the chatbot itself holds no
+    history between turns.
+    """
+    def __init__(self, retriever=None, response_cache: Optional[ResponseCache] = None,
+                 use_response_cache: bool = True, local_engine: Optional[LocalAnswerEngine] = None,
+                 fast_path_confidence: Optional[float] = None,
+                 session_store: Optional[SessionStore] = None, session_id: Optional[str] = None):
         self.retriever = retriever
-        self.memory = ConversationMemory()
+        self.session_store = session_store
+        self.session_id = session_id or uuid.uuid4().hex
+        # Only set between turns when there is no session store
+        self.memory: Optional[ConversationMemory] = None if session_store else ConversationMemory()
+        # Answers are shared across sessions, so repeat questions skip the LLM call
+        self.response_cache = (response_cache or get_response_cache()) if use_response_cache else None
+        # Local keyword/BM25 answers: the offline fallback, and optionally a pre-LLM fast path.
+        # Without an explicit engine, the shared one is looked up per use so it follows new ingestions
+        self._local_engine = local_engine
+        # Canned intent answers at or above this confidence (0-1) skip retrieval and the API; None disables
+        self.fast_path_confidence = fast_path_confidence
         
         # Check for API key
         if not OPENAI_API_KEY or OPENAI_API_KEY == "your_api_key_here":
             print("Warning: OpenAI API key not set or using default value. Set it in the .env file.")
     
+    @property
+    def local_engine(self) -> LocalAnswerEngine:
+        """The local answer engine, rebuilt by get_local_engine after each ingestion unless one was given"""
+        return self._local_engine or get_local_engine()
+    
     def get_response(self, query: str) -> str:
         """Process user query and return chatbot response"""
+        return "".join(self.stream_response(query))
+    
+    def stream_response(self, query: str) -> Iterator[str]:
+        """Process user query and yield the response text as it is generated"""
+        if self.session_store is None:
+            yield from self._respond(query)
+            return
+        
+        self.memory = self._load_memory()
+        try:
+            yield from self._respond(query)
+        finally:
+            self.session_store.put(self.session_id, self.memory.to_bytes())
+            self.memory = None
+    
+    def _load_memory(self) -> ConversationMemory:
+        """Restore this session's conversation from the session store, or start a new one"""
+        data = self.session_store.get(self.session_id)
+        return ConversationMemory.from_bytes(data) if data else ConversationMemory()
+    
+    def _respond(self, query: str) -> Iterator[str]:
+        """Answer one turn, recording the query and answer in self.memory"""
         # Add user message to memory
         self.memory.add_message("user", query)
         
+        # Answer common questions locally when the intent match is confident enough
+        if self.fast_path_confidence is not None:
+            local = self.local_engine.match(query)
+            if local and local.source == "intent" and local.confidence >= self.fast_path_confidence:
+                self.memory.add_message("assistant", local.text)
+                yield local.text
+                return
+        
+        # Embed the query once, for both retrieval and the response cache
+        vector_store = getattr(self.retriever, "vector_store", None)
+        query_vector = self._embed_query(query, vector_store)
+        
         # Retrieve relevant context if retriever is available
-        context = self._retrieve_context(query) if self.retriever else ""
+        context = self._retrieve_context(query, query_vector) if self.retriever else ""
+        
+        # Serve repeat questions from the semantic response cache
+        cache_key = self._response_cache_key(vector_store, query_vector, context)
+        if cache_key:
+            cached = self.response_cache.get(*cache_key)
+            if cached is not None:
+                self.memory.add_message("assistant", cached)
+                yield cached
+                return
         
-        # Generate response using OpenAI API with context
-        response = self._generate_response(query, context)
+        # Stream the response from the OpenAI API with context
+        parts = []
+        complete = False
+        stream = self._generate_response_stream(query, context)
+        try:
+            while True:
+                try:
+                    token = next(stream)
+                except StopIteration as stop:
+                    # The generator returns True only for a full answer from the API
+                    complete = bool(stop.value)
+                    break
+                parts.append(token)
+                yield token
+        finally:
+            stream.close()
+            # Add assistant response to memory, even if the caller stopped reading early
+            self.memory.add_message("assistant", "".join(parts))
         
-        # Add assistant response to memory
-        self.memory.add_message("assistant", response)
+        # Fallback and partial answers are never cached
+        if cache_key and complete:
+            query_vector, context_key, generation = cache_key
+            self.response_cache.put(query_vector, context_key, "".join(parts), generation)
+    
+    def _embed_query(self, query: str, vector_store) -> Optional[List[float]]:
+        """Embed the query with the store's embedding function, or return None if there is none or it fails"""
+        if vector_store is None or vector_store.embedding_function is None:
+            return None
+        try:
+            return vector_store.embedding_function.embed_query(query)
+        except Exception as e:
+            # Retrieval falls back to lexical search and the response cache is skipped
+            print(f"Error embedding query: {e}")
+            return None
+    
+    def _response_cache_key(self, vector_store, query_vector: Optional[List[float]], context: str) -> Optional[tuple]:
+        """Return (query embedding, context key, store generation) for the response cache, if usable"""
+        if self.response_cache is None or vector_store is None or query_vector is None:
+            return None
         
-        return response
+        # The answer depends on the earlier turns as well as the context, so key on both
+        history = json.dumps(self.memory.get_messages()[:-1], separators=(",", ":"))
+        context_key = hashlib.sha1(f"{history}\n{context}".encode("utf-8")).hexdigest()
+        # A rebuilt store is a new object, so include its identity as well as its generation
+        generation: Hashable = (id(vector_store), vector_store.generation)
+        return query_vector, context_key, generation
     
-    def _retrieve_context(self, query: str) -> str:
+    def _retrieve_context(self, query: str, query_vector: Optional[List[float]] = None) -> str:
         """Retrieve relevant context for the query"""
         try:
-            documents = self.retriever.get_relevant_documents(query)
+            if query_vector is not None:
+                documents = self.retriever.get_relevant_documents(query, query_vector=query_vector)
+            else:
+                documents = self.retriever.get_relevant_documents(query)
             
             # Format context from retrieved documents
             context_parts = []
@@ -87,106 +287,69 @@ class AbleSupportChatbot:
             print(f"Error retrieving context: {e}")
             return ""
     
-    def _generate_response(self, query: str, context: str) -> str:
-        """Generate a response using OpenAI API with the provided context"""
-        try:
-            # Try fallback response if:
-            # 1. No API key is set, or
-            # 2. It's the default API key, or
-            # 3. We're in test/demo mode
-            if not OPENAI_API_KEY or OPENAI_API_KEY == "your_api_key_here":
-                print("No API key set, using fallback responses")
-                return self._get_fallback_response(query)
-            
-            # Set up messages for the API
-            messages = [
-                {"role": "system", "content": f"""You are a helpful customer support chatbot for Able, a digital product agency. 
-                Answer user questions based on the following context. Be concise and accurate.
-                If you don't know the answer based on the context provided, admit that you don't know rather than making something up.
-                
-                Context about Able:
-                {context}"""}
-            ]
-            
-            # Add conversation history
-            messages.extend(self.memory.get_messages()[:-1])  # Exclude the last user message we just added
-            
-            # Add the user's current query
-            messages.append({"role": "user", "content": query})
-            
-            # Call OpenAI API
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {OPENAI_API_KEY}"
-            }
+    def _build_messages(self, query: str, context: str) -> List[Dict[str, str]]:
+        """Assemble the system prompt, conversation history and current query for the API"""
+        messages = [
+            {"role": "system", "content": f"""You are a helpful customer support chatbot for Able, a digital product agency. 
+            Answer user questions based on the following context. Be concise and accurate.
+            If you don't know the answer based on the context provided, admit that you don't know rather than making something up.
             
+            Context about Able:
+            {context}"""}
+        ]
+        
+        # Add conversation history
+        messages.extend(self.memory.get_messages()[:-1])  # Exclude the last user message we just added
+        
+        # Add the user's current query
+        messages.append({"role": "user", "content": query})
+        
+        return messages
+    
+    def _generate_response_stream(self, query: str, context: str) -> Iterator[str]:
+        """
+        Stream a response from the OpenAI API, yielding content deltas as they
+        arrive. Returns True if the whole answer came from the API.
+        """
+        # Try fallback response if:
+        # 1. No API key is set, or
+        # 2. It's the default API key, or
+        # 3. We're in test/demo mode
+        if not OPENAI_API_KEY or OPENAI_API_KEY == "your_api_key_here":
+            print("No API key set, using fallback responses")
+            yield self._get_fallback_response(query)
+            return False
+        
+        streamed_any = False
+        try:
             data = {
                 "model": "gpt-3.5-turbo",
-                "messages": messages,
+                "messages": self._build_messages(query, context),
                 "temperature": 0.2,
                 "max_tokens": 300
             }
             
-            response = requests.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers=headers,
-                json=data
-            )
-            
-            response.raise_for_status()
-            result = response.json()
-            
-            return result["choices"][0]["message"]["content"]
+            # Call OpenAI API, yielding each content delta of the event stream
+            for event in get_client(OPENAI_API_KEY).stream("/chat/completions", data):
+                choices = event.get("choices") or [{}]
+                content = choices[0].get("delta", {}).get("content")
+                if content:
+                    streamed_any = True
+                    yield content
             
+            return streamed_any
         except Exception as e:
             print(f"Error generating response: {e}")
-            return self._get_fallback_response(query)
+            # Only fall back if nothing has been shown yet; otherwise keep the partial answer
+            if not streamed_any:
+                yield self._get_fallback_response(query)
+            return False
     
     def _get_fallback_response(self, query: str) -> str:
         """Get a fallback response when API is not available"""
-        # Simple keyword matching fallback system
-        query_lower = query.lower()
-        
-        # Main company information
-        if "what does able do" in query_lower or "services" in query_lower or "what is able" in query_lower:
-            return "Able is a full-service digital product agency that partners with funded startups and established brands to build innovative, user-focused digital products. We provide end-to-end services from strategy and discovery through design, development, and growth."
-        
-        # Team information
-        elif "teams" in query_lower or "who works" in query_lower or "employees" in query_lower:
-            return "Able has multidisciplinary teams across several key areas: Product Management, Design, Engineering, and Strategy. Our teams collaborate closely with clients as true partners throughout the product development lifecycle."
-        
-        # Industry information
-        elif "industries" in query_lower or "clients" in query_lower or "sectors" in query_lower:
-            return "Able works across various industries including fintech, healthcare, education, media, retail, and enterprise software. We've built payment platforms, telemedicine solutions, learning management systems, content delivery platforms, and more."
-        
-        # Mission information
-        elif "mission" in query_lower or "values" in query_lower or "purpose" in query_lower:
-            return "Able's mission is to help organizations transform their ideas into exceptional digital products that create value for users and drive business growth. We believe in user-centered design, technical excellence, and true partnership with our clients."
-        
-        # Location information
-        elif "located" in query_lower or "location" in query_lower or "where" in query_lower or "office" in query_lower:
-            return "Able is headquartered in New York City, with team members distributed across the United States and globally. Our global presence allows us to work with clients around the world and build diverse teams with varied perspectives."
-        
-        # Website information
-        elif "website" in query_lower or "url" in query_lower or "site" in query_lower:
-            return "Able's official website is available at https://able.co. You can find more information about our services, case studies, and team there."
-        
-        # Contact information
-        elif "contact" in query_lower or "email" in query_lower or "phone" in query_lower or "reach" in query_lower:
-            return "You can contact Able through their website at https://able.co/contact. They also have a presence on social media platforms such as LinkedIn, Twitter, and Instagram."
-        
-        # Process information
-        elif "process" in query_lower or "methodology" in query_lower or "approach" in query_lower:
-            return "Able follows a collaborative, iterative approach to product development that typically includes discovery and strategy, design, engineering, testing, and deployment phases. We emphasize close client collaboration throughout the process."
-        
-        # Technology information
-        elif "technology" in query_lower or "tech stack" in query_lower or "programming" in query_lower or "languages" in query_lower:
-            return "Able's engineering teams work with various technologies including React, React Native, Node.js, Python, and more. We select the appropriate technology stack based on each project's specific requirements and client needs."
-        
-        # General fallback
-        else:
-            return "I'm the Able support chatbot. I can answer questions about Able's services, teams, industries, mission, technologies, locations, and more. How can I help you today?"
+        return self.local_engine.answer(query)
     
     def get_chat_history(self) -> List[Dict[str, str]]:
         """Get the conversation history for display"""
-        return self.memory.get_chat_history()
+        memory = self.memory if self.memory is not None else self._load_memory()
+        return memory.get_chat_history()
@@ -1,6 +1,28 @@
 import json
 import os
-from typing import List, Dict, Any
+import queue
+import re
+import sys
+import threading
+import time
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+from .tokens import get_tokenizer
+
+SCRAPED_DATA_FILE = 'data/scraped_data.json'
+FALLBACK_DATA_FILE = 'data/fallback_data.json'
+# One chunk per line, so readers and writers never hold the whole corpus
+PROCESSED_DATA_FILE = 'data/processed_data.jsonl'
+# Sidecar next to a processed data file recording how it was chunked (e.g. the tokenizer)
+PROCESSED_METADATA_SUFFIX = '.meta.json'
+
+# Characters after which a chunk may end
+SENTENCE_END = re.compile(r'[.!?\n]')
+
+# Bytes read at a time when streaming a JSON object from disk
+READ_SIZE = 1 << 16
+
+# Characters that can continue a JSON number, e.g. "1" + ".5" or "1e" + "10"
+_NUMBER_TAIL = re.compile(r'[0-9.eE+-]*')
 
 class Document:
     """Simple document class to mimic LangChain's Document structure"""
@@ -9,38 +31,97 @@ class Document:
         self.metadata = metadata or {}
 
 class TextSplitter:
-    """Simple text splitter that splits by character count"""
-    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+    """
+    Splits text into chunks of at most chunk_size tokens, with chunk_overlap
+    tokens shared between neighbouring chunks. Chunks end at a sentence
+    boundary when one falls within the last quarter of the chunk.
+    
+    Token and sentence boundaries are computed in one pass each, and every
+    cursor only moves forward, so splitting is O(n) in the text length.
+    """
+    def __init__(self, chunk_size: int = 256, chunk_overlap: int = 50, tokenizer=None):
+        if chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size")
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.boundary_window = max(1, chunk_size // 4)
+        self.tokenizer = tokenizer or get_tokenizer()
     
-    def split_text(self, text: str) -> List[str]:
-        """Split text into chunks of approximately chunk_size with overlap"""
-        if not text or len(text) <= self.chunk_size:
-            return [text] if text else []
+    def split_offsets(self, text: str) -> List[Tuple[int, int]]:
+        """Return (start, end) character offsets of each chunk, without copying the text"""
+        if not text or not text.strip():
+            return []
+        
+        starts, cumulative = self.tokenizer.pieces(text)
+        n = len(starts)
+        if n == 0 or cumulative[-1] <= self.chunk_size:
+            return [(0, len(text))]
+        
+        # Positions right after each sentence end, like the natural boundaries the chunker prefers
+        boundaries = [match.end() for match in SENTENCE_END.finditer(text)]
+        
+        def tokens_before(piece: int) -> int:
+            return cumulative[piece - 1] if piece > 0 else 0
         
-        chunks = []
-        start = 0
+        offsets = []
+        first = 0      # first piece of the current chunk
+        last = 0       # last piece that fits in the chunk budget
+        window = 0     # first piece of the lookback window for sentence boundaries
+        boundary = -1  # last sentence boundary at or before the chunk limit
+        end_piece = 0  # last piece (partly) covered by the chunk
         
-        while start < len(text):
-            # Find the end of the chunk
-            end = min(start + self.chunk_size, len(text))
+        while first < n:
+            start = starts[first] if first > 0 else 0
+            base = tokens_before(first)
             
-            # Try to end at a period, question mark, or exclamation point
-            if end < len(text):
-                # Look for natural boundaries within the last 100 characters
-                for i in range(end, max(start, end - 100), -1):
-                    if text[i-1] in ['.', '!', '?', '\n']:
-                        end = i
-                        break
+            last = max(last, first)
+            while last + 1 < n and cumulative[last + 1] - base <= self.chunk_size:
+                last += 1
+            
+            if last + 1 >= n:
+                offsets.append((start, len(text)))
+                break
+            
+            limit = starts[last + 1]
+            while boundary + 1 < len(boundaries) and boundaries[boundary + 1] <= limit:
+                boundary += 1
+            window = max(window, first)
+            while window < last and cumulative[last] - tokens_before(window + 1) >= self.boundary_window:
+                window += 1
             
-            # Add the chunk to our list
-            chunks.append(text[start:end])
+            # Prefer to end on a sentence boundary inside the lookback window
+            end = limit
+            if boundary >= 0 and boundaries[boundary] > max(start, starts[window]):
+                end = boundaries[boundary]
+            offsets.append((start, end))
             
-            # Move the start pointer, accounting for overlap
-            start = end - self.chunk_overlap if end < len(text) else end
+            # Step back chunk_overlap tokens for the next chunk, always making progress
+            end_piece = max(end_piece, first)
+            while end_piece + 1 < n and starts[end_piece + 1] < end:
+                end_piece += 1
+            next_first = first + 1
+            while next_first <= end_piece and cumulative[end_piece] - tokens_before(next_first) > self.chunk_overlap:
+                next_first += 1
+            first = next_first
         
-        return chunks
+        # Trim surrounding whitespace, dropping chunks that trimming made redundant
+        trimmed = []
+        for start, end in offsets:
+            while start < end and text[start].isspace():
+                start += 1
+            while end > start and text[end - 1].isspace():
+                end -= 1
+            if start >= end or (trimmed and end <= trimmed[-1][1]):
+                continue
+            if trimmed and start == trimmed[-1][0]:
+                trimmed[-1] = (start, end)
+            else:
+                trimmed.append((start, end))
+        return trimmed
+    
+    def split_text(self, text: str) -> List[str]:
+        """Split text into chunks of approximately chunk_size tokens with overlap"""
+        return [text[start:end] for start, end in self.split_offsets(text)]
     
     def split_documents(self, documents: List[Document]) -> List[Document]:
         """Split documents into chunks"""
@@ -56,48 +137,94 @@ class TextSplitter:
         
         return split_docs
 
-def process_scraped_data(source_file: str = 'data/scraped_data.json', 
-                         fallback_file: str = 'data/fallback_data.json',
-                         output_file: str = 'data/processed_data.json'):
+def iter_json_object(filepath: str) -> Iterator[Tuple[str, Any]]:
     """
-    Process the scraped data (or fallback data) into chunks suitable for
-    embedding and retrieval.
+    Stream the (key, value) pairs of a top-level JSON object, decoding one value
+    at a time so memory is bounded by the largest single value, not the file.
     """
-    print("Processing scraped data...")
-    
-    # Determine which data file to use
-    data_file = source_file if os.path.exists(source_file) else fallback_file
+    decoder = json.JSONDecoder()
     
-    # Load data
-    try:
-        with open(data_file, 'r') as f:
-            raw_data = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError) as e:
-        print(f"Error loading data: {e}")
-        return []
-    
-    # Convert raw data into documents
-    documents = []
-    
-    for section_name, section_data in raw_data.items():
+    with open(filepath, 'r') as f:
+        buffer = ""
+        position = 0
+        eof = False
+        
+        def fill() -> bool:
+            """Read more of the file into the buffer; False once the file is exhausted"""
+            nonlocal buffer, position, eof
+            chunk = f.read(READ_SIZE)
+            buffer = buffer[position:] + chunk
+            position = 0
+            eof = not chunk
+            return bool(chunk)
+        
+        def skip(chars: str):
+            """Advance past any of the given characters, reading more as needed"""
+            nonlocal position
+            while True:
+                while position < len(buffer) and buffer[position] in chars:
+                    position += 1
+                if position < len(buffer) or not fill():
+                    return
+        
+        def decode() -> Any:
+            """Decode the next JSON value, reading more until it is complete"""
+            nonlocal position
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buffer, position)
+                    # A number followed only by number characters may continue in the next read
+                    # (raw_decode takes "36559" from "36559." and "1" from "1e")
+                    is_number = isinstance(value, (int, float)) and not isinstance(value, bool)
+                    if eof or not (is_number and _NUMBER_TAIL.fullmatch(buffer, end)):
+                        position = end
+                        return value
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                fill()
+        
+        skip(" \t\r\n")
+        if buffer[position:position + 1] != "{":
+            raise json.JSONDecodeError("Expected a JSON object", buffer, position)
+        position += 1
+        
+        while True:
+            skip(" \t\r\n,")
+            if position >= len(buffer):
+                raise json.JSONDecodeError("Unterminated JSON object", buffer, position)
+            if buffer[position] == "}":
+                return
+            
+            key = decode()
+            skip(" \t\r\n")
+            if buffer[position:position + 1] != ":":
+                raise json.JSONDecodeError("Expected ':'", buffer, position)
+            position += 1
+            skip(" \t\r\n")
+            yield key, decode()
+
+def iter_documents(pages: Iterable[Tuple[str, Dict[str, Any]]]) -> Iterator[Document]:
+    """Turn scraped pages into heading and paragraph documents"""
+    for section_name, section_data in pages:
         # Process headings
         if 'headings' in section_data:
             headings_text = " ".join(section_data['headings'])
             if headings_text:
-                documents.append(Document(
+                yield Document(
                     page_content=headings_text,
                     metadata={
                         "source": section_data.get('url', section_name),
                         "section": section_name,
                         "type": "headings"
                     }
-                ))
+                )
         
         # Process paragraphs
         if 'paragraphs' in section_data:
             for i, paragraph in enumerate(section_data['paragraphs']):
                 if paragraph:
-                    documents.append(Document(
+                    yield Document(
                         page_content=paragraph,
                         metadata={
                             "source": section_data.get('url', section_name),
@@ -105,29 +232,235 @@ def process_scraped_data(source_file: str = 'data/scraped_data.json',
                             "type": "paragraph",
                             "index": i
                         }
-                    ))
-    
-    # Split documents into chunks
-    text_splitter = TextSplitter(chunk_size=1000, chunk_overlap=200)
-    chunks = text_splitter.split_documents(documents)
-    
-    # Convert to serializable format
-    processed_data = [
-        {
-            "content": chunk.page_content,
-            "metadata": chunk.metadata
-        }
-        for chunk in chunks
-    ]
-    
-    # Save processed data
-    with open(output_file, 'w') as f:
-        json.dump(processed_data, f, indent=2)
-    
-    print(f"Processing completed. {len(chunks)} chunks created.")
+                    )
+
+def iter_chunks(documents: Iterable[Document], text_splitter: TextSplitter) -> Iterator[Dict[str, Any]]:
+    """Split documents into chunks in the serializable processed-data format"""
+    for doc in documents:
+        for text in text_splitter.split_text(doc.page_content):
+            yield {
+                "content": text,
+                "metadata": doc.metadata.copy()
+            }
+
+def iter_processed_data(filepath: str = PROCESSED_DATA_FILE) -> Iterator[Dict[str, Any]]:
+    """Stream chunks from a processed data file (JSON Lines, or a legacy JSON array)"""
+    with open(filepath, 'r') as f:
+        if filepath.endswith('.json'):
+            yield from json.load(f)
+            return
+        
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def read_processed_metadata(filepath: str = PROCESSED_DATA_FILE) -> Dict[str, Any]:
+    """Return the chunking metadata recorded next to a processed data file ({} if there is none)"""
+    try:
+        with open(filepath + PROCESSED_METADATA_SUFFIX, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def processed_data_is_current(filepath: str = PROCESSED_DATA_FILE, tokenizer=None) -> bool:
+    """
+    Check that a processed data file was chunked with the tokenizer in use now.
+    Chunk sizes are counted in tokens, so chunks cut by another tokenizer (e.g.
+    the estimator while tiktoken was unavailable) must be re-chunked.
+    """
+    tokenizer = tokenizer or get_tokenizer()
+    recorded = read_processed_metadata(filepath).get("tokenizer")
+    if recorded != tokenizer.name:
+        print(f"WARNING: {filepath} was chunked with tokenizer '{recorded}' "
+              f"but '{tokenizer.name}' is in use; it needs re-chunking")
+        return False
+    return True
+
+class JsonLinesWriter:
+    """
+    Writes records one per line to a temporary file that replaces the output on
+    success, along with an optional metadata sidecar
+    """
+    def __init__(self, output_file: str, metadata: Optional[Dict[str, Any]] = None):
+        self.output_file = output_file
+        self.tmp_file = output_file + '.tmp'
+        self.metadata = metadata
+        self.count = 0
+        self._file = None
+    
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.output_file) or '.', exist_ok=True)
+        self._file = open(self.tmp_file, 'w')
+        return self
+    
+    def write(self, record: Dict[str, Any]):
+        """Append one record"""
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self.count += 1
+    
+    def tee(self, records: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Write records as they pass through to the next pipeline stage"""
+        for record in records:
+            self.write(record)
+            yield record
+    
+    def __exit__(self, exc_type, exc, tb):
+        self._file.close()
+        if exc_type is not None:
+            os.remove(self.tmp_file)
+        else:
+            os.replace(self.tmp_file, self.output_file)
+            if self.metadata is not None:
+                metadata_file = self.output_file + PROCESSED_METADATA_SUFFIX
+                with open(metadata_file + '.tmp', 'w') as f:
+                    json.dump(dict(self.metadata, count=self.count), f, indent=2)
+                os.replace(metadata_file + '.tmp', metadata_file)
+        return False
+
+def prefetch(iterable: Iterable[Any], max_items: int = 256) -> Iterator[Any]:
+    """
+    Run an iterator in a background thread, buffering at most max_items, so
+    the producer (e.g. chunking) keeps working while the consumer (e.g. an
+    embedding request) is blocked.
+    """
+    buffer: "queue.Queue" = queue.Queue(maxsize=max_items)
+    done = object()
+    stop = threading.Event()
+    errors = []
+    
+    def produce():
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                while not stop.is_set():
+                    try:
+                        buffer.put(item, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+        except Exception as e:
+            errors.append(e)
+        finally:
+            # A consumer that stopped early closes a generator producer here, in its own thread
+            if stop.is_set() and hasattr(iterator, "close"):
+                iterator.close()
+            buffer.put(done)
+    
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    
+    try:
+        while True:
+            item = buffer.get()
+            if item is done:
+                break
+            yield item
+    finally:
+        stop.set()
+        # Unblock the producer if it is waiting on a full buffer
+        while thread.is_alive():
+            try:
+                buffer.get_nowait()
+            except queue.Empty:
+                thread.join(0.05)
+    
+    if errors:
+        raise errors[0]
+
+def find_scraped_data(source_file: str = SCRAPED_DATA_FILE,
+                      fallback_file: str = FALLBACK_DATA_FILE) -> Optional[str]:
+    """Return the scraped data file to process, the fallback data if nothing was scraped, or None"""
+    for data_file in (source_file, fallback_file):
+        if os.path.exists(data_file):
+            return data_file
+    return None
+
+def chunk_scraped_data(data_file: str, output_file: str = PROCESSED_DATA_FILE) -> Iterator[Dict[str, Any]]:
+    """
+    Stream the chunks of a scraped data file, writing each one to output_file
+    (JSON Lines, plus the chunking metadata sidecar) as it passes through.
+    output_file is only replaced once every chunk has been consumed; an error,
+    or closing the generator early, leaves it untouched.
+    """
+    text_splitter = TextSplitter(chunk_size=256, chunk_overlap=50)
+    metadata = {
+        "tokenizer": text_splitter.tokenizer.name,
+        "chunk_size": text_splitter.chunk_size,
+        "chunk_overlap": text_splitter.chunk_overlap
+    }
+    
+    with JsonLinesWriter(output_file, metadata) as writer:
+        yield from writer.tee(iter_chunks(iter_documents(iter_json_object(data_file)), text_splitter))
+
+def replace_processed_data(staged_file: str, output_file: str = PROCESSED_DATA_FILE):
+    """Move a processed data file written elsewhere (and its metadata sidecar) into place"""
+    os.replace(staged_file, output_file)
+    if os.path.exists(staged_file + PROCESSED_METADATA_SUFFIX):
+        os.replace(staged_file + PROCESSED_METADATA_SUFFIX, output_file + PROCESSED_METADATA_SUFFIX)
+
+def process_scraped_data(source_file: str = SCRAPED_DATA_FILE, 
+                         fallback_file: str = FALLBACK_DATA_FILE,
+                         output_file: str = PROCESSED_DATA_FILE) -> int:
+    """
+    Process the scraped data (or fallback data) into chunks suitable for
+    embedding and retrieval.
+    
+    Pages stream through load -> documents -> chunks -> JSON Lines output
+    without materializing the corpus (see chunk_scraped_data; ingestion jobs
+    embed the chunks while they are produced). Returns the number of chunks
+    written.
+    """
+    print("Processing scraped data...")
+    
+    # Determine which data file to use
+    data_file = find_scraped_data(source_file, fallback_file)
+    
+    if data_file is None:
+        print(f"Error loading data: {fallback_file} not found")
+        return 0
+    
+    count = 0
+    try:
+        for _ in chunk_scraped_data(data_file, output_file):
+            count += 1
+    except json.JSONDecodeError as e:
+        print(f"Error loading data: {e}")
+        return 0
+    
+    print(f"Processing completed. {count} chunks created.")
     print(f"Processed data saved to {output_file}")
     
-    return processed_data
+    return count
+
+def benchmark_splitter(source_file: str = SCRAPED_DATA_FILE, scales: Tuple[int, ...] = (1, 10, 100),
+                       repeat: int = 3) -> Dict[int, float]:
+    """Time TextSplitter on the scraped corpus joined into ever longer pages"""
+    corpus = " ".join(
+        " ".join(page.get('headings', []) + page.get('paragraphs', []))
+        for _, page in iter_json_object(source_file)
+    )
+    text_splitter = TextSplitter(chunk_size=256, chunk_overlap=50)
+    print(f"Tokenizer: {text_splitter.tokenizer.name}")
+    
+    results = {}
+    for scale in scales:
+        text = " ".join([corpus] * scale)
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            chunks = text_splitter.split_offsets(text)
+            best = min(best, time.perf_counter() - start)
+        
+        results[scale] = best
+        print(f"{len(text):>10} chars -> {len(chunks):>6} chunks in {1000 * best:8.2f} ms "
+              f"({1e6 * best / len(text) * 1000:.2f} us/KB)")
+    
+    return results
 
 if __name__ == "__main__":
-    process_scraped_data()
+    if "--benchmark" in sys.argv:
+        benchmark_splitter()
+    else:
+        process_scraped_data()
@@ -0,0 +1,206 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import numpy as np
+
+# Default location of the on-disk embedding cache
+EMBEDDING_CACHE_FILE = "data/embedding_cache.sqlite"
+
+# Disk hits refresh last_used in batches: after this many hits or this many seconds
+TOUCH_FLUSH_SIZE = 256
+TOUCH_FLUSH_INTERVAL = 5.0
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache with two tiers: a small in-process LRU of
+    hot entries in front of a SQLite table on disk. Entries are keyed by a hash of
+    (model, text) and stored as float32: raw bytes on disk, read-only ndarrays in
+    the hot tier (about 6KB per 1536-dim entry instead of ~49KB as a list of
+    floats). Lookups return those ndarrays; callers convert if they need lists.
+    Hits in either tier refresh last_used, so the disk tier evicts the least
+    recently used rows once it grows past max_entries.
+    """
+    def __init__(self, path: str = EMBEDDING_CACHE_FILE, max_entries: int = 200000,
+                 max_hot_entries: int = 2048):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_hot_entries = max_hot_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._hot: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        # last_used updates for hits that have not been written yet
+        self._touched: Dict[str, float] = {}
+        self._touched_at = time.time()
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Streamlit serves sessions from several threads, so share one guarded connection
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        """Return the cache key for a text embedded with a given model"""
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Look up embeddings for texts as float32 arrays, returning None for each miss"""
+        keys = [self.make_key(model, text) for text in texts]
+        results: Dict[str, np.ndarray] = {}
+
+        with self._lock:
+            now = time.time()
+            for key in keys:
+                if key in self._hot:
+                    self._hot.move_to_end(key)
+                    results[key] = self._hot[key]
+                    # Keep hot entries recent on disk too, or eviction would drop them first
+                    self._touched[key] = now
+
+            missing = list({key for key in keys if key not in results})
+            if missing:
+                rows = []
+                # Stay well below SQLite's bound-parameter limit
+                for i in range(0, len(missing), 500):
+                    batch = missing[i:i + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    rows.extend(self._conn.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                    ).fetchall())
+
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    results[key] = vector
+                    self._remember(key, vector)
+                    self._touched[key] = now
+
+            if len(self._touched) >= TOUCH_FLUSH_SIZE or now - self._touched_at >= TOUCH_FLUSH_INTERVAL:
+                self._flush_touched()
+
+            found = [results.get(key) for key in keys]
+            hit_count = sum(1 for vector in found if vector is not None)
+            self.hits += hit_count
+            self.misses += len(keys) - hit_count
+
+        return found
+
+    def get(self, model: str, text: str) -> Optional[np.ndarray]:
+        """Look up the embedding for a single text"""
+        return self.get_many(model, [text])[0]
+
+    def put_many(self, model: str, texts: List[str], embeddings: List[List[float]]):
+        """Store embeddings for texts, skipping placeholder zero vectors"""
+        now = time.time()
+        rows: Dict[str, tuple] = {}
+
+        with self._lock:
+            for text, embedding in zip(texts, embeddings):
+                vector = np.asarray(embedding, dtype=np.float32)
+                # Failed API calls yield all-zero vectors; never make those sticky
+                if not vector.any():
+                    continue
+                key = self.make_key(model, text)
+                # A private read-only copy, so callers can neither share nor mutate it
+                vector = vector.copy()
+                vector.flags.writeable = False
+                self._remember(key, vector)
+                rows[key] = (key, vector.tobytes(), now)
+
+            if not rows:
+                return
+
+            # Count only keys that are new, so _count stays exact without rescanning the table
+            existing = self._count_existing(list(rows))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", list(rows.values())
+            )
+            self._conn.commit()
+            self._count += len(rows) - existing
+            self._evict()
+
+    def put(self, model: str, text: str, embedding: List[float]):
+        """Store the embedding for a single text"""
+        self.put_many(model, [text], [embedding])
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters and tier sizes"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hot_entries": len(self._hot),
+                "disk_entries": self._count
+            }
+
+    def close(self):
+        """Write pending last_used updates and close the underlying SQLite connection"""
+        with self._lock:
+            self._flush_touched()
+            self._conn.close()
+
+    def _count_existing(self, keys: List[str]) -> int:
+        """Count how many of the keys are already stored, using primary key lookups"""
+        existing = 0
+        # Stay well below SQLite's bound-parameter limit
+        for i in range(0, len(keys), 500):
+            batch = keys[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            existing += self._conn.execute(
+                f"SELECT COUNT(*) FROM embeddings WHERE key IN ({placeholders})", batch
+            ).fetchone()[0]
+        return existing
+
+    def _flush_touched(self):
+        """Write the batched last_used updates of disk hits; the caller must hold the lock"""
+        if self._touched:
+            self._conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?",
+                                   [(used, key) for key, used in self._touched.items()])
+            self._conn.commit()
+            self._touched.clear()
+        self._touched_at = time.time()
+
+    def _remember(self, key: str, vector: np.ndarray):
+        """Insert into the hot tier, dropping the least recently used entry if full"""
+        self._hot[key] = vector
+        self._hot.move_to_end(key)
+        while len(self._hot) > self.max_hot_entries:
+            self._hot.popitem(last=False)
+
+    def _evict(self):
+        """Delete the least recently used rows once the disk tier is over capacity"""
+        overflow = self._count - self.max_entries
+        if overflow <= 0:
+            return
+        # Evict by up-to-date recency
+        self._flush_touched()
+
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN "
+            "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)", (overflow,)
+        )
+        self._conn.commit()
+        self._count -= overflow
+
+_shared_cache: Optional[EmbeddingCache] = None
+_shared_cache_lock = threading.Lock()
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Return the process-wide embedding cache, so every embedder shares one SQLite connection"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = EmbeddingCache()
+        return _shared_cache
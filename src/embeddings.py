@@ -1,10 +1,20 @@
+import hashlib
 import json
 import os
 import pickle
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 import numpy as np
-from typing import List, Dict, Any, Optional
-import requests
+from typing import Callable, List, Dict, Any, Iterable, Optional, Tuple
 from dotenv import load_dotenv
+from .data_processor import (PROCESSED_DATA_FILE, iter_processed_data, process_scraped_data,
+                             processed_data_is_current, read_processed_metadata)
+from .embedding_cache import EmbeddingCache, get_embedding_cache
+from .openai_client import get_client
+from .tokens import count_tokens
+from .index import FlatIndex, MetadataIndex, create_index, save_index, load_index
+from .lexical import BM25Index
 
 # Load environment variables from .env file
 load_dotenv()
@@ -12,184 +22,954 @@ load_dotenv()
 # Get OpenAI API key from environment
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# OpenAI's latest embedding model
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# On-disk layout of the vector store
+VECTOR_STORE_DIR = "data/vector_store"
+LEGACY_VECTOR_STORE_FILE = "data/vector_store.pkl"
+VECTOR_STORE_FORMAT_VERSION = 1
+VECTORS_FILE = "vectors.npy"
+DOCUMENTS_FILE = "documents.jsonl"
+MANIFEST_FILE = "manifest.json"
+TOMBSTONES_FILE = "tombstones.npy"
+LEXICAL_FILE = "lexical.json"
+# Pointer file naming the live version subdirectory, for stores that are swapped as a whole
+# (a store directory without one holds its files directly)
+CURRENT_FILE = "CURRENT"
+
+# Rewrite the matrix once this fraction of rows has been deleted
+COMPACTION_THRESHOLD = 0.25
+
+# Reciprocal rank fusion constant: larger values flatten the advantage of top ranks
+RRF_K = 60
+
+# Shortest shared text that counts as chunk overlap when merging neighbouring chunks
+MIN_MERGE_OVERLAP = 20
+
+def _overlap(first: str, second: str) -> int:
+    """Length of the longest suffix of first that is a prefix of second (0 if under MIN_MERGE_OVERLAP)"""
+    probe = second[:MIN_MERGE_OVERLAP]
+    if len(probe) < MIN_MERGE_OVERLAP:
+        return 0
+    position = first.find(probe)
+    while position != -1:
+        if second.startswith(first[position:]):
+            return len(first) - position
+        position = first.find(probe, position + 1)
+    return 0
+
+def merge_overlapping_chunks(results: List[Tuple[Dict[str, Any], float]],
+                             key=lambda doc: doc.get("metadata", {})) -> List[Tuple[Dict[str, Any], float]]:
+    """
+    Merge results that are overlapping pieces of the same chunked text (same key)
+    into one document, and drop chunks contained in another. Keeps the order
+    of first appearance and the best score of the merged pieces.
+    """
+    merged: List[Tuple[Dict[str, Any], float]] = []
+    for doc, score in results:
+        content = doc["content"]
+        for position, (kept, kept_score) in enumerate(merged):
+            if key(kept) != key(doc):
+                continue
+            kept_content = kept["content"]
+            if content in kept_content:
+                combined = kept_content
+            elif kept_content in content:
+                combined = content
+            else:
+                after = _overlap(kept_content, content)
+                before = _overlap(content, kept_content) if not after else 0
+                if after:
+                    combined = kept_content + content[after:]
+                elif before:
+                    combined = content + kept_content[before:]
+                else:
+                    continue
+            merged[position] = (dict(kept, content=combined), max(score, kept_score))
+            break
+        else:
+            merged.append((doc, score))
+    return merged
+
+class EmbeddingError(Exception):
+    """Raised when the embeddings API does not return embeddings for a batch"""
+
+class EmbeddingProgress:
+    """Snapshot of embedding throughput, passed to progress callbacks"""
+    def __init__(self, done: int, total: int, elapsed: float, in_flight: int, batch_tokens: int):
+        self.done = done
+        self.total = total
+        self.elapsed = elapsed
+        self.in_flight = in_flight
+        self.batch_tokens = batch_tokens
+    
+    @property
+    def texts_per_sec(self) -> float:
+        return self.done / self.elapsed if self.elapsed > 0 else 0.0
+    
+    def __str__(self) -> str:
+        return (f"Embedded {self.done}/{self.total} documents in {self.elapsed:.1f}s "
+                f"({self.texts_per_sec:.1f} docs/sec, {self.in_flight} batches in flight, "
+                f"{self.batch_tokens} tokens per batch)")
+
 class SimpleEmbeddings:
-    """A simple wrapper for OpenAI's embeddings API"""
-    def __init__(self, api_key: Optional[str] = None):
+    """
+    A simple wrapper for OpenAI's embeddings API. Uncached texts are packed into
+    batches by token budget and several batches are sent in parallel; when the
+    API starts rate limiting, both the parallelism and the batch budget shrink
+    and then grow back (additive increase, multiplicative decrease).
+    """
+    def __init__(self, api_key: Optional[str] = None, model: str = EMBEDDING_MODEL,
+                 cache: Optional[EmbeddingCache] = None, use_cache: bool = True,
+                 max_batch_tokens: int = 8000, max_batch_size: int = 512,
+                 max_parallel_batches: int = 4,
+                 progress_callback: Optional[Callable[[EmbeddingProgress], None]] = None):
         self.api_key = api_key or OPENAI_API_KEY
         if not self.api_key:
             raise ValueError("OpenAI API key is required. Set it in the .env file or pass it to SimpleEmbeddings.")
+        self.model = model
+        # Embeddings are deterministic per (model, text), so they are cached across runs
+        self.cache = cache or (get_embedding_cache() if use_cache else None)
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_parallel_batches = max_parallel_batches
+        self.progress_callback = progress_callback
     
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings for a list of documents"""
-        all_embeddings = []
-        
-        # Process in batches of 20 to avoid API limits
-        batch_size = 20
-        for i in range(0, len(texts), batch_size):
-            batch_texts = texts[i:i+batch_size]
-            batch_embeddings = self._get_embeddings_from_api(batch_texts)
-            all_embeddings.extend(batch_embeddings)
-            
-            # Print progress
-            print(f"Embedded {min(i+batch_size, len(texts))}/{len(texts)} documents")
+        """Generate embeddings for a list of documents, raising EmbeddingError if a batch fails"""
+        all_embeddings = self.cache.get_many(self.model, texts) if self.cache else [None] * len(texts)
+        
+        # Only texts that are not cached go to the API, each distinct text once
+        missing_texts = list(dict.fromkeys(text for text, embedding in zip(texts, all_embeddings) if embedding is None))
+        if self.cache and texts:
+            print(f"Found {len(texts) - sum(1 for e in all_embeddings if e is None)}/{len(texts)} embeddings in cache")
+        
+        new_embeddings = self._embed_in_parallel(missing_texts) if missing_texts else {}
+        
+        # The cache hands out float32 arrays; callers get plain lists like from the API
+        return [embedding.tolist() if embedding is not None else new_embeddings[text]
+                for text, embedding in zip(texts, all_embeddings)]
+    
+    def _next_batch(self, texts: List[str], token_counts: List[int], start: int, budget: int) -> int:
+        """Return the end index of the batch starting at start that fits the token budget"""
+        end = start
+        tokens = 0
+        while end < len(texts) and end - start < self.max_batch_size:
+            if end > start and tokens + token_counts[end] > budget:
+                break
+            tokens += token_counts[end]
+            end += 1
+        return end
+    
+    def _embed_in_parallel(self, texts: List[str]) -> Dict[str, List[float]]:
+        """Embed texts with several token-budgeted batches in flight, adapting to rate limits"""
+        client = get_client(self.api_key)
+        token_counts = [count_tokens(text) for text in texts]
+        
+        results: Dict[str, List[float]] = {}
+        parallelism = self.max_parallel_batches
+        budget = self.max_batch_tokens
+        position = 0
+        done = 0
+        start_time = time.perf_counter()
+        
+        with ThreadPoolExecutor(max_workers=self.max_parallel_batches) as executor:
+            in_flight = {}
+            while position < len(texts) or in_flight:
+                # Keep up to `parallelism` batches in flight
+                while position < len(texts) and len(in_flight) < parallelism:
+                    end = self._next_batch(texts, token_counts, position, budget)
+                    batch_texts = texts[position:end]
+                    future = executor.submit(self._get_embeddings_from_api, batch_texts)
+                    in_flight[future] = (batch_texts, client.rate_limited)
+                    position = end
+                
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    batch_texts, rate_limited_before = in_flight.pop(future)
+                    batch_embeddings = future.result()
+                    results.update(zip(batch_texts, batch_embeddings))
+                    done += len(batch_texts)
+                    
+                    if self.cache:
+                        self.cache.put_many(self.model, batch_texts, batch_embeddings)
+                    
+                    if client.rate_limited > rate_limited_before:
+                        # Rate limited while this batch was in flight: back off
+                        parallelism = max(1, parallelism // 2)
+                        budget = max(min(self.max_batch_tokens, 1000), budget // 2)
+                    else:
+                        parallelism = min(self.max_parallel_batches, parallelism + 1)
+                        budget = min(self.max_batch_tokens, budget + self.max_batch_tokens // 4)
+                    
+                    if self.progress_callback:
+                        self.progress_callback(EmbeddingProgress(
+                            done, len(texts), time.perf_counter() - start_time, len(in_flight), budget
+                        ))
         
-        return all_embeddings
+        print(EmbeddingProgress(done, len(texts), time.perf_counter() - start_time, 0, budget))
+        return results
     
     def embed_query(self, text: str) -> List[float]:
         """Generate embeddings for a query string"""
+        if self.cache:
+            cached = self.cache.get(self.model, text)
+            if cached is not None:
+                return cached.tolist()
+        
         embeddings = self._get_embeddings_from_api([text])
+        
+        if self.cache:
+            self.cache.put(self.model, text, embeddings[0])
+        
         return embeddings[0]
     
     def _get_embeddings_from_api(self, texts: List[str]) -> List[List[float]]:
-        """Call OpenAI API to get embeddings"""
+        """Call OpenAI API to get embeddings, raising EmbeddingError if the call fails"""
+        data = {
+            "input": texts,
+            "model": self.model
+        }
+        
         try:
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.api_key}"
-            }
-            
-            data = {
-                "input": texts,
-                "model": "text-embedding-3-small"  # Using OpenAI's latest embedding model
-            }
-            
-            response = requests.post(
-                "https://api.openai.com/v1/embeddings",
-                headers=headers,
-                json=data
-            )
-            
-            response.raise_for_status()
-            result = response.json()
-            
+            result = get_client(self.api_key).post_json("/embeddings", data)
             # Extract and return the embeddings
-            return [item["embedding"] for item in result["data"]]
-            
+            embeddings = [item["embedding"] for item in result["data"]]
         except Exception as e:
-            print(f"Error getting embeddings from API: {e}")
-            # Return a fake embedding for testing
-            return [[0.0] * 1536] * len(texts)  # OpenAI embeddings are 1536-dimensional
+            raise EmbeddingError(f"Error getting embeddings from API: {e}") from e
+        
+        if len(embeddings) != len(texts):
+            raise EmbeddingError(f"Embeddings API returned {len(embeddings)} embeddings for {len(texts)} texts")
+        return embeddings
 
 class SimpleVectorStore:
     """A simple in-memory vector store that mimics basic functionality of ChromaDB"""
-    def __init__(self, embedding_function):
+    def __init__(self, embedding_function, index=None):
         self.embedding_function = embedding_function
+        self.persist_path = VECTOR_STORE_DIR
         self.documents = []
-        self.embeddings = []
+        # Contiguous float32 matrix of L2-normalized embeddings, one row per document
+        self.embeddings = np.zeros((0, 0), dtype=np.float32)
+        # Nearest-neighbour index over the embedding rows (exact search by default)
+        self.index = index or FlatIndex()
+        # Rows removed by sync_documents stay in the matrix until the next compaction
+        self.tombstones = np.zeros(0, dtype=bool)
+        self.deleted_count = 0
+        # Bumped whenever searchable content changes, so caches of search results can be invalidated
+        self.generation = 0
+        # Sparse BM25 index over the same rows, for hybrid and lexical-only search
+        self.lexical = BM25Index()
+        # Posting lists of rows per metadata value, for filtered search
+        self.metadata_index = MetadataIndex()
+        # Name of the tokenizer the documents were chunked with, as recorded by the data processor
+        self.tokenizer: Optional[str] = None
+    
+    @staticmethod
+    def _normalize(embeddings) -> np.ndarray:
+        """Convert embeddings to a contiguous float32 matrix with unit-length rows"""
+        matrix = np.array(embeddings, dtype=np.float32, ndmin=2)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        # Leave zero vectors (e.g. failed API calls) as zeros instead of producing NaNs
+        norms[norms == 0] = 1.0
+        matrix /= norms
+        return np.ascontiguousarray(matrix)
+    
+    def _append_embeddings(self, embeddings):
+        """Normalize new embeddings and append them to the matrix"""
+        if len(embeddings) == 0:
+            return
+        
+        matrix = self._normalize(embeddings)
+        # A store whose documents were never embedded has zero-width rows; widen them
+        # (as unembedded zero rows) once the first real embeddings arrive
+        widened = len(self.embeddings) > 0 and self.embeddings.shape[1] == 0 and matrix.shape[1] > 0
+        if widened:
+            self.embeddings = np.zeros((len(self.embeddings), matrix.shape[1]), dtype=np.float32)
+        if len(self.embeddings) == 0:
+            self.embeddings = matrix
+        else:
+            self.embeddings = np.concatenate([self.embeddings, matrix])
+        
+        self.tombstones = np.concatenate([self.tombstones, np.zeros(len(matrix), dtype=bool)])
+        if widened:
+            self.index.build(self.embeddings)
+        elif self.embeddings.shape[1]:
+            self.index.add(self.embeddings, matrix)
+        self.generation += 1
+    
+    def set_index(self, backend: str = "flat", **params):
+        """Switch to a different index backend and build it over the stored vectors"""
+        self.index = create_index(backend, **params)
+        self.index.build(self.embeddings)
     
-    def add_documents(self, documents: List[Dict[str, Any]]):
-        """Add documents to the vector store"""
+    def add_documents(self, documents: List[Dict[str, Any]], save: bool = True, embed: bool = True) -> bool:
+        """
+        Add documents to the vector store. Documents that cannot be embedded (the
+        API failed, or embed is False) are still added for lexical and metadata
+        search, with all-zero rows that the next sync embeds again. Returns whether
+        the documents were embedded.
+        """
         texts = [doc["content"] for doc in documents]
-        embeddings = self.embedding_function.embed_documents(texts)
+        embedded = False
+        if embed:
+            try:
+                embeddings = self.embedding_function.embed_documents(texts) if texts else []
+                embedded = True
+            except EmbeddingError as e:
+                print(f"Error embedding {len(texts)} documents, adding them for lexical search only: {e}")
+        if not embedded:
+            embeddings = np.zeros((len(documents), self.embeddings.shape[1]), dtype=np.float32)
         
         self.documents.extend(documents)
-        self.embeddings.extend(embeddings)
+        for doc in documents:
+            self.lexical.add(doc["content"])
+        self.metadata_index.add([doc.get("metadata", {}) for doc in documents])
+        self._append_embeddings(embeddings)
         
         print(f"Added {len(documents)} documents to vector store")
         
         # Save to disk
-        self.save("data/vector_store.pkl")
+        if save:
+            self.save(self.persist_path)
+        
+        return embedded
+    
+    def delete_rows(self, row_ids: List[int]):
+        """Tombstone rows so they are no longer returned by searches"""
+        for row_id in row_ids:
+            if not self.tombstones[row_id]:
+                self.tombstones[row_id] = True
+                self.deleted_count += 1
+        self.generation += 1
+        
+        if self.deleted_count > COMPACTION_THRESHOLD * len(self.documents):
+            self.compact()
+    
+    def compact(self):
+        """Physically remove tombstoned rows from the matrix, documents and index"""
+        if self.deleted_count == 0:
+            return
+        
+        keep = ~self.tombstones
+        self.embeddings = np.ascontiguousarray(self.embeddings[keep])
+        self.documents = [doc for doc, kept in zip(self.documents, keep) if kept]
+        self.index.remove(keep)
+        self._rebuild_lexical()
+        self._rebuild_metadata_index()
+        
+        print(f"Compacted vector store, dropped {self.deleted_count} deleted rows")
+        self.tombstones = np.zeros(len(self.documents), dtype=bool)
+        self.deleted_count = 0
+    
+    def _rebuild_lexical(self):
+        """Re-index every stored document in the BM25 index, keeping ids aligned with rows"""
+        self.lexical = BM25Index()
+        for doc in self.documents:
+            self.lexical.add(doc["content"])
+    
+    def _rebuild_metadata_index(self):
+        """Recompute the metadata posting lists for every stored document"""
+        self.metadata_index = MetadataIndex()
+        self.metadata_index.add([doc.get("metadata", {}) for doc in self.documents])
+    
+    @staticmethod
+    def _document_key(doc: Dict[str, Any]) -> tuple:
+        """Identify where a chunk came from: (source, section, type, paragraph index)"""
+        metadata = doc.get("metadata", {})
+        return (metadata.get("source"), metadata.get("section"), metadata.get("type"), metadata.get("index"))
+    
+    @staticmethod
+    def _document_hash(doc: Dict[str, Any]) -> str:
+        """Hash a chunk's content and metadata"""
+        payload = json.dumps({"content": doc["content"], "metadata": doc.get("metadata", {})}, sort_keys=True)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+    
+    def sync_documents(self, documents: Iterable[Dict[str, Any]], save: bool = True,
+                       batch_size: int = 100) -> Dict[str, int]:
+        """
+        Bring the store in line with a new chunk set. Chunks are matched by
+        (source, section, type, index) and content hash: unchanged chunks are kept,
+        only added or changed chunks are embedded, and removed chunks are tombstoned.
+        Stored rows without an embedding (all zeros) count as changed, so they are
+        embedded again.
+        
+        documents may be a generator; new chunks are embedded in batches of
+        batch_size as they arrive rather than after the whole set has been read.
+        If embedding fails, the remaining chunks are added without embeddings (the
+        store degrades to lexical-only search for them) and counted as "unembedded".
+        """
+        # Live rows grouped by origin, each with its content hash
+        existing: Dict[tuple, Dict[str, List[int]]] = {}
+        has_vector = np.zeros(len(self.documents), dtype=bool)
+        if self.embeddings.size:
+            has_vector[:len(self.embeddings)] = np.asarray(self.embeddings).any(axis=1)
+        for row_id, doc in enumerate(self.documents):
+            if self.tombstones[row_id]:
+                continue
+            if not has_vector[row_id]:
+                # Never matched, so the chunk is re-embedded and this row is replaced
+                existing.setdefault(self._document_key(doc), {}).setdefault(None, []).append(row_id)
+                continue
+            by_hash = existing.setdefault(self._document_key(doc), {})
+            by_hash.setdefault(self._document_hash(doc), []).append(row_id)
+        
+        # Trained indexes retrain as batches arrive; remember the state to finish training below
+        trained_size = getattr(self.index, "trained_size", None)
+        
+        pending = []
+        added_keys: Dict[tuple, int] = {}
+        seen_keys = set()
+        unchanged = 0
+        # After the first failed batch, stop calling the embedding API for the rest
+        embedding = True
+        unembedded = 0
+        for doc in documents:
+            key = self._document_key(doc)
+            rows = existing.get(key, {}).get(self._document_hash(doc))
+            if rows:
+                # Identical chunk already stored; consume the row so duplicates pair up one-to-one
+                rows.pop()
+                unchanged += 1
+            else:
+                pending.append(doc)
+                added_keys[key] = added_keys.get(key, 0) + 1
+                if len(pending) >= batch_size:
+                    embedding = self.add_documents(pending, save=False, embed=embedding)
+                    unembedded += 0 if embedding else len(pending)
+                    pending = []
+            seen_keys.add(key)
+        
+        if pending:
+            embedding = self.add_documents(pending, save=False, embed=embedding)
+            unembedded += 0 if embedding else len(pending)
+        
+        # If this sync (re)trained the index part-way through, train it once more on the complete set
+        if trained_size is not None and self.index.trained_size not in (trained_size, len(self.embeddings)):
+            self.index.build(self.embeddings)
+        
+        to_delete = [row_id for by_hash in existing.values() for rows in by_hash.values() for row_id in rows]
+        deleted_keys = {self._document_key(self.documents[row_id]) for row_id in to_delete}
+        changed = sum(count for key, count in added_keys.items() if key in deleted_keys)
+        
+        stats = {
+            "unchanged": unchanged,
+            "changed": changed,
+            "added": sum(added_keys.values()) - changed,
+            "removed": sum(1 for row_id in to_delete if self._document_key(self.documents[row_id]) not in seen_keys),
+            "unembedded": unembedded
+        }
+        print(f"Syncing vector store: {stats['added']} added, {stats['changed']} changed, "
+              f"{stats['removed']} removed, {stats['unchanged']} unchanged")
+        if unembedded:
+            print(f"WARNING: {unembedded} chunks could not be embedded and are only found by lexical search "
+                  f"until the next sync")
+        
+        if to_delete:
+            self.delete_rows(to_delete)
+        
+        if save and (added_keys or to_delete):
+            self.save(self.persist_path)
+        
+        return stats
+    
+    def _filter_mask(self, filter: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Return the live rows matching a metadata filter as a boolean mask, or None for no filter"""
+        if not filter:
+            return None
+        return self.metadata_index.rows(filter) & ~self.tombstones
+    
+    def _vector_rows(self, query_vector: np.ndarray, k: int, allowed: Optional[np.ndarray] = None,
+                     **search_params) -> List[Tuple[int, float]]:
+        """Return up to k live (row, cosine score) pairs, skipping rows without an embedding"""
+        if allowed is not None:
+            # Filtered search scores only the matching subset of the matrix
+            rows = np.flatnonzero(allowed)
+            ids, scores = FlatIndex().search(self.embeddings[rows], query_vector, k)
+            ids = rows[ids]
+        else:
+            # Let the index pick the top k rows (search_params carry backend knobs like n_probe),
+            # over-fetching enough to make up for any tombstoned rows among the winners
+            ids, scores = self.index.search(self.embeddings, query_vector, k + self.deleted_count, **search_params)
+        # Zero rows (failed embedding calls) score exactly 0 and would be ranked arbitrarily
+        return [(int(i), float(score)) for i, score in zip(ids, scores)
+                if score != 0 and not self.tombstones[i]][:k]
     
-    def similarity_search(self, query: str, k: int = 3) -> List[Dict[str, Any]]:
-        """Find the k most similar documents to the query"""
-        # Get query embedding
-        query_embedding = self.embedding_function.embed_query(query)
+    def _lexical_rows(self, query: str, k: int, allowed: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """Return up to k live (row, BM25 score) pairs"""
+        if allowed is None:
+            allowed = None if self.deleted_count == 0 else ~self.tombstones
+        return self.lexical.search(query, k, allowed=allowed)
+    
+    def lexical_search(self, query: str, k: int = 3, filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Find the k best BM25 matches; needs no embedding call, so it is cheap and always available"""
+        return [self.documents[i] for i, _ in self._lexical_rows(query, k, self._filter_mask(filter))]
+    
+    def similarity_search(self, query: str, k: int = 3, **search_params) -> List[Dict[str, Any]]:
+        """Find the k most relevant documents to the query (see similarity_search_with_score)"""
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **search_params)]
+    
+    def similarity_search_with_score(self, query: str, k: int = 3, mode: str = "hybrid",
+                                     filter: Optional[Dict[str, Any]] = None,
+                                     min_score: Optional[float] = None, mmr: bool = False,
+                                     mmr_lambda: float = 0.5, fetch_k: int = 20,
+                                     merge_overlaps: bool = True, query_vector=None,
+                                     **search_params) -> List[Tuple[Dict[str, Any], float]]:
+        """
+        Find the k most relevant documents to the query, as (document, score) pairs.
+        
+        mode is "hybrid" (BM25 and vector rankings merged by reciprocal rank fusion),
+        "vector" or "lexical"; it falls back to lexical-only when the query cannot be
+        embedded. filter restricts results by metadata, e.g. {"section": ["careers"],
+        "type": "paragraph"}.
         
-        # Calculate cosine similarity
-        similarities = self._cosine_similarity(query_embedding)
+        Scores are cosine similarities, except for lexical-only results (no query
+        or row embedding), which carry their BM25 score. min_score drops results
+        whose cosine similarity is below it. mmr reranks fetch_k candidates for
+        diversity (maximal marginal relevance; mmr_lambda=1 is pure relevance).
+        merge_overlaps joins overlapping chunks of the same text into one result,
+        so k is an upper bound on the number of results. query_vector is the query's
+        embedding, if the caller already has it.
+        """
+        if not self.documents:
+            return []
         
-        # Get top k indices
-        top_k_indices = np.argsort(similarities)[-k:][::-1]
+        allowed = self._filter_mask(filter)
+        if allowed is not None and not allowed.any():
+            return []
         
-        # Return documents
-        return [self.documents[i] for i in top_k_indices]
+        if mode == "lexical" or not self.embeddings.shape[1]:
+            # Nothing in the store is embedded (e.g. the API was down during ingestion)
+            query_vector = None
+        elif query_vector is not None:
+            query_vector = self._normalize(query_vector)[0]
+        else:
+            # Get query embedding; without one (failed call or zero vector) search lexically
+            try:
+                query_vector = self._normalize(self.embedding_function.embed_query(query))[0]
+            except Exception as e:
+                print(f"Error embedding query, using lexical search only: {e}")
+            if query_vector is not None and not query_vector.any():
+                query_vector = None
+            if query_vector is not None and len(query_vector) != self.embeddings.shape[1]:
+                print(f"Query embedding has {len(query_vector)} dimensions but the store has "
+                      f"{self.embeddings.shape[1]}, using lexical search only")
+                query_vector = None
+        
+        if query_vector is None:
+            results = [(self.documents[i], score) for i, score in self._lexical_rows(query, k, allowed)]
+            return merge_overlapping_chunks(results, self._document_key) if merge_overlaps else results
+        
+        candidates = max(fetch_k, k) if mmr else k
+        if mode == "vector":
+            rows = [row for row, _ in self._vector_rows(query_vector, candidates, allowed, **search_params)]
+        else:
+            rows = self._fused_rows(query, query_vector, candidates, allowed, **search_params)
+        
+        vectors = np.asarray(self.embeddings[rows], dtype=np.float32).reshape(len(rows), -1)
+        scores = vectors @ query_vector if len(rows) else np.zeros(0, dtype=np.float32)
+        has_vector = vectors.any(axis=1)
+        
+        if min_score is not None:
+            # Rows without an embedding were found lexically and have no cosine score to compare
+            keep = ~has_vector | (scores >= min_score)
+            rows = [row for row, kept in zip(rows, keep) if kept]
+            vectors, scores, has_vector = vectors[keep], scores[keep], has_vector[keep]
+        
+        order = self._mmr(vectors, scores, k, mmr_lambda) if mmr else list(range(min(k, len(rows))))
+        
+        results = []
+        for position in order:
+            row = rows[position]
+            if has_vector[position]:
+                score = float(scores[position])
+            else:
+                score = self._bm25_score(query, row)
+            results.append((self.documents[row], score))
+        return merge_overlapping_chunks(results, self._document_key) if merge_overlaps else results
     
-    def _cosine_similarity(self, query_embedding: List[float]) -> np.ndarray:
-        """Calculate cosine similarity between query and all documents"""
-        query_norm = np.linalg.norm(query_embedding)
-        dot_products = np.dot(self.embeddings, query_embedding)
+    def _fused_rows(self, query: str, query_vector: np.ndarray, k: int,
+                    allowed: Optional[np.ndarray] = None, **search_params) -> List[int]:
+        """Return the top k rows of the BM25 and vector rankings merged by reciprocal rank fusion"""
+        # Rank fusion only needs ranks, so BM25 and cosine scores never have to be calibrated
+        candidates = max(4 * k, 20)
+        fused: Dict[int, float] = {}
+        for ranking in (self._vector_rows(query_vector, candidates, allowed, **search_params),
+                        self._lexical_rows(query, candidates, allowed)):
+            for rank, (row, _) in enumerate(ranking):
+                fused[row] = fused.get(row, 0.0) + 1.0 / (RRF_K + rank + 1)
         
-        # Calculate norms for document embeddings
-        doc_norms = np.linalg.norm(self.embeddings, axis=1)
+        return sorted(fused, key=lambda row: (-fused[row], row))[:k]
+    
+    def _bm25_score(self, query: str, row: int) -> float:
+        """BM25 score of a single row for the query"""
+        allowed = np.zeros(len(self.documents), dtype=bool)
+        allowed[row] = True
+        results = self.lexical.search(query, 1, allowed=allowed)
+        return results[0][1] if results else 0.0
+    
+    @staticmethod
+    def _mmr(vectors: np.ndarray, scores: np.ndarray, k: int, mmr_lambda: float) -> List[int]:
+        """Greedy maximal marginal relevance: pick relevant candidates unlike those already picked"""
+        selected: List[int] = []
+        if len(vectors) == 0:
+            return selected
+        
+        # Highest similarity of each candidate to anything selected so far
+        redundancy = np.full(len(vectors), -np.inf, dtype=np.float32)
+        available = np.ones(len(vectors), dtype=bool)
+        while len(selected) < min(k, len(vectors)):
+            penalty = np.where(np.isinf(redundancy), 0.0, redundancy)
+            objective = np.where(available, mmr_lambda * scores - (1 - mmr_lambda) * penalty, -np.inf)
+            best = int(np.argmax(objective))
+            selected.append(best)
+            available[best] = False
+            redundancy = np.maximum(redundancy, vectors @ vectors[best])
+        return selected
+    
+    def similarity_search_batch(self, queries: List[str], k: int = 3, filter: Optional[Dict[str, Any]] = None,
+                                min_score: Optional[float] = None,
+                                **search_params) -> List[List[Tuple[Dict[str, Any], float]]]:
+        """
+        Find the k most similar documents for each of many queries, as
+        (document, cosine score) pairs. All queries are embedded in one
+        embed_documents call and scored in chunks of matrix-matrix products.
+        Queries that cannot be embedded get BM25 matches (with BM25 scores) instead.
+        """
+        if not queries:
+            return []
         
-        # Calculate cosine similarity
-        similarities = dot_products / (doc_norms * query_norm)
+        allowed = self._filter_mask(filter)
+        if not self.documents or (allowed is not None and not allowed.any()):
+            return [[] for _ in queries]
         
-        return similarities
+        query_vectors = np.zeros((len(queries), 1), dtype=np.float32)
+        if self.embeddings.shape[1]:
+            try:
+                query_vectors = self._normalize(self.embedding_function.embed_documents(list(queries)))
+            except Exception as e:
+                print(f"Error embedding queries, using lexical search only: {e}")
+        embedded = np.flatnonzero(query_vectors.any(axis=1))
+        
+        results: List[List[Tuple[Dict[str, Any], float]]] = [[] for _ in queries]
+        if len(embedded):
+            if allowed is not None:
+                rows = np.flatnonzero(allowed)
+                batch = [(rows[ids], scores) for ids, scores in
+                         FlatIndex().search_batch(self.embeddings[rows], query_vectors[embedded], k)]
+            else:
+                batch = self.index.search_batch(self.embeddings, query_vectors[embedded],
+                                                k + self.deleted_count, **search_params)
+            for position, (ids, scores) in zip(embedded, batch):
+                # Same filtering as _vector_rows: no tombstoned or zero (unembedded) rows
+                results[position] = [(self.documents[i], float(score)) for i, score in zip(ids, scores)
+                                     if score != 0 and not self.tombstones[i]
+                                     and (min_score is None or score >= min_score)][:k]
+        
+        for position in np.flatnonzero(~query_vectors.any(axis=1)):
+            results[position] = [(self.documents[i], score)
+                                 for i, score in self._lexical_rows(queries[position], k, allowed)]
+        
+        return results
     
-    def save(self, filepath: str):
-        """Save the vector store to disk"""
-        os.makedirs(os.path.dirname(filepath), exist_ok=True)
-        with open(filepath, 'wb') as f:
-            pickle.dump({
-                'documents': self.documents,
-                'embeddings': self.embeddings
-            }, f)
-        print(f"Vector store saved to {filepath}")
+    def save(self, path: Optional[str] = None):
+        """Save the vector store to disk as raw float32 vectors plus a document sidecar"""
+        path = path or self.persist_path
+        os.makedirs(path, exist_ok=True)
+        
+        manifest = {
+            "format_version": VECTOR_STORE_FORMAT_VERSION,
+            "count": len(self.documents),
+            "dim": int(self.embeddings.shape[1]) if self.embeddings.ndim == 2 else 0,
+            "dtype": "float32",
+            "normalized": True,
+            "generation": self.generation,
+            "tokenizer": self.tokenizer
+        }
+        
+        # Write everything to temporary files first and swap them in, so readers
+        # that have the old vectors memory-mapped never see a half-written file
+        vectors_tmp = os.path.join(path, VECTORS_FILE + ".tmp")
+        with open(vectors_tmp, 'wb') as f:
+            np.save(f, np.ascontiguousarray(self.embeddings, dtype=np.float32))
+        
+        documents_tmp = os.path.join(path, DOCUMENTS_FILE + ".tmp")
+        with open(documents_tmp, 'w') as f:
+            for doc in self.documents:
+                f.write(json.dumps(doc, separators=(",", ":")) + "\n")
+        
+        tombstones_tmp = os.path.join(path, TOMBSTONES_FILE + ".tmp")
+        with open(tombstones_tmp, 'wb') as f:
+            np.save(f, self.tombstones)
+        
+        lexical_tmp = os.path.join(path, LEXICAL_FILE + ".tmp")
+        with open(lexical_tmp, 'w') as f:
+            json.dump(self.lexical.to_dict(), f, separators=(",", ":"))
+        
+        manifest_tmp = os.path.join(path, MANIFEST_FILE + ".tmp")
+        with open(manifest_tmp, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        
+        os.replace(vectors_tmp, os.path.join(path, VECTORS_FILE))
+        os.replace(documents_tmp, os.path.join(path, DOCUMENTS_FILE))
+        os.replace(tombstones_tmp, os.path.join(path, TOMBSTONES_FILE))
+        os.replace(lexical_tmp, os.path.join(path, LEXICAL_FILE))
+        save_index(self.index, path)
+        # The manifest goes last so it only ever describes complete files
+        os.replace(manifest_tmp, os.path.join(path, MANIFEST_FILE))
+        
+        print(f"Vector store saved to {path}")
     
     @classmethod
-    def load(cls, filepath: str, embedding_function):
-        """Load the vector store from disk"""
+    def load(cls, path: str, embedding_function):
+        """Load the vector store (its live version, if versioned) from disk, memory-mapping the vectors"""
+        path = resolve_vector_store(path)
         instance = cls(embedding_function)
+        instance.persist_path = path
+        
+        manifest_path = os.path.join(path, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            print(f"No existing vector store found at {path}")
+            return instance
         
-        if os.path.exists(filepath):
-            with open(filepath, 'rb') as f:
-                data = pickle.load(f)
-                instance.documents = data['documents']
-                instance.embeddings = data['embeddings']
-            print(f"Vector store loaded from {filepath} with {len(instance.documents)} documents")
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+        
+        if manifest.get("format_version") != VECTOR_STORE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported vector store format version {manifest.get('format_version')} in {path}")
+        
+        with open(os.path.join(path, DOCUMENTS_FILE), 'r') as f:
+            instance.documents = [json.loads(line) for line in f if line.strip()]
+        
+        # Vectors are stored normalized, so they can be used straight from the page cache
+        instance.embeddings = np.load(os.path.join(path, VECTORS_FILE), mmap_mode='r')
+        
+        if len(instance.documents) != instance.embeddings.shape[0]:
+            raise ValueError(f"Vector store at {path} is inconsistent: {len(instance.documents)} documents "
+                             f"but {instance.embeddings.shape[0]} vectors")
+        
+        tombstones_path = os.path.join(path, TOMBSTONES_FILE)
+        if os.path.exists(tombstones_path):
+            instance.tombstones = np.load(tombstones_path)
         else:
-            print(f"No existing vector store found at {filepath}")
+            instance.tombstones = np.zeros(len(instance.documents), dtype=bool)
+        instance.deleted_count = int(instance.tombstones.sum())
+        instance.generation = manifest.get("generation", 0)
+        instance.tokenizer = manifest.get("tokenizer")
+        
+        # Stores written before the lexical index existed get one built on load
+        lexical_path = os.path.join(path, LEXICAL_FILE)
+        if os.path.exists(lexical_path):
+            with open(lexical_path, 'r') as f:
+                instance.lexical = BM25Index.from_dict(json.load(f))
+        if len(instance.lexical) != len(instance.documents):
+            instance._rebuild_lexical()
+        instance._rebuild_metadata_index()
+        
+        instance.index = load_index(path, instance.embeddings)
+        
+        print(f"Vector store loaded from {path} with {len(instance.documents)} documents")
+        return instance
+    
+    @classmethod
+    def load_pickle(cls, filepath: str, embedding_function):
+        """Load a vector store saved in the legacy pickle format"""
+        instance = cls(embedding_function)
+        
+        with open(filepath, 'rb') as f:
+            data = pickle.load(f)
+            instance.documents = data['documents']
+            instance._append_embeddings(data['embeddings'])
+        instance._rebuild_lexical()
+        instance._rebuild_metadata_index()
         
         return instance
     
     def as_retriever(self, search_kwargs=None):
         """Return a retriever interface"""
-        search_kwargs = search_kwargs or {"k": 3}
-        
-        class SimpleRetriever:
-            def __init__(self, vector_store, search_kwargs):
-                self.vector_store = vector_store
-                self.search_kwargs = search_kwargs
+        return SimpleRetriever(self, search_kwargs or {"k": 3})
+
+class SimpleRetriever:
+    """Retriever interface over a vector store with fixed search settings"""
+    def __init__(self, vector_store, search_kwargs: Dict[str, Any]):
+        self.vector_store = vector_store
+        self.search_kwargs = search_kwargs
+    
+    def get_relevant_documents(self, query, query_vector=None):
+        return self.vector_store.similarity_search(query, query_vector=query_vector, **self.search_kwargs)
+    
+    def get_relevant_documents_batch(self, queries):
+        # Batched search is vector-only, so drop the options of the hybrid/MMR single-query path
+        search_kwargs = {key: value for key, value in self.search_kwargs.items()
+                         if key not in ("mode", "mmr", "mmr_lambda", "fetch_k", "merge_overlaps")}
+        results = self.vector_store.similarity_search_batch(queries, **search_kwargs)
+        return [[doc for doc, _ in matches] for matches in results]
+
+class SharedVectorStore:
+    """
+    Process-wide, read-only handle on the vector store saved at path. Every
+    session shares the one loaded (memory-mapped) store; when the live version
+    or its manifest on disk changes, at most once per check_interval seconds, a
+    new store is loaded and swapped in atomically. Searches already running
+    keep the store they started with.
+    """
+    def __init__(self, path: str = VECTOR_STORE_DIR, embedding_function=None, check_interval: float = 2.0):
+        self.path = path
+        self.embedding_function = embedding_function or SimpleEmbeddings()
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._store = SimpleVectorStore(self.embedding_function)
+        self._loaded_version = None
+        self._checked_at = 0.0
+        self.reload()
+    
+    def _disk_version(self) -> Optional[tuple]:
+        """Live version directory, and identity and modification time of its manifest (which save() writes last)"""
+        path = resolve_vector_store(self.path)
+        try:
+            stat = os.stat(os.path.join(path, MANIFEST_FILE))
+        except FileNotFoundError:
+            return None
+        return path, stat.st_ino, stat.st_mtime_ns
+    
+    def reload(self, force: bool = False) -> bool:
+        """Load the store from disk if it changed since the last load; returns True if it was swapped"""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            version = self._disk_version()
+            if version is None or (version == self._loaded_version and not force):
+                return False
             
-            def get_relevant_documents(self, query):
-                return self.vector_store.similarity_search(query, **self.search_kwargs)
-        
-        return SimpleRetriever(self, search_kwargs)
+            store = SimpleVectorStore.load(self.path, self.embedding_function)
+            # Rebinding one attribute is atomic, so readers see either the old store or the new one
+            self._store = store
+            self._loaded_version = version
+            return True
+    
+    @property
+    def store(self) -> SimpleVectorStore:
+        """The current store, reloading first if the on-disk copy may have changed"""
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            try:
+                self.reload()
+            except Exception as e:
+                # A failed reload (e.g. a store mid-migration) keeps serving the current store
+                print(f"Error reloading vector store from {self.path}: {e}")
+        return self._store
+    
+    def as_retriever(self, search_kwargs=None):
+        """Return a retriever that always searches the current store"""
+        return SharedRetriever(self, search_kwargs or {"k": 3})
+
+class SharedRetriever(SimpleRetriever):
+    """Retriever over a SharedVectorStore, resolving the current store on every query"""
+    def __init__(self, shared_store: SharedVectorStore, search_kwargs: Dict[str, Any]):
+        self.shared_store = shared_store
+        self.search_kwargs = search_kwargs
+    
+    @property
+    def vector_store(self) -> SimpleVectorStore:
+        return self.shared_store.store
+
+def migrate_pickle_store(pickle_file: str = LEGACY_VECTOR_STORE_FILE,
+                         vector_store_path: str = VECTOR_STORE_DIR,
+                         remove_pickle: bool = False) -> bool:
+    """Convert a legacy vector_store.pkl into the memory-mapped on-disk format"""
+    if not os.path.exists(pickle_file):
+        print(f"No legacy vector store found at {pickle_file}")
+        return False
+    
+    print(f"Migrating legacy vector store {pickle_file} to {vector_store_path}")
+    vector_store = SimpleVectorStore.load_pickle(pickle_file, embedding_function=None)
+    vector_store.save(vector_store_path)
+    
+    if remove_pickle:
+        os.remove(pickle_file)
+    
+    return True
+
+def resolve_vector_store(vector_store_path: str = VECTOR_STORE_DIR) -> str:
+    """Return the directory holding the live store: the version CURRENT names, or the path itself"""
+    try:
+        with open(os.path.join(vector_store_path, CURRENT_FILE), 'r') as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return vector_store_path
+    return os.path.join(vector_store_path, version)
 
-def create_vector_store(processed_data_file: str = 'data/processed_data.json', 
-                        vector_store_file: str = 'data/vector_store.pkl'):
-    """Create or load a vector store from processed data"""
+def vector_store_exists(vector_store_path: str = VECTOR_STORE_DIR,
+                        legacy_file: str = LEGACY_VECTOR_STORE_FILE) -> bool:
+    """Check whether a vector store (in either format) is available on disk"""
+    return (os.path.exists(os.path.join(resolve_vector_store(vector_store_path), MANIFEST_FILE))
+            or os.path.exists(legacy_file))
+
+def create_vector_store(processed_data_file: str = PROCESSED_DATA_FILE, 
+                        vector_store_path: str = VECTOR_STORE_DIR,
+                        index_backend: Optional[str] = None,
+                        **index_params):
+    """
+    Create or load a vector store from processed data. Processed data chunked
+    with a different tokenizer than the current one is re-chunked first. An
+    existing store is incrementally synced with the processed data when that
+    file is newer or was chunked differently. If index_backend is given ("flat",
+    "ivf", "int8" or "pq"), the store is (re)indexed with it using index_params.
+    """
     # Initialize embeddings function
     embeddings_function = SimpleEmbeddings()
     
+    if os.path.exists(processed_data_file) and not processed_data_is_current(processed_data_file):
+        process_scraped_data(output_file=processed_data_file)
+    tokenizer = read_processed_metadata(processed_data_file).get("tokenizer")
+    
+    # Upgrade a legacy pickle store in place the first time we see one
+    manifest_file = os.path.join(resolve_vector_store(vector_store_path), MANIFEST_FILE)
+    if not os.path.exists(manifest_file):
+        migrate_pickle_store(LEGACY_VECTOR_STORE_FILE, vector_store_path)
+    
     # Try to load existing vector store
-    if os.path.exists(vector_store_file):
-        print(f"Loading existing vector store from {vector_store_file}")
-        return SimpleVectorStore.load(vector_store_file, embeddings_function)
+    if os.path.exists(manifest_file):
+        print(f"Loading existing vector store from {vector_store_path}")
+        vector_store = SimpleVectorStore.load(vector_store_path, embeddings_function)
+        
+        # Fold in processed data that is newer than the stored index or was chunked
+        # with another tokenizer, embedding only what changed
+        manifest_mtime = os.path.getmtime(manifest_file)
+        if os.path.exists(processed_data_file) and (os.path.getmtime(processed_data_file) > manifest_mtime
+                                                    or vector_store.tokenizer != tokenizer):
+            vector_store.sync_documents(iter_processed_data(processed_data_file))
+            if vector_store.tokenizer != tokenizer:
+                vector_store.tokenizer = tokenizer
+                vector_store.save()
+        
+        if index_backend and (vector_store.index.name != index_backend or index_params):
+            print(f"Rebuilding vector store index with the '{index_backend}' backend")
+            vector_store.set_index(index_backend, **index_params)
+            vector_store.save()
+        
+        return vector_store
     
     # Load processed data
     if not os.path.exists(processed_data_file):
         print(f"Processed data file {processed_data_file} not found")
         return SimpleVectorStore(embeddings_function)
     
-    with open(processed_data_file, 'r') as f:
-        processed_data = json.load(f)
-    
-    # Create vector store
-    vector_store = SimpleVectorStore(embeddings_function)
-    vector_store.add_documents(processed_data)
+    # Create vector store, streaming chunks in batches
+    index = create_index(index_backend, **index_params) if index_backend else None
+    vector_store = SimpleVectorStore(embeddings_function, index=index)
+    vector_store.persist_path = vector_store_path
+    vector_store.tokenizer = tokenizer
+    vector_store.sync_documents(iter_processed_data(processed_data_file))
     
     return vector_store
 
 if __name__ == "__main__":
     # If no processed data, generate it
-    if not os.path.exists('data/processed_data.json'):
-        from data_processor import process_scraped_data
+    if not os.path.exists(PROCESSED_DATA_FILE):
+        from .data_processor import process_scraped_data
         
         # If no scraped data, scrape it
         if not os.path.exists('data/scraped_data.json') and not os.path.exists('data/fallback_data.json'):
-            from scraper import get_fallback_data
+            from .scraper import get_fallback_data
             get_fallback_data()
         
         process_scraped_data()
@@ -0,0 +1,270 @@
+import glob
+import json
+import os
+import re
+import sys
+import time
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional, Tuple
+from bs4 import BeautifulSoup
+
+# lxml is optional; when installed it gives the fastest extraction path
+try:
+    import lxml.html
+    from lxml import etree
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+HEADING_TAGS = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+# Site chrome and non-content elements whose text never belongs in the knowledge base
+BOILERPLATE_TAGS = {'nav', 'footer', 'aside', 'script', 'style', 'noscript', 'template', 'svg', 'iframe'}
+BOILERPLATE_ROLES = {'navigation', 'contentinfo', 'banner'}
+# Block-level tags that implicitly close an open <p>
+BLOCK_TAGS = HEADING_TAGS | {
+    'p', 'div', 'section', 'article', 'ul', 'ol', 'li', 'table', 'blockquote', 'pre', 'form', 'header', 'main'
+}
+
+# Elements that never have an end tag, so they must not open a level while skipping boilerplate
+VOID_TAGS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param', 'source', 'track', 'wbr'
+}
+
+_WHITESPACE = re.compile(r'\s+')
+# lxml rejects str input that still carries an encoding declaration
+_XML_DECLARATION = re.compile(r'^\s*<\?xml[^>]*\?>')
+
+def clean_text(text: str) -> str:
+    """Collapse runs of whitespace and trim"""
+    return _WHITESPACE.sub(' ', text).strip()
+
+def _page(url: str, title: Optional[str], headings: List[str], paragraphs: List[str]) -> Dict[str, Any]:
+    """Build a page in the scraped_data.json schema"""
+    return {
+        "title": title or url.split('/')[-1],
+        "url": url,
+        "headings": headings,
+        "paragraphs": paragraphs
+    }
+
+class BeautifulSoupExtractor:
+    """Original extraction path: full BeautifulSoup tree, then one find_all per element type"""
+    name = "beautifulsoup"
+
+    def extract(self, url: str, html: str) -> Tuple[Dict[str, Any], List[str]]:
+        """Extract title, headings and paragraphs from a page, plus the links it contains"""
+        soup = BeautifulSoup(html, 'html.parser')
+
+        # Extract page title
+        title = soup.title.string if soup.title else None
+
+        paragraphs = soup.find_all('p')
+        headings = soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
+        links = [a['href'] for a in soup.find_all('a', href=True)]
+
+        page = _page(
+            url,
+            title,
+            [h.get_text(strip=True) for h in headings if h.get_text(strip=True)],
+            [p.get_text(strip=True) for p in paragraphs if p.get_text(strip=True)]
+        )
+        return page, links
+
+class _StreamingParser(HTMLParser):
+    """Collects title, headings, paragraphs and links in a single pass over the markup"""
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title: Optional[str] = None
+        self.headings: List[str] = []
+        self.paragraphs: List[str] = []
+        self.links: List[str] = []
+
+        self._in_title = False
+        self._title_parts: List[str] = []
+        # Elements open inside (and including) the outermost boilerplate element;
+        # text is ignored while this is non-empty
+        self._skip_stack: List[str] = []
+        # Tag of the heading or paragraph currently being captured, and its text
+        self._capture_tag: Optional[str] = None
+        self._capture_parts: List[str] = []
+
+    def _flush(self):
+        """Finish the heading or paragraph being captured"""
+        if self._capture_tag is None:
+            return
+        text = clean_text(''.join(self._capture_parts))
+        if text:
+            (self.headings if self._capture_tag in HEADING_TAGS else self.paragraphs).append(text)
+        self._capture_tag = None
+        self._capture_parts = []
+
+    def handle_starttag(self, tag, attrs):
+        attributes = dict(attrs)
+        # Navigation links are boilerplate text but still how the crawler discovers pages
+        if tag == 'a' and attributes.get('href'):
+            self.links.append(attributes['href'])
+
+        if self._skip_stack:
+            # Track every nested element, so an inner </div> cannot end a <div role="navigation">
+            if tag not in VOID_TAGS:
+                self._skip_stack.append(tag)
+            return
+
+        if tag in BOILERPLATE_TAGS or attributes.get('role') in BOILERPLATE_ROLES:
+            self._flush()
+            self._skip_stack.append(tag)
+            return
+
+        if tag == 'title' and self.title is None:
+            self._in_title = True
+        elif tag in HEADING_TAGS or tag == 'p':
+            self._flush()
+            self._capture_tag = tag
+        elif tag in BLOCK_TAGS and self._capture_tag == 'p':
+            # HTML lets a block element end an unclosed paragraph
+            self._flush()
+        elif tag == 'br' and self._capture_tag:
+            self._capture_parts.append(' ')
+
+    def handle_endtag(self, tag):
+        if self._skip_stack:
+            if tag in self._skip_stack:
+                # Close the innermost matching element along with any unclosed ones inside it
+                position = len(self._skip_stack) - 1 - self._skip_stack[::-1].index(tag)
+                del self._skip_stack[position:]
+            return
+
+        if tag == 'title' and self._in_title:
+            self._in_title = False
+            self.title = clean_text(''.join(self._title_parts)) or None
+        elif tag == self._capture_tag:
+            self._flush()
+
+    def handle_data(self, data):
+        if self._skip_stack:
+            return
+        if self._in_title:
+            self._title_parts.append(data)
+        elif self._capture_tag:
+            self._capture_parts.append(data)
+
+    def close(self):
+        super().close()
+        self._flush()
+
+class StreamingExtractor:
+    """Single-pass extractor on the standard library's html.parser, dropping nav/footer boilerplate"""
+    name = "streaming"
+
+    def extract(self, url: str, html: str) -> Tuple[Dict[str, Any], List[str]]:
+        """Extract title, headings and paragraphs from a page, plus the links it contains"""
+        parser = _StreamingParser()
+        parser.feed(html)
+        parser.close()
+        return _page(url, parser.title, parser.headings, parser.paragraphs), parser.links
+
+class LxmlExtractor:
+    """C-accelerated extractor on lxml, dropping nav/footer boilerplate"""
+    name = "lxml"
+
+    def extract(self, url: str, html: str) -> Tuple[Dict[str, Any], List[str]]:
+        """Extract title, headings and paragraphs from a page, plus the links it contains"""
+        try:
+            root = lxml.html.fromstring(_XML_DECLARATION.sub('', html, count=1))
+        except (etree.ParserError, ValueError):
+            # Empty, comment-only or otherwise unparseable documents have no content
+            return _page(url, None, [], []), []
+
+        title_element = root.find('.//title')
+        title = clean_text(title_element.text_content()) if title_element is not None else None
+
+        # Collect links before dropping boilerplate: navigation is how the crawler finds pages
+        links = [href for href in root.xpath('//a/@href') if href]
+
+        boilerplate = root.xpath(
+            '//' + ' | //'.join(sorted(BOILERPLATE_TAGS)) +
+            ''.join(f' | //*[@role="{role}"]' for role in sorted(BOILERPLATE_ROLES))
+        )
+        for element in boilerplate:
+            if element.getparent() is not None:
+                element.drop_tree()
+
+        # text_content() joins text nodes directly, so give line breaks a separator
+        for br in root.iter('br'):
+            br.tail = ' ' + (br.tail or '')
+
+        headings = []
+        paragraphs = []
+        for element in root.iter('h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'p'):
+            text = clean_text(element.text_content())
+            if text:
+                (headings if element.tag in HEADING_TAGS else paragraphs).append(text)
+
+        return _page(url, title, headings, paragraphs), links
+
+EXTRACTORS = {
+    BeautifulSoupExtractor.name: BeautifulSoupExtractor,
+    StreamingExtractor.name: StreamingExtractor
+}
+if HAS_LXML:
+    EXTRACTORS[LxmlExtractor.name] = LxmlExtractor
+
+# Fastest extractor available in this environment
+DEFAULT_EXTRACTOR = LxmlExtractor.name if HAS_LXML else StreamingExtractor.name
+
+def get_extractor(name: Optional[str] = None):
+    """Create an extractor by name, defaulting to the fastest one available"""
+    name = name or DEFAULT_EXTRACTOR
+    if name not in EXTRACTORS:
+        raise ValueError(f"Unknown extractor '{name}'. Available: {', '.join(EXTRACTORS)}")
+    return EXTRACTORS[name]()
+
+def benchmark_extractors(pages: List[str], repeat: int = 3) -> Dict[str, Dict[str, float]]:
+    """Time every available extractor over a list of HTML documents"""
+    total_bytes = sum(len(html.encode('utf-8')) for html in pages)
+    results = {}
+
+    for name in EXTRACTORS:
+        extractor = get_extractor(name)
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for html in pages:
+                extractor.extract("https://able.co/", html)
+            best = min(best, time.perf_counter() - start)
+
+        results[name] = {
+            "ms_per_page": 1000 * best / len(pages),
+            "mb_per_sec": total_bytes / best / 1e6
+        }
+        print(f"{name:>14}: {results[name]['ms_per_page']:.3f} ms/page, {results[name]['mb_per_sec']:.1f} MB/s")
+
+    return results
+
+def _sample_pages(scraped_data_file: str = 'data/scraped_data.json') -> List[str]:
+    """Rebuild HTML pages, with typical site chrome, from previously scraped content"""
+    with open(scraped_data_file, 'r') as f:
+        scraped_data = json.load(f)
+
+    nav = '<nav><ul>' + ''.join(f'<li><a href="/{name}">{name}</a></li>' for name in scraped_data) + '</ul></nav>'
+    footer = '<footer><p>&copy; Able. All rights reserved.</p><a href="/privacy">Privacy</a></footer>'
+    pages = []
+    for page in scraped_data.values():
+        body = ''.join(f'<h2>{heading}</h2>' for heading in page.get('headings', []))
+        body += ''.join(f'<div class="block"><p>{paragraph}</p></div>' for paragraph in page.get('paragraphs', []))
+        pages.append(f'<html><head><title>{page.get("title", "")}</title>'
+                     f'<script>var x = 1;</script></head><body>{nav}<main>{body}</main>{footer}</body></html>')
+    return pages
+
+if __name__ == "__main__":
+    # Benchmark on pages saved by the crawler (html_dir) if given, else on rebuilt sample pages
+    if len(sys.argv) > 1:
+        pages = []
+        for path in sorted(glob.glob(os.path.join(sys.argv[1], '*.html'))):
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                pages.append(f.read())
+    else:
+        pages = _sample_pages() * 20
+
+    print(f"Benchmarking extractors on {len(pages)} pages")
+    benchmark_extractors(pages)
@@ -0,0 +1,617 @@
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+# Index files live next to the vectors in the vector store directory
+INDEX_FILE = "index.json"
+
+# Rows scored per matrix product when assigning vectors to clusters
+ASSIGN_CHUNK_SIZE = 4096
+
+# Rows of int8 codes decoded at once; the float copy (~1 MB at 256 dimensions) stays in cache
+DECODE_CHUNK_SIZE = 1024
+
+# Rows of PQ codes scanned at once, so each lookup table gather works on a cache-sized slice
+SCAN_CHUNK_SIZE = 32768
+
+# Scores held in memory at once by batched search (~64 MB of float32)
+BATCH_SCORE_ELEMENTS = 1 << 24
+
+# Trained indexes (IVF clusters, quantizers) are retrained from scratch once the
+# number of vectors exceeds this multiple of the number they were trained on
+RETRAIN_GROWTH = 2.0
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Return the positions of the k highest scores, best first"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+
+    # argpartition avoids sorting the whole array; only the k winners are sorted
+    candidates = np.argpartition(scores, -k)[-k:]
+    return candidates[np.argsort(scores[candidates])[::-1]]
+
+def top_k_rows(scores: np.ndarray, k: int) -> np.ndarray:
+    """Return the column positions of the k highest scores in each row, best first"""
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.zeros((len(scores), 0), dtype=np.int64)
+
+    candidates = np.argpartition(scores, -k, axis=1)[:, -k:]
+    order = np.argsort(np.take_along_axis(scores, candidates, axis=1), axis=1)[:, ::-1]
+    return np.take_along_axis(candidates, order, axis=1)
+
+class FlatIndex:
+    """Exact brute-force index: scores every stored vector"""
+    name = "flat"
+
+    def params(self) -> Dict[str, Any]:
+        """Return the index parameters that should be persisted"""
+        return {}
+
+    def build(self, vectors: np.ndarray):
+        """Build the index over all vectors"""
+        pass
+
+    def add(self, vectors: np.ndarray, new_vectors: np.ndarray):
+        """Index vectors that were appended to the end of the matrix"""
+        pass
+
+    def remove(self, keep: np.ndarray):
+        """Drop rows where keep is False, renumbering the remaining rows"""
+        pass
+
+    def search(self, vectors: np.ndarray, query: np.ndarray, k: int, **kwargs) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (row ids, scores) of the k nearest vectors to a normalized query"""
+        if len(vectors) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        scores = vectors @ query
+        ids = top_k(scores, k)
+        return ids, scores[ids]
+
+    def search_batch(self, vectors: np.ndarray, queries: np.ndarray, k: int,
+                     chunk_size: Optional[int] = None, **kwargs) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Return (row ids, scores) per query, scoring a chunk of queries against all
+        vectors with one matrix-matrix product. Chunks are sized so that at most
+        BATCH_SCORE_ELEMENTS scores are held at once.
+        """
+        if len(vectors) == 0:
+            return [(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)) for _ in queries]
+
+        chunk_size = chunk_size or max(1, BATCH_SCORE_ELEMENTS // len(vectors))
+        results = []
+        for start in range(0, len(queries), chunk_size):
+            scores = queries[start:start + chunk_size] @ vectors.T
+            ids = top_k_rows(scores, k)
+            best = np.take_along_axis(scores, ids, axis=1)
+            results.extend(zip(ids, best))
+        return results
+
+    def save(self, path: str):
+        """Persist index structures next to the vectors"""
+        pass
+
+    def load(self, path: str):
+        """Load index structures saved by save()"""
+        pass
+
+class IVFIndex:
+    """
+    Approximate inverted-file index. Vectors are grouped into n_lists clusters with
+    spherical k-means; a query only scores the vectors in its n_probe closest clusters.
+    Raising n_probe trades latency for recall. n_lists defaults to sqrt(n) and
+    the clusters are retrained as the store grows (see RETRAIN_GROWTH).
+    """
+    name = "ivf"
+
+    def __init__(self, n_lists: Optional[int] = None, n_probe: int = 8,
+                 n_iter: int = 10, max_train_size: int = 50000, seed: int = 0,
+                 trained_size: int = 0):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.n_iter = n_iter
+        self.max_train_size = max_train_size
+        self.seed = seed
+        # Number of vectors the current centroids were trained on
+        self.trained_size = trained_size
+
+        self.centroids: Optional[np.ndarray] = None
+        self.assignments = np.zeros(0, dtype=np.int32)
+        # Row ids grouped by list; list i occupies list_ids[offsets[i]:offsets[i+1]]
+        self.list_ids = np.zeros(0, dtype=np.int64)
+        self.offsets = np.zeros(1, dtype=np.int64)
+
+    def params(self) -> Dict[str, Any]:
+        """Return the index parameters that should be persisted"""
+        return {
+            "n_lists": self.n_lists,
+            "n_probe": self.n_probe,
+            "n_iter": self.n_iter,
+            "max_train_size": self.max_train_size,
+            "seed": self.seed,
+            "trained_size": self.trained_size
+        }
+
+    def build(self, vectors: np.ndarray):
+        """Train the coarse clusters and assign every vector to one"""
+        n = len(vectors)
+        self.trained_size = n
+        if n == 0:
+            self.centroids = None
+            self._set_assignments(np.zeros(0, dtype=np.int32))
+            return
+
+        n_lists = min(self.n_lists or max(1, int(np.sqrt(n))), n)
+        self.centroids = self._train(vectors, n_lists)
+        self._set_assignments(self._assign(vectors))
+
+    def add(self, vectors: np.ndarray, new_vectors: np.ndarray):
+        """Assign appended vectors to the existing clusters, retraining once the store has outgrown them"""
+        if self.centroids is None or len(vectors) > RETRAIN_GROWTH * self.trained_size:
+            self.build(vectors)
+            return
+
+        self._set_assignments(np.concatenate([self.assignments, self._assign(new_vectors)]))
+
+    def remove(self, keep: np.ndarray):
+        """Drop rows where keep is False, renumbering the remaining rows"""
+        if self.centroids is not None:
+            self._set_assignments(self.assignments[keep])
+
+    def search(self, vectors: np.ndarray, query: np.ndarray, k: int,
+               n_probe: Optional[int] = None, **kwargs) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (row ids, scores) of the approximate k nearest vectors"""
+        if self.centroids is None or len(vectors) == 0:
+            return FlatIndex().search(vectors, query, k)
+
+        n_probe = min(n_probe or self.n_probe, len(self.centroids))
+        probe_lists = top_k(self.centroids @ query, n_probe)
+
+        candidates = np.concatenate([
+            self.list_ids[self.offsets[i]:self.offsets[i + 1]] for i in probe_lists
+        ])
+        if len(candidates) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        # Score candidates exactly against the full-precision vectors
+        candidates.sort()
+        scores = vectors[candidates] @ query
+        best = top_k(scores, k)
+        return candidates[best], scores[best]
+
+    def search_batch(self, vectors: np.ndarray, queries: np.ndarray, k: int,
+                     n_probe: Optional[int] = None, **kwargs) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Return (row ids, scores) per query; every query probes its own clusters"""
+        if self.centroids is None or len(vectors) == 0:
+            return FlatIndex().search_batch(vectors, queries, k)
+        return [self.search(vectors, query, k, n_probe=n_probe) for query in queries]
+
+    def save(self, path: str):
+        """Persist centroids and cluster assignments"""
+        if self.centroids is None:
+            return
+        np.save(os.path.join(path, "ivf_centroids.npy"), self.centroids)
+        np.save(os.path.join(path, "ivf_assignments.npy"), self.assignments)
+
+    def load(self, path: str):
+        """Load centroids and cluster assignments saved by save()"""
+        centroids_file = os.path.join(path, "ivf_centroids.npy")
+        if not os.path.exists(centroids_file):
+            return
+        self.centroids = np.load(centroids_file)
+        self._set_assignments(np.load(os.path.join(path, "ivf_assignments.npy")))
+
+    def _train(self, vectors: np.ndarray, n_lists: int) -> np.ndarray:
+        """Run spherical k-means with n_lists clusters on a sample of the vectors"""
+        rng = np.random.default_rng(self.seed)
+        n = len(vectors)
+
+        sample_ids = rng.choice(n, size=min(n, self.max_train_size), replace=False)
+        sample_ids.sort()
+        sample = np.asarray(vectors[sample_ids], dtype=np.float32)
+
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+        for _ in range(self.n_iter):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for i in range(n_lists):
+                members = sample[labels == i]
+                if len(members) == 0:
+                    # Re-seed empty clusters from a random training vector
+                    centroids[i] = sample[rng.integers(len(sample))]
+                else:
+                    centroids[i] = members.sum(axis=0)
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids /= norms
+
+        return np.ascontiguousarray(centroids, dtype=np.float32)
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        """Return the closest centroid for each vector, scoring in bounded chunks"""
+        labels = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), ASSIGN_CHUNK_SIZE):
+            chunk = vectors[start:start + ASSIGN_CHUNK_SIZE]
+            labels[start:start + len(chunk)] = np.argmax(chunk @ self.centroids.T, axis=1)
+        return labels
+
+    def _set_assignments(self, assignments: np.ndarray):
+        """Rebuild the inverted lists from per-vector cluster labels"""
+        self.assignments = assignments.astype(np.int32, copy=False)
+        n_lists = len(self.centroids) if self.centroids is not None else 0
+        self.list_ids = np.argsort(self.assignments, kind="stable").astype(np.int64)
+        counts = np.bincount(self.assignments, minlength=n_lists)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+class QuantizedIndex:
+    """
+    Base for two-stage indexes over compressed codes. A search first scans the
+    codes for approximate scores, then re-ranks the best `rerank` candidates
+    exactly against the full-precision vectors. Only the codes need to stay in
+    memory; the float rows are read just for those candidates, so a memory-mapped
+    matrix can stay mostly on disk. Subclasses train and apply the encoding and
+    set code_axis, the axis of the codes array that runs over rows; like IVF,
+    the quantizer is retrained as the store grows.
+    """
+    code_axis = 0
+
+    def __init__(self, rerank: int = 100, trained_size: int = 0):
+        self.rerank = rerank
+        # Number of vectors the current quantizer was trained on
+        self.trained_size = trained_size
+        self.codes: Optional[np.ndarray] = None
+
+    @property
+    def count(self) -> int:
+        """Number of encoded rows"""
+        return 0 if self.codes is None else self.codes.shape[self.code_axis]
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the codes and the trained quantizer"""
+        return sum(array.nbytes for array in self._arrays().values() if array is not None)
+
+    def build(self, vectors: np.ndarray):
+        """Train the quantizer on the vectors and encode all of them"""
+        self.trained_size = len(vectors)
+        if len(vectors) == 0:
+            self.codes = None
+            return
+        self._train(vectors)
+        self.codes = self._encode_all(vectors)
+
+    def add(self, vectors: np.ndarray, new_vectors: np.ndarray):
+        """Encode appended vectors, retraining once the store has outgrown the quantizer"""
+        if self.codes is None or len(vectors) > RETRAIN_GROWTH * self.trained_size:
+            self.build(vectors)
+            return
+        self.codes = np.concatenate([self.codes, self._encode_all(new_vectors)], axis=self.code_axis)
+
+    def remove(self, keep: np.ndarray):
+        """Drop rows where keep is False, renumbering the remaining rows"""
+        if self.codes is not None:
+            self.codes = np.ascontiguousarray(self.codes.compress(keep, axis=self.code_axis))
+
+    def search(self, vectors: np.ndarray, query: np.ndarray, k: int,
+               rerank: Optional[int] = None, **kwargs) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (row ids, scores) of the approximate k nearest vectors, with exact scores"""
+        return self.search_batch(vectors, query[np.newaxis], k, rerank=rerank)[0]
+
+    def search_batch(self, vectors: np.ndarray, queries: np.ndarray, k: int,
+                     rerank: Optional[int] = None, **kwargs) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Return (row ids, scores) per query, scanning the codes for a chunk of queries at once"""
+        if self.codes is None or len(vectors) == 0:
+            return FlatIndex().search_batch(vectors, queries, k)
+
+        n_candidates = max(rerank or self.rerank, k)
+        chunk_size = max(1, BATCH_SCORE_ELEMENTS // self.count)
+        results = []
+        for start in range(0, len(queries), chunk_size):
+            chunk = queries[start:start + chunk_size]
+            candidates = top_k_rows(self._approximate_scores(chunk), n_candidates)
+            for query, rows in zip(chunk, candidates):
+                # Sorted rows read the (possibly memory-mapped) matrix in file order
+                rows = np.sort(rows)
+                scores = vectors[rows] @ query
+                best = top_k(scores, k)
+                results.append((rows[best], scores[best]))
+        return results
+
+    def save(self, path: str):
+        """Persist the codes and the trained quantizer"""
+        if self.codes is None:
+            return
+        for name, array in self._arrays().items():
+            np.save(os.path.join(path, f"{self.name}_{name}.npy"), array)
+
+    def load(self, path: str):
+        """Load the codes and quantizer saved by save()"""
+        files = {name: os.path.join(path, f"{self.name}_{name}.npy") for name in self._arrays()}
+        if all(os.path.exists(file) for file in files.values()):
+            for name, file in files.items():
+                setattr(self, name, np.load(file))
+
+    def _encode_all(self, vectors: np.ndarray) -> np.ndarray:
+        """Encode vectors in bounded chunks"""
+        return np.concatenate([self._encode(np.asarray(vectors[start:start + ASSIGN_CHUNK_SIZE], dtype=np.float32))
+                               for start in range(0, len(vectors), ASSIGN_CHUNK_SIZE)], axis=self.code_axis)
+
+class ScalarQuantizedIndex(QuantizedIndex):
+    """
+    Per-dimension 8-bit scalar quantization: each dimension's range over the
+    training vectors is split into 256 steps, so a vector costs one byte per
+    dimension (4x smaller than float32). This is a memory option, not a speed
+    one: numpy has no fast integer dot product, so the scan decodes the codes
+    to float and takes about as long as exact search.
+    """
+    name = "int8"
+
+    def __init__(self, rerank: int = 100, trained_size: int = 0):
+        super().__init__(rerank, trained_size)
+        self.offset: Optional[np.ndarray] = None
+        self.scale: Optional[np.ndarray] = None
+
+    def params(self) -> Dict[str, Any]:
+        """Return the index parameters that should be persisted"""
+        return {"rerank": self.rerank, "trained_size": self.trained_size}
+
+    def _arrays(self) -> Dict[str, Optional[np.ndarray]]:
+        return {"codes": self.codes, "offset": self.offset, "scale": self.scale}
+
+    def _train(self, vectors: np.ndarray):
+        """Record each dimension's minimum and step size"""
+        low = np.full(vectors.shape[1], np.inf, dtype=np.float32)
+        high = np.full(vectors.shape[1], -np.inf, dtype=np.float32)
+        for start in range(0, len(vectors), ASSIGN_CHUNK_SIZE):
+            chunk = vectors[start:start + ASSIGN_CHUNK_SIZE]
+            low = np.minimum(low, chunk.min(axis=0))
+            high = np.maximum(high, chunk.max(axis=0))
+        self.offset = low
+        self.scale = np.maximum(high - low, 1e-12).astype(np.float32) / 255
+
+    def _encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.rint((vectors - self.offset) / self.scale)
+        # Vectors added after training may fall outside the trained range
+        return np.clip(codes, 0, 255).astype(np.uint8)
+
+    def _approximate_scores(self, queries: np.ndarray) -> np.ndarray:
+        """Score queries against the decoded codes: q.x ~ q.offset + (q * scale).codes"""
+        weights = (queries * self.scale).T.astype(np.float32)
+        scores = np.empty((len(queries), self.count), dtype=np.float32)
+        # Decode into one reused buffer rather than a fresh float copy per chunk
+        decoded = np.empty((DECODE_CHUNK_SIZE, self.codes.shape[1]), dtype=np.float32)
+        for start in range(0, self.count, DECODE_CHUNK_SIZE):
+            chunk = decoded[:min(DECODE_CHUNK_SIZE, self.count - start)]
+            np.copyto(chunk, self.codes[start:start + len(chunk)], casting="unsafe")
+            scores[:, start:start + len(chunk)] = (chunk @ weights).T
+        scores += (queries @ self.offset)[:, np.newaxis]
+        return scores
+
+class ProductQuantizedIndex(QuantizedIndex):
+    """
+    Product quantization: vectors are split into n_subvectors slices and each
+    slice is replaced by the id of its nearest of 256 k-means centroids, so a
+    vector costs n_subvectors bytes (32x smaller than float32 with the default of
+    one byte per 8 dimensions). Approximate scores are summed from per-query
+    lookup tables of slice-to-centroid dot products. Codes are stored one row
+    per subvector, so each table lookup gathers over a contiguous array.
+    """
+    name = "pq"
+    code_axis = 1
+
+    def __init__(self, n_subvectors: Optional[int] = None, rerank: int = 100,
+                 n_iter: int = 15, max_train_size: int = 20000, seed: int = 0,
+                 trained_size: int = 0):
+        super().__init__(rerank, trained_size)
+        self.n_subvectors = n_subvectors
+        self.n_iter = n_iter
+        self.max_train_size = max_train_size
+        self.seed = seed
+        # (n_subvectors, n_centroids, slice dimensions)
+        self.codebooks: Optional[np.ndarray] = None
+
+    def params(self) -> Dict[str, Any]:
+        """Return the index parameters that should be persisted"""
+        return {
+            "n_subvectors": self.n_subvectors,
+            "rerank": self.rerank,
+            "n_iter": self.n_iter,
+            "max_train_size": self.max_train_size,
+            "seed": self.seed,
+            "trained_size": self.trained_size
+        }
+
+    def _arrays(self) -> Dict[str, Optional[np.ndarray]]:
+        return {"codes": self.codes, "codebooks": self.codebooks}
+
+    def _train(self, vectors: np.ndarray):
+        """Run k-means on each slice of a sample of the vectors"""
+        dim = vectors.shape[1]
+        n_subvectors = self.n_subvectors or max(1, dim // 8)
+        if dim % n_subvectors:
+            raise ValueError(f"n_subvectors={n_subvectors} does not divide the dimension {dim}")
+        self.n_subvectors = n_subvectors
+
+        rng = np.random.default_rng(self.seed)
+        sample_ids = np.sort(rng.choice(len(vectors), size=min(len(vectors), self.max_train_size), replace=False))
+        sample = np.asarray(vectors[sample_ids], dtype=np.float32).reshape(len(sample_ids), n_subvectors, -1)
+        n_centroids = min(256, len(sample))
+
+        codebooks = []
+        for part in range(n_subvectors):
+            points = np.ascontiguousarray(sample[:, part])
+            centroids = points[rng.choice(len(points), size=n_centroids, replace=False)].copy()
+            for _ in range(self.n_iter):
+                labels = self._nearest(points, centroids)
+                counts = np.bincount(labels, minlength=n_centroids)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, labels, points)
+                empty = counts == 0
+                centroids[~empty] = sums[~empty] / counts[~empty, np.newaxis]
+                # Re-seed empty clusters from random training points
+                centroids[empty] = points[rng.integers(len(points), size=int(empty.sum()))]
+            codebooks.append(centroids)
+        self.codebooks = np.stack(codebooks).astype(np.float32)
+
+    @staticmethod
+    def _nearest(points: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        """Return the closest centroid (Euclidean) for each point"""
+        # argmin |p - c|^2 = argmax (p.c - |c|^2 / 2)
+        return np.argmax(points @ centroids.T - 0.5 * (centroids ** 2).sum(axis=1), axis=1)
+
+    def _encode(self, vectors: np.ndarray) -> np.ndarray:
+        """Return the centroid ids of the vectors' slices, shaped (n_subvectors, len(vectors))"""
+        parts = vectors.reshape(len(vectors), self.n_subvectors, -1)
+        codes = np.empty((self.n_subvectors, len(vectors)), dtype=np.uint8)
+        for part in range(self.n_subvectors):
+            codes[part] = self._nearest(parts[:, part], self.codebooks[part])
+        return codes
+
+    def _approximate_scores(self, queries: np.ndarray) -> np.ndarray:
+        """Sum each query's lookup-table entries for every row's centroid ids"""
+        parts = queries.reshape(len(queries), self.n_subvectors, -1).astype(np.float32)
+        # tables[q, part, centroid] = query slice . centroid
+        tables = np.einsum("qpd,pcd->qpc", parts, self.codebooks)
+        scores = np.zeros((len(queries), self.count), dtype=np.float32)
+        # A slice of rows at a time keeps its codes and running scores in cache for every query
+        for start in range(0, self.count, SCAN_CHUNK_SIZE):
+            codes = self.codes[:, start:start + SCAN_CHUNK_SIZE]
+            for row, table in zip(scores, tables):
+                partial = row[start:start + codes.shape[1]]
+                for part in range(self.n_subvectors):
+                    partial += table[part].take(codes[part])
+        return scores
+
+class MetadataIndex:
+    """
+    Posting lists of row ids for every scalar metadata value, so filters like
+    {"section": ["careers", "about"], "type": "paragraph"} resolve to the
+    matching rows without looking at the documents. A filter value that is a
+    list, tuple or set matches any of its members; fields are ANDed together.
+    """
+    def __init__(self):
+        self.postings: Dict[str, Dict[Any, List[int]]] = {}
+        self.count = 0
+
+    def add(self, metadatas: List[Dict[str, Any]]):
+        """Index the metadata of rows appended to the end of the store"""
+        for metadata in metadatas:
+            for field, value in metadata.items():
+                if isinstance(value, (str, int, float, bool)) or value is None:
+                    self.postings.setdefault(field, {}).setdefault(value, []).append(self.count)
+            self.count += 1
+
+    def rows(self, filter: Dict[str, Any]) -> np.ndarray:
+        """Return a boolean mask of the rows matching every field of the filter"""
+        mask = np.ones(self.count, dtype=bool)
+        for field, expected in filter.items():
+            values = expected if isinstance(expected, (list, tuple, set, frozenset)) else [expected]
+            by_value = self.postings.get(field, {})
+            field_mask = np.zeros(self.count, dtype=bool)
+            for value in values:
+                field_mask[by_value.get(value, [])] = True
+            mask &= field_mask
+        return mask
+
+INDEX_BACKENDS = {
+    FlatIndex.name: FlatIndex,
+    IVFIndex.name: IVFIndex,
+    ScalarQuantizedIndex.name: ScalarQuantizedIndex,
+    ProductQuantizedIndex.name: ProductQuantizedIndex
+}
+
+def create_index(backend: str = "flat", **params):
+    """Create an index backend by name"""
+    if backend not in INDEX_BACKENDS:
+        raise ValueError(f"Unknown index backend '{backend}'. Available: {', '.join(INDEX_BACKENDS)}")
+    return INDEX_BACKENDS[backend](**params)
+
+def save_index(index, path: str):
+    """Persist an index and its configuration into a vector store directory"""
+    index.save(path)
+    with open(os.path.join(path, INDEX_FILE), 'w') as f:
+        json.dump({"backend": index.name, "params": index.params()}, f, indent=2)
+
+def load_index(path: str, vectors: np.ndarray):
+    """Load the index saved in a vector store directory, defaulting to exact search"""
+    index_file = os.path.join(path, INDEX_FILE)
+    if not os.path.exists(index_file):
+        return FlatIndex()
+
+    with open(index_file, 'r') as f:
+        config = json.load(f)
+
+    index = create_index(config["backend"], **config.get("params", {}))
+    index.load(path)
+
+    # Vectors added after the index was saved would be invisible to it
+    stale_ivf = getattr(index, "centroids", None) is not None and len(index.assignments) != len(vectors)
+    stale_codes = getattr(index, "codes", None) is not None and index.count != len(vectors)
+    if stale_ivf or stale_codes:
+        print(f"Index at {path} is out of date, rebuilding")
+        index.build(vectors)
+
+    return index
+
+def evaluate_recall(vectors: np.ndarray, index, queries: np.ndarray, k: int = 10, **search_params) -> Dict[str, float]:
+    """Measure recall@k and mean latency of an index against exact search"""
+    exact = FlatIndex()
+    hits = 0
+    exact_time = 0.0
+    index_time = 0.0
+
+    for query in queries:
+        start = time.perf_counter()
+        expected, _ = exact.search(vectors, query, k)
+        exact_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        found, _ = index.search(vectors, query, k, **search_params)
+        index_time += time.perf_counter() - start
+
+        hits += len(np.intersect1d(expected, found))
+
+    return {
+        "recall": hits / (len(queries) * min(k, len(vectors))),
+        "exact_ms": 1000 * exact_time / len(queries),
+        "index_ms": 1000 * index_time / len(queries)
+    }
+
+def _synthetic_vectors(n: int, dim: int, n_clusters: int, seed: int = 0) -> np.ndarray:
+    """Generate normalized vectors grouped around random topics, like real embeddings"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(n_clusters, size=n)] + 1.5 * rng.standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+if __name__ == "__main__":
+    # Compare the approximate backends against exact search on a synthetic corpus
+    vectors = _synthetic_vectors(n=100000, dim=256, n_clusters=500)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.integers(len(vectors), size=200)] + 0.1 * rng.standard_normal((200, 256)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    start = time.perf_counter()
+    ivf = IVFIndex()
+    ivf.build(vectors)
+    print(f"Built IVF index with {len(ivf.centroids)} lists in {time.perf_counter() - start:.1f}s")
+
+    for n_probe in [1, 4, 8, 16, 32]:
+        result = evaluate_recall(vectors, ivf, queries, k=10, n_probe=n_probe)
+        print(f"n_probe={n_probe:>3}: recall@10={result['recall']:.3f} "
+              f"exact={result['exact_ms']:.2f}ms ivf={result['index_ms']:.2f}ms")
+
+    for quantized in [ScalarQuantizedIndex(), ProductQuantizedIndex()]:
+        start = time.perf_counter()
+        quantized.build(vectors)
+        print(f"Built {quantized.name} index in {time.perf_counter() - start:.1f}s: "
+              f"{quantized.nbytes / 1e6:.1f} MB vs {vectors.nbytes / 1e6:.1f} MB of float32 "
+              f"({vectors.nbytes / quantized.nbytes:.1f}x smaller)")
+        for rerank in [10, 50, 100, 400]:
+            result = evaluate_recall(vectors, quantized, queries, k=10, rerank=rerank)
+            print(f"rerank={rerank:>4}: recall@10={result['recall']:.3f} "
+                  f"exact={result['exact_ms']:.2f}ms {quantized.name}={result['index_ms']:.2f}ms")
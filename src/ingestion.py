@@ -0,0 +1,314 @@
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+from .scraper import scrape_able_website, get_fallback_data
+from .data_processor import (PROCESSED_DATA_FILE, PROCESSED_METADATA_SUFFIX, chunk_scraped_data,
+                             find_scraped_data, iter_processed_data, prefetch, processed_data_is_current,
+                             read_processed_metadata, replace_processed_data)
+from .embeddings import (CURRENT_FILE, MANIFEST_FILE, VECTOR_STORE_DIR, SimpleEmbeddings, SimpleVectorStore,
+                         resolve_vector_store)
+
+# Where a job gets its pages: the hard-coded fallback data, a fresh crawl, or the
+# processed data already on disk (re-index only, unless it needs re-chunking)
+INGESTION_SOURCES = ("fallback", "scrape", "processed")
+
+# Fraction of overall progress at which each stage starts; chunking and embedding overlap
+STAGE_PROGRESS = {"scraping": 0.0, "embedding": 0.3, "swapping": 0.95, "done": 1.0}
+
+class IngestionCancelled(Exception):
+    """Raised inside a job when cancellation was requested"""
+
+class IngestionJob:
+    """Status of one background ingestion run"""
+    def __init__(self, source: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.source = source
+        self.status = "pending"
+        self.stage = "pending"
+        self.progress = 0.0
+        self.message = "Waiting to start"
+        self.error: Optional[str] = None
+        # Set when the job succeeded in a degraded way, e.g. chunks left unembedded
+        self.warning: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.cancel_event = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed", "cancelled")
+
+    def cancel(self):
+        """Ask the job to stop at its next checkpoint"""
+        self.cancel_event.set()
+
+    def check_cancelled(self):
+        """Raise IngestionCancelled if cancellation was requested"""
+        if self.cancel_event.is_set():
+            raise IngestionCancelled()
+
+    def update(self, stage: Optional[str] = None, progress: Optional[float] = None, message: Optional[str] = None):
+        """Record the job's current stage, overall progress (0-1) and message"""
+        if stage is not None:
+            self.stage = stage
+            self.progress = STAGE_PROGRESS.get(stage, self.progress)
+        if progress is not None:
+            self.progress = progress
+        if message is not None:
+            self.message = message
+            print(f"[ingestion {self.id}] {message}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable snapshot of the job status"""
+        return {
+            "id": self.id,
+            "source": self.source,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": round(self.progress, 3),
+            "message": self.message,
+            "error": self.error,
+            "warning": self.warning,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at
+        }
+
+def _count_lines(filepath: str) -> int:
+    """Count the chunks in a JSON Lines file without parsing them"""
+    with open(filepath, 'rb') as f:
+        return sum(1 for line in f if line.strip())
+
+def _watch(chunks: Iterable[Dict[str, Any]], job: IngestionJob, total: Optional[int]) -> Iterator[Dict[str, Any]]:
+    """
+    Pass chunks through, reporting embedding progress and stopping if the job
+    is cancelled. total is None while the chunks are still being produced.
+    """
+    start, end = STAGE_PROGRESS["embedding"], STAGE_PROGRESS["swapping"]
+    for count, chunk in enumerate(chunks, 1):
+        job.check_cancelled()
+        if total is None:
+            if count % 50 == 0:
+                job.update(message=f"Indexed {count} chunks")
+        elif count % 50 == 0 or count == total:
+            job.update(progress=start + (end - start) * count / max(total, 1),
+                       message=f"Indexed {count}/{total} chunks")
+        yield chunk
+
+def build_staged_store(processed_data_file: str, staging_path: str, base_path: Optional[str],
+                       job: IngestionJob, embedding_function=None,
+                       chunks: Optional[Iterable[Dict[str, Any]]] = None) -> SimpleVectorStore:
+    """
+    Build a complete vector store in staging_path. It starts from a copy of the
+    live store at base_path (if any), so only new or changed chunks are embedded.
+    Chunks that cannot be embedded are still stored for lexical search, and the
+    job gets a warning.
+    
+    The chunks are read from processed_data_file, unless chunks is given: the
+    chunks that are being written to processed_data_file, which are then
+    embedded while chunking continues on a background thread.
+    """
+    if os.path.exists(staging_path):
+        shutil.rmtree(staging_path)
+
+    embedding_function = embedding_function or SimpleEmbeddings()
+    base_path = base_path and resolve_vector_store(base_path)
+    if base_path and os.path.exists(os.path.join(base_path, MANIFEST_FILE)):
+        # Only the store's own files: an unversioned base also holds the version directories
+        shutil.copytree(base_path, staging_path,
+                        ignore=lambda directory, names: [name for name in names
+                                                         if os.path.isdir(os.path.join(directory, name))])
+        store = SimpleVectorStore.load(staging_path, embedding_function)
+    else:
+        store = SimpleVectorStore(embedding_function)
+        store.persist_path = staging_path
+
+    if chunks is None:
+        chunks, total = iter_processed_data(processed_data_file), _count_lines(processed_data_file)
+    else:
+        chunks, total = prefetch(chunks), None
+    try:
+        stats = store.sync_documents(_watch(chunks, job, total), save=False)
+    finally:
+        # On cancellation or errors, stop the chunking thread (and close files) now, not when collected
+        chunks.close()
+    if stats["unembedded"]:
+        job.warning = (f"{stats['unembedded']} chunks could not be embedded; they are found by keyword "
+                       f"search only until the next refresh")
+    store.tokenizer = read_processed_metadata(processed_data_file).get("tokenizer")
+    job.check_cancelled()
+    store.compact()
+    store.save(staging_path)
+    return store
+
+def swap_in(version_path: str, target_path: str):
+    """
+    Make version_path, a fully written store in a subdirectory of target_path,
+    the live store by atomically replacing the CURRENT pointer file. Readers
+    resolve the pointer, so they see either the old version or the new one,
+    never a missing store. The version that was live until now is kept until
+    the next swap, for readers that resolved the pointer just before it
+    changed; anything older is removed.
+    """
+    version = os.path.basename(version_path)
+    previous = resolve_vector_store(target_path)
+    pointer_tmp = os.path.join(target_path, f"{CURRENT_FILE}.tmp-{version}")
+    with open(pointer_tmp, 'w') as f:
+        f.write(version + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer_tmp, os.path.join(target_path, CURRENT_FILE))
+
+    # Open memory maps keep the retired files alive until readers drop them
+    for name in os.listdir(target_path):
+        path = os.path.join(target_path, name)
+        if name in (CURRENT_FILE, version) or path == previous:
+            continue
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif previous != target_path:
+            # Files of an unversioned store, which was live until now if previous is target_path
+            os.remove(path)
+
+class IngestionWorker:
+    """
+    Runs ingestion jobs (scrape or fallback data -> processed chunks, embedded
+    as they are produced -> new vector store version -> atomic pointer swap) on
+    a background thread, one job at a time, so the app keeps serving the current
+    store and processed data until the new ones are complete.
+    """
+    def __init__(self, vector_store_path: str = VECTOR_STORE_DIR,
+                 processed_data_file: str = PROCESSED_DATA_FILE,
+                 on_swap: Optional[Callable[[], Any]] = None, max_history: int = 20,
+                 embedding_function=None):
+        self.vector_store_path = vector_store_path
+        self.processed_data_file = processed_data_file
+        self.on_swap = on_swap
+        self.embedding_function = embedding_function
+        self.max_history = max_history
+        self.jobs: List[IngestionJob] = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingestion")
+
+    def submit(self, source: str = "fallback") -> IngestionJob:
+        """Queue an ingestion job, or return the active one if a job is already pending or running"""
+        if source not in INGESTION_SOURCES:
+            raise ValueError(f"Unknown ingestion source '{source}'. Available: {', '.join(INGESTION_SOURCES)}")
+
+        with self._lock:
+            active = self.active()
+            if active:
+                return active
+            job = IngestionJob(source)
+            self.jobs.append(job)
+            del self.jobs[:-self.max_history]
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        """Look up a job by id"""
+        return next((job for job in self.jobs if job.id == job_id), None)
+
+    def latest(self) -> Optional[IngestionJob]:
+        """The most recently submitted job"""
+        return self.jobs[-1] if self.jobs else None
+
+    def active(self) -> Optional[IngestionJob]:
+        """The pending or running job, if any"""
+        return next((job for job in self.jobs if not job.done), None)
+
+    def cancel(self, job_id: str) -> bool:
+        """Request cancellation of a job; returns False if it does not exist or already finished"""
+        job = self.get(job_id)
+        if job is None or job.done:
+            return False
+        job.cancel()
+        return True
+
+    def _run(self, job: IngestionJob):
+        """Execute a job, recording its outcome"""
+        # The new version is built next to the live one and only becomes live in swap_in
+        staging_path = os.path.join(self.vector_store_path, f"v-{job.id}")
+        # New chunks are written next to the live processed data, which is replaced just before the swap
+        staged_processed_file = f"{self.processed_data_file}.staging-{job.id}"
+        swapped = False
+        job.status = "running"
+        try:
+            job.check_cancelled()
+            if job.source == "scrape":
+                job.update(stage="scraping", message="Scraping Able website...")
+                try:
+                    # The crawl checks for cancellation before every page
+                    scrape_able_website(check_cancelled=job.check_cancelled)
+                except IngestionCancelled:
+                    raise
+                except Exception as e:
+                    job.update(message=f"Error scraping website ({e}), falling back to pre-defined data...")
+                    get_fallback_data()
+            elif job.source == "fallback":
+                job.update(stage="scraping", message="Using fallback data...")
+                get_fallback_data()
+
+            # Processed data chunked with another tokenizer is re-chunked from the source pages
+            processed_data_file, chunks = self.processed_data_file, None
+            if job.source != "processed" or not processed_data_is_current(self.processed_data_file):
+                data_file = find_scraped_data()
+                if data_file is not None:
+                    processed_data_file = staged_processed_file
+                    chunks = chunk_scraped_data(data_file, staged_processed_file)
+                elif job.source != "processed":
+                    raise FileNotFoundError("No scraped or fallback data to process")
+
+            job.check_cancelled()
+            job.update(stage="embedding", message="Processing data and creating vector embeddings..."
+                       if chunks is not None else "Creating vector embeddings...")
+            build_staged_store(processed_data_file, staging_path, self.vector_store_path, job,
+                               self.embedding_function, chunks)
+
+            job.check_cancelled()
+            job.update(stage="swapping", message="Swapping in the new vector store...")
+            if processed_data_file != self.processed_data_file:
+                replace_processed_data(staged_processed_file, self.processed_data_file)
+            swap_in(staging_path, self.vector_store_path)
+            swapped = True
+            if self.on_swap:
+                self.on_swap()
+
+            job.status = "succeeded"
+            job.update(stage="done", message="Done! Chatbot ready.")
+        except IngestionCancelled:
+            job.status = "cancelled"
+            job.update(message="Cancelled; still serving the previous data")
+        except Exception as e:
+            job.status = "failed"
+            job.error = f"{type(e).__name__}: {e}"
+            job.update(message=f"Ingestion failed: {e}")
+        finally:
+            job.finished_at = time.time()
+            if not swapped:
+                shutil.rmtree(staging_path, ignore_errors=True)
+            for leftover in (staged_processed_file, staged_processed_file + PROCESSED_METADATA_SUFFIX):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+
+    def shutdown(self, cancel: bool = True):
+        """Stop the worker thread, cancelling the active job first if asked"""
+        if cancel:
+            active = self.active()
+            if active:
+                active.cancel()
+        self._executor.shutdown(wait=True)
+
+_shared_worker: Optional[IngestionWorker] = None
+_shared_worker_lock = threading.Lock()
+
+def get_ingestion_worker() -> IngestionWorker:
+    """Return the process-wide ingestion worker"""
+    global _shared_worker
+    with _shared_worker_lock:
+        if _shared_worker is None:
+            _shared_worker = IngestionWorker()
+        return _shared_worker
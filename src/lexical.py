@@ -0,0 +1,282 @@
+import math
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from .data_processor import PROCESSED_DATA_FILE, iter_processed_data
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+def _stem(word: str) -> str:
+    """Fold simple plurals so "industries" matches "industry" and "teams" matches "team" """
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+# Words (and contraction fragments) that carry no intent on their own; ignored by BM25 and
+# when measuring confidence. Stored stemmed, as they are compared with tokens ("does" -> "doe")
+STOPWORDS = frozenset(_stem(word) for word in """
+a an and are as at be by can do does for from has have how i in is it its me my of on or our
+tell that the their there this to was we what when where which who why will with you your
+s t re ll ve d m
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with plurals folded; matching is always on whole words"""
+    return [_stem(word) for word in _WORD.findall(text.lower())]
+
+def content_terms(tokens: List[str]) -> List[str]:
+    """Drop stopwords from a token list"""
+    return [token for token in tokens if token not in STOPWORDS]
+
+class BM25Index:
+    """
+    Okapi BM25 over an inverted index of stemmed terms. Each posting list holds
+    (document id, term frequency) pairs; a query only touches the posting lists
+    of its own terms.
+    """
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.doc_lengths: List[int] = []
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def add(self, text: str) -> int:
+        """Index a document and return its id"""
+        doc_id = len(self.doc_lengths)
+        terms = content_terms(tokenize(text))
+        for term, frequency in Counter(terms).items():
+            self.postings.setdefault(term, []).append((doc_id, frequency))
+        self.doc_lengths.append(len(terms))
+        self.total_length += len(terms)
+        return doc_id
+
+    def idf(self, term: str) -> float:
+        """Inverse document frequency, never negative"""
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.doc_lengths) - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, k: int = 3, allowed=None) -> List[Tuple[int, float]]:
+        """
+        Return the k best (document id, score) pairs for a query. allowed is an
+        optional boolean mask over document ids; other documents are not scored.
+        """
+        if not self.doc_lengths:
+            return []
+
+        average_length = self.total_length / len(self.doc_lengths) or 1.0
+        scores: Dict[int, float] = {}
+        for term in set(content_terms(tokenize(query))):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            for doc_id, frequency in postings:
+                if allowed is not None and not allowed[doc_id]:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the index to JSON-compatible data"""
+        return {
+            "k1": self.k1,
+            "b": self.b,
+            "doc_lengths": self.doc_lengths,
+            "postings": self.postings
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "BM25Index":
+        """Rebuild an index serialized with to_dict"""
+        index = cls(k1=data["k1"], b=data["b"])
+        index.doc_lengths = list(data["doc_lengths"])
+        index.total_length = sum(index.doc_lengths)
+        index.postings = {term: [tuple(posting) for posting in postings]
+                          for term, postings in data["postings"].items()}
+        return index
+
+class Intent:
+    """A canned answer and the keywords and phrases that trigger it"""
+    def __init__(self, name: str, keywords: List[str], answer: str):
+        self.name = name
+        self.keywords = keywords
+        self.answer = answer
+
+# Common support questions, answered without retrieval or the API
+INTENTS = [
+    Intent("about", ["what does able do", "what is able", "service", "offer", "agency", "about able"],
+           "Able is a full-service digital product agency that partners with funded startups and established brands to build innovative, user-focused digital products. We provide end-to-end services from strategy and discovery through design, development, and growth."),
+    Intent("teams", ["team", "who works", "employee", "staff", "people"],
+           "Able has multidisciplinary teams across several key areas: Product Management, Design, Engineering, and Strategy. Our teams collaborate closely with clients as true partners throughout the product development lifecycle."),
+    Intent("industries", ["industry", "client", "sector", "customer"],
+           "Able works across various industries including fintech, healthcare, education, media, retail, and enterprise software. We've built payment platforms, telemedicine solutions, learning management systems, content delivery platforms, and more."),
+    Intent("mission", ["mission", "value", "purpose", "vision"],
+           "Able's mission is to help organizations transform their ideas into exceptional digital products that create value for users and drive business growth. We believe in user-centered design, technical excellence, and true partnership with our clients."),
+    Intent("location", ["located", "location", "where is able", "where are you", "office", "headquarter", "based"],
+           "Able is headquartered in New York City, with team members distributed across the United States and globally. Our global presence allows us to work with clients around the world and build diverse teams with varied perspectives."),
+    Intent("website", ["website", "url", "site", "web page"],
+           "Able's official website is available at https://able.co. You can find more information about our services, case studies, and team there."),
+    Intent("contact", ["contact", "email", "phone", "reach", "get in touch"],
+           "You can contact Able through their website at https://able.co/contact. They also have a presence on social media platforms such as LinkedIn, Twitter, and Instagram."),
+    Intent("process", ["process", "methodology", "approach", "how do you work"],
+           "Able follows a collaborative, iterative approach to product development that typically includes discovery and strategy, design, engineering, testing, and deployment phases. We emphasize close client collaboration throughout the process."),
+    Intent("technology", ["technology", "tech stack", "programming", "language", "framework"],
+           "Able's engineering teams work with various technologies including React, React Native, Node.js, Python, and more. We select the appropriate technology stack based on each project's specific requirements and client needs."),
+]
+
+DEFAULT_ANSWER = "I'm the Able support chatbot. I can answer questions about Able's services, teams, industries, mission, technologies, locations, and more. How can I help you today?"
+
+class LocalAnswer:
+    """An answer found without the API, with how confident the match is (0-1)"""
+    def __init__(self, text: str, confidence: float, source: str, intent: Optional[str] = None):
+        self.text = text
+        self.confidence = confidence
+        self.source = source
+        self.intent = intent
+
+class IntentMatcher:
+    """
+    Matches queries to intents by whole-word keyword phrases. Phrases are
+    compiled into a table keyed by their first token, so matching is a single
+    scan over the query tokens. The best intent is the one whose phrases cover
+    the most query tokens, regardless of the order intents are listed in.
+    """
+    def __init__(self, intents: List[Intent] = INTENTS):
+        self.intents = intents
+        self._phrases: Dict[str, List[Tuple[Tuple[str, ...], int]]] = {}
+        for intent_id, intent in enumerate(intents):
+            for keyword in intent.keywords:
+                phrase = tuple(tokenize(keyword))
+                if phrase:
+                    self._phrases.setdefault(phrase[0], []).append((phrase, intent_id))
+        # Longest phrases first, so "where is able" wins over a shorter overlapping phrase
+        for candidates in self._phrases.values():
+            candidates.sort(key=lambda candidate: -len(candidate[0]))
+
+    def match(self, query: str) -> Optional[LocalAnswer]:
+        """Return the best matching intent's answer, or None if no keyword matches"""
+        tokens = tokenize(query)
+        covered: Dict[int, set] = {}
+        for position, token in enumerate(tokens):
+            for phrase, intent_id in self._phrases.get(token, ()):
+                if tuple(tokens[position:position + len(phrase)]) == phrase:
+                    covered.setdefault(intent_id, set()).update(range(position, position + len(phrase)))
+
+        if not covered:
+            return None
+
+        # Most covered tokens wins; ties go to the intent listed first
+        intent_id = max(covered, key=lambda i: (len(covered[i]), -i))
+        content = [position for position, token in enumerate(tokens) if token not in STOPWORDS]
+        matched = sum(1 for position in content if position in covered[intent_id])
+        confidence = matched / len(content) if content else 1.0
+
+        intent = self.intents[intent_id]
+        return LocalAnswer(intent.answer, confidence, "intent", intent.name)
+
+class LocalAnswerEngine:
+    """
+    Answers questions locally: canned intents first, then the best BM25 match
+    among the processed chunks. Used as the offline fallback when the API is not
+    available, and as a pre-LLM fast path for confident intent matches.
+    """
+    def __init__(self, intents: List[Intent] = INTENTS, documents: Iterable[Dict[str, Any]] = (),
+                 min_chunk_score: float = 2.0):
+        self.matcher = IntentMatcher(intents)
+        self.min_chunk_score = min_chunk_score
+        self.documents: List[Dict[str, Any]] = []
+        self.index = BM25Index()
+        for doc in documents:
+            self.documents.append(doc)
+            self.index.add(doc["content"])
+
+    @classmethod
+    def from_processed_data(cls, processed_data_file: str = PROCESSED_DATA_FILE, **kwargs):
+        """Build the engine over the processed chunks, or intents only if there are none yet"""
+        documents = iter_processed_data(processed_data_file) if os.path.exists(processed_data_file) else ()
+        return cls(documents=documents, **kwargs)
+
+    def match(self, query: str) -> Optional[LocalAnswer]:
+        """Return the best local answer, or None if neither an intent nor a chunk matches"""
+        answer = self.matcher.match(query)
+        if answer:
+            return answer
+
+        results = self.index.search(query, k=1)
+        if results and results[0][1] >= self.min_chunk_score:
+            doc_id, score = results[0]
+            # Scores are unbounded; squash them into 0-1 for callers comparing confidences
+            return LocalAnswer(self.documents[doc_id]["content"], score / (score + self.min_chunk_score), "chunk")
+        return None
+
+    def answer(self, query: str) -> str:
+        """Always return some answer, falling back to a general introduction"""
+        answer = self.match(query)
+        return answer.text if answer else DEFAULT_ANSWER
+
+# Seconds between checks of the processed data file for a new ingestion
+ENGINE_CHECK_INTERVAL = 2.0
+
+_shared_engine: Optional[LocalAnswerEngine] = None
+_shared_engine_version: Optional[tuple] = None
+_shared_engine_checked_at = 0.0
+_shared_engine_lock = threading.Lock()
+
+def _processed_data_version(processed_data_file: str) -> Optional[tuple]:
+    """Identity and modification time of the processed data file, which ingestion replaces as a whole"""
+    try:
+        stat = os.stat(processed_data_file)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+def get_local_engine() -> LocalAnswerEngine:
+    """
+    Return the process-wide local answer engine. It is rebuilt when the
+    processed data changes, checked at most once per ENGINE_CHECK_INTERVAL
+    seconds; callers arriving during a rebuild keep using the current engine.
+    """
+    global _shared_engine, _shared_engine_version, _shared_engine_checked_at
+    engine = _shared_engine
+    if engine is not None and time.monotonic() - _shared_engine_checked_at < ENGINE_CHECK_INTERVAL:
+        return engine
+
+    with _shared_engine_lock:
+        _shared_engine_checked_at = time.monotonic()
+        version = _processed_data_version(PROCESSED_DATA_FILE)
+        if _shared_engine is None or version != _shared_engine_version:
+            _shared_engine = LocalAnswerEngine.from_processed_data(PROCESSED_DATA_FILE)
+            _shared_engine_version = version
+        return _shared_engine
+
+if __name__ == "__main__":
+    engine = LocalAnswerEngine.from_processed_data()
+    queries = sys.argv[1:] or [
+        "What does Able do?", "Where is Able located?", "What industries do you work with?",
+        "How can I reach you?", "Tell me about AI-powered software development", "What's the weather?"
+    ]
+
+    for query in queries:
+        answer = engine.match(query)
+        if answer:
+            print(f"{query!r}: {answer.source} {answer.intent or ''} ({answer.confidence:.2f}) {answer.text[:60]}...")
+        else:
+            print(f"{query!r}: no local answer")
+
+    repeat = 10000
+    start = time.perf_counter()
+    for i in range(repeat):
+        engine.match(queries[i % len(queries)])
+    print(f"{1e6 * (time.perf_counter() - start) / repeat:.1f} us per query")
@@ -0,0 +1,220 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+import numpy as np
+import requests
+
+QUERIES = [
+    "What does Able do?",
+    "What kinds of teams does Able have?",
+    "What industries has Able worked with?",
+    "What is Able's mission?",
+    "Where is Able located?",
+    "How does Able use AI to build software?",
+    "Is Able hiring engineers?",
+    "How can I contact Able?"
+]
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    """
+    OpenAI-compatible stand-in for load tests: /embeddings returns deterministic
+    vectors and /chat/completions streams a fixed answer with a delay per token.
+    """
+    protocol_version = "HTTP/1.1"
+    token_delay = 0.02
+    tokens = 20
+    dim = 1536
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload: Dict[str, Any]):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+
+        if self.path.endswith("/embeddings"):
+            data = []
+            for text in payload.get("input", []):
+                seed = int(hashlib.md5(text.encode("utf-8")).hexdigest()[:8], 16)
+                vector = np.random.default_rng(seed).standard_normal(self.dim)
+                data.append({"embedding": vector.tolist()})
+            self._send_json({"data": data})
+            return
+
+        if not payload.get("stream"):
+            time.sleep(self.token_delay * self.tokens)
+            self._send_json({"choices": [{"message": {"content": "token " * self.tokens}}]})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for _ in range(self.tokens):
+            time.sleep(self.token_delay)
+            event = {"choices": [{"delta": {"content": "token "}}]}
+            self._send_chunk(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+        self._send_chunk(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+def start_mock_openai(port: int, token_delay: float, tokens: int) -> ThreadingHTTPServer:
+    """Run the mock OpenAI API on a background thread"""
+    MockOpenAIHandler.token_delay = token_delay
+    MockOpenAIHandler.tokens = tokens
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockOpenAIHandler)
+    server.daemon_threads = True
+    # Clients dropping pooled keep-alive connections at shutdown is expected noise
+    server.handle_error = lambda request, client_address: None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def build_mock_store(path: str, processed_data_file: str):
+    """Embed the processed data with the mock API into a throwaway store, so chats exercise retrieval"""
+    # Imported here because the OpenAI client reads OPENAI_BASE_URL on import
+    from .embeddings import SimpleEmbeddings, SimpleVectorStore, iter_processed_data
+    # No embedding cache: mock vectors must never end up next to real ones
+    store = SimpleVectorStore(SimpleEmbeddings(use_cache=False))
+    store.persist_path = path
+    store.sync_documents(iter_processed_data(processed_data_file))
+
+def wait_for_health(url: str, timeout: float = 60.0):
+    """Poll the health endpoint until the server answers"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{url}/health", timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not become healthy within {timeout}s")
+
+def percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+def run_load(url: str, requests_total: int, concurrency: int, stream: bool,
+             sessions: int) -> Dict[str, Any]:
+    """Send chat requests from `concurrency` threads and collect latency statistics"""
+    local = threading.local()
+    latencies: List[float] = []
+    first_token: List[float] = []
+    statuses: Dict[int, int] = {}
+    lock = threading.Lock()
+
+    def one(i: int):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+
+        payload = {"session_id": f"load-{i % sessions}", "message": random.choice(QUERIES), "stream": stream}
+        start = time.perf_counter()
+        ttft: Optional[float] = None
+        try:
+            response = session.post(f"{url}/chat", json=payload, stream=stream, timeout=120)
+            if stream and response.status_code == 200:
+                for line in response.iter_lines():
+                    if line.startswith(b"data:") and ttft is None:
+                        ttft = time.perf_counter() - start
+            else:
+                response.content
+            status = response.status_code
+        except requests.RequestException:
+            status = 0
+        elapsed = time.perf_counter() - start
+
+        with lock:
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == 200:
+                latencies.append(elapsed)
+                if ttft is not None:
+                    first_token.append(ttft)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(requests_total)))
+    wall = time.perf_counter() - start
+
+    return {
+        "requests": requests_total,
+        "concurrency": concurrency,
+        "statuses": statuses,
+        "wall_seconds": round(wall, 2),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall > 0 else 0.0,
+        "latency_ms": {f"p{q}": round(1000 * percentile(latencies, q), 1) for q in (50, 95, 99)},
+        "first_token_ms": {f"p{q}": round(1000 * percentile(first_token, q), 1) for q in (50, 95, 99)}
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the chatbot HTTP API")
+    parser.add_argument("--url", default=None, help="test an already running server instead of spawning one")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--sessions", type=int, default=64, help="distinct session ids to spread requests over")
+    parser.add_argument("--no-stream", action="store_true", help="use non-streaming chat requests")
+    parser.add_argument("--port", type=int, default=8900, help="port for the spawned server")
+    parser.add_argument("--mock-port", type=int, default=8901, help="port for the mock OpenAI API")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="mock LLM seconds per token")
+    parser.add_argument("--tokens", type=int, default=20, help="mock LLM tokens per answer")
+    parser.add_argument("--processed-data", default="data/processed_data.jsonl",
+                        help="chunks to embed into the spawned server's vector store")
+    parser.add_argument("--workers", type=int, default=None, help="server worker threads (default: the server's)")
+    parser.add_argument("--max-concurrency", type=int, default=None,
+                        help="server concurrent chats (default: the server's)")
+    args = parser.parse_args()
+
+    server_process = None
+    store_dir = None
+    url = args.url
+    if url is None:
+        # Spawn the server against a mock LLM, so the test measures our overhead and never spends API credits
+        start_mock_openai(args.mock_port, args.token_delay, args.tokens)
+        os.environ.update(OPENAI_BASE_URL=f"http://127.0.0.1:{args.mock_port}/v1", OPENAI_API_KEY="sk-mock")
+
+        command = [sys.executable, "-m", "src.server", "--port", str(args.port),
+                   "--no-embedding-cache", "--no-response-cache"]
+        if os.path.exists(args.processed_data):
+            store_dir = tempfile.TemporaryDirectory(prefix="load_test_store_")
+            build_mock_store(store_dir.name, args.processed_data)
+            command += ["--vector-store", store_dir.name]
+        # Only override the server's concurrency settings when asked, so by default the shipped ones are measured
+        if args.workers:
+            command += ["--workers", str(args.workers)]
+        if args.max_concurrency:
+            command += ["--max-concurrency", str(args.max_concurrency)]
+        server_process = subprocess.Popen(command, env=dict(os.environ))
+        url = f"http://127.0.0.1:{args.port}"
+
+    try:
+        wait_for_health(url)
+        result = run_load(url, args.requests, args.concurrency, not args.no_stream, args.sessions)
+        print(json.dumps(result, indent=2))
+    finally:
+        if server_process:
+            server_process.terminate()
+            server_process.wait(timeout=10)
+        if store_dir:
+            store_dir.cleanup()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Point at a local mock server (e.g. http://127.0.0.1:8000/v1) for tests and load tests
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+
+# Status codes worth retrying: rate limits and transient server errors
+RETRY_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+class OpenAIAPIError(Exception):
+    """Raised when an OpenAI API request fails for good"""
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+class OpenAIClient:
+    """
+    Shared HTTP client for the OpenAI API. One pooled keep-alive session is
+    reused for every request; requests have connect/read timeouts, are retried
+    with exponential backoff and full jitter on connection errors, 429 and 5xx.
+    Across threads, at most max_concurrency chat requests and
+    max_embedding_concurrency embedding requests are in flight at once; the
+    limits are separate so long streamed answers never hold up the short
+    embedding calls of new queries.
+    """
+    def __init__(self, api_key: str, base_url: str = OPENAI_BASE_URL,
+                 connect_timeout: float = 5.0, read_timeout: float = 60.0,
+                 max_retries: int = 4, backoff_base: float = 0.5, backoff_max: float = 20.0,
+                 max_concurrency: int = 8, max_embedding_concurrency: int = 8):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_concurrency = max_concurrency
+        self.max_embedding_concurrency = max_embedding_concurrency
+
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency + max_embedding_concurrency)
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {api_key}"
+        })
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._chat_limiter = threading.BoundedSemaphore(max_concurrency)
+        self._embedding_limiter = threading.BoundedSemaphore(max_embedding_concurrency)
+        # Number of 429 responses seen, so callers can adapt their request rate
+        self.rate_limited = 0
+        self._stats_lock = threading.Lock()
+
+    def _backoff(self, attempt: int, response: Optional[requests.Response] = None) -> float:
+        """Seconds to wait before the next attempt, honouring Retry-After if the server sent one"""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return min(float(retry_after), self.backoff_max)
+                except ValueError:
+                    pass
+        # Full jitter: spread retries from many workers instead of synchronizing them
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _limiter(self, path: str) -> threading.BoundedSemaphore:
+        """The concurrency limiter for requests to path"""
+        return self._embedding_limiter if path == "/embeddings" else self._chat_limiter
+
+    def _post(self, path: str, payload: Dict[str, Any], stream: bool = False) -> requests.Response:
+        """POST with retries; the caller must hold the concurrency limiter"""
+        url = f"{self.base_url}{path}"
+        attempt = 0
+        while True:
+            try:
+                response = self.session.post(url, json=payload, timeout=self.timeout, stream=stream)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.max_retries:
+                    raise OpenAIAPIError(f"Request to {path} failed after {attempt + 1} attempts: {e}") from e
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+
+            if response.status_code < 400:
+                return response
+
+            if response.status_code == 429:
+                with self._stats_lock:
+                    self.rate_limited += 1
+
+            if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                delay = self._backoff(attempt, response)
+                response.close()
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            message = response.text[:500]
+            response.close()
+            raise OpenAIAPIError(f"Request to {path} failed with HTTP {response.status_code}: {message}",
+                                 status_code=response.status_code)
+
+    def post_json(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """POST a JSON payload and return the decoded JSON response"""
+        with self._limiter(path):
+            response = self._post(path, payload)
+            try:
+                return response.json()
+            finally:
+                response.close()
+
+    def stream(self, path: str, payload: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """POST a streaming request and yield each server-sent event's JSON payload"""
+        # A stream holds its slot until the whole response has been read
+        with self._limiter(path):
+            response = self._post(path, dict(payload, stream=True), stream=True)
+            with response:
+                # Server-sent events: one "data: {json}" line per event, ending with "data: [DONE]"
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        return
+                    yield json.loads(data)
+
+    async def apost_json(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Async variant of post_json; the blocking request runs on a worker thread"""
+        # run_in_executor rather than asyncio.to_thread, which needs Python 3.9
+        return await asyncio.get_running_loop().run_in_executor(None, self.post_json, path, payload)
+
+    async def astream(self, path: str, payload: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """Async variant of stream; events are handed over from a worker thread as they arrive"""
+        loop = asyncio.get_running_loop()
+        events: "asyncio.Queue" = asyncio.Queue()
+        done = object()
+        cancelled = threading.Event()
+
+        def produce():
+            try:
+                for event in self.stream(path, payload):
+                    if cancelled.is_set():
+                        break
+                    loop.call_soon_threadsafe(events.put_nowait, event)
+            except Exception as e:
+                loop.call_soon_threadsafe(events.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(events.put_nowait, done)
+
+        worker = loop.run_in_executor(None, produce)
+        try:
+            while True:
+                event = await events.get()
+                if event is done:
+                    break
+                if isinstance(event, Exception):
+                    raise event
+                yield event
+        finally:
+            cancelled.set()
+            await worker
+
+    def close(self):
+        """Close pooled connections"""
+        self.session.close()
+
+_clients: Dict[str, OpenAIClient] = {}
+_clients_lock = threading.Lock()
+
+def get_client(api_key: str) -> OpenAIClient:
+    """Return the process-wide client for an API key, so all callers share one connection pool"""
+    with _clients_lock:
+        if api_key not in _clients:
+            _clients[api_key] = OpenAIClient(
+                api_key,
+                connect_timeout=float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5")),
+                read_timeout=float(os.getenv("OPENAI_READ_TIMEOUT", "60")),
+                max_retries=int(os.getenv("OPENAI_MAX_RETRIES", "4")),
+                max_concurrency=int(os.getenv("OPENAI_MAX_CONCURRENCY", "8")),
+                max_embedding_concurrency=int(os.getenv("OPENAI_MAX_EMBEDDING_CONCURRENCY", "8"))
+            )
+        return _clients[api_key]
@@ -0,0 +1,149 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional
+import numpy as np
+
+# Minimum cosine similarity between two questions for one's answer to be reused for the other
+DEFAULT_SIMILARITY_THRESHOLD = 0.95
+
+class CachedResponse:
+    """A generated answer together with the question embedding and context it was produced for"""
+    def __init__(self, vector: np.ndarray, context_key: str, response: str, created: float):
+        self.vector = vector
+        self.context_key = context_key
+        self.response = response
+        self.created = created
+
+class ResponseCache:
+    """
+    Semantic cache of chatbot answers. An answer is reused for a new question
+    when the question embeddings are within the cosine similarity threshold and
+    the retriever returned the same context for both. Entries expire after ttl
+    seconds, the least recently used ones are evicted past max_entries, and the
+    whole cache is dropped when the vector store generation changes.
+    """
+    def __init__(self, similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+                 ttl: float = 3600.0, max_entries: int = 1000):
+        self.similarity_threshold = similarity_threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.generation: Optional[Hashable] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        self._entries: "OrderedDict[int, CachedResponse]" = OrderedDict()
+        # Entry ids grouped by context, so a lookup only compares questions that retrieved the same chunks
+        self._by_context: Dict[str, List[int]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _unit(vector) -> Optional[np.ndarray]:
+        """Return the vector scaled to unit length, or None for a zero (failed) embedding"""
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else None
+
+    def get(self, query_vector, context_key: str, generation: Hashable = 0) -> Optional[str]:
+        """Return a cached answer for a sufficiently similar question with the same context"""
+        vector = self._unit(query_vector)
+        with self._lock:
+            self._check_generation(generation)
+
+            best_id = None
+            best_score = self.similarity_threshold
+            now = time.time()
+            for entry_id in list(self._by_context.get(context_key, [])):
+                entry = self._entries[entry_id]
+                if now - entry.created > self.ttl:
+                    self._remove(entry_id)
+                    self.expirations += 1
+                    continue
+                if vector is None:
+                    continue
+                score = float(np.dot(vector, entry.vector))
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+
+            if best_id is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            return self._entries[best_id].response
+
+    def put(self, query_vector, context_key: str, response: str, generation: Hashable = 0):
+        """Cache the answer generated for a question and its retrieved context"""
+        vector = self._unit(query_vector)
+        # Without a usable embedding there is nothing to match future questions against
+        if vector is None or not response:
+            return
+
+        with self._lock:
+            self._check_generation(generation)
+
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = CachedResponse(vector, context_key, response, time.time())
+            self._by_context.setdefault(context_key, []).append(entry_id)
+
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self):
+        """Drop every cached answer"""
+        with self._lock:
+            self._clear()
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss counters, the hit rate and the number of cached answers"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries)
+            }
+
+    def _check_generation(self, generation: Hashable):
+        """Clear the cache if the vector store has been re-indexed since answers were cached"""
+        if self.generation != generation:
+            if self._entries:
+                self._clear()
+            self.generation = generation
+
+    def _clear(self):
+        """Remove all entries; the caller must hold the lock"""
+        self._entries.clear()
+        self._by_context.clear()
+        self.invalidations += 1
+
+    def _remove(self, entry_id: int):
+        """Remove one entry; the caller must hold the lock"""
+        entry = self._entries.pop(entry_id)
+        ids = self._by_context[entry.context_key]
+        ids.remove(entry_id)
+        if not ids:
+            del self._by_context[entry.context_key]
+
+_shared_cache: Optional[ResponseCache] = None
+_shared_cache_lock = threading.Lock()
+
+def get_response_cache() -> ResponseCache:
+    """Return the process-wide response cache shared by all chat sessions"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = ResponseCache()
+        return _shared_cache
@@ -1,63 +1,465 @@
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlencode, urljoin, urlparse, urlunparse
+import xml.etree.ElementTree as ET
+import hashlib
 import json
 import os
+import re
+import threading
+import time
+from .extractors import get_extractor
 
-def scrape_able_website():
+# URLs to scrape - add more as needed
+DEFAULT_URLS = [
+    "https://able.co/",
+    "https://able.co/about",
+    "https://able.co/services",
+    "https://able.co/careers",
+    "https://able.co/contact",
+]
+
+SCRAPED_DATA_FILE = 'data/scraped_data.json'
+# ETag/Last-Modified validators and outgoing links from the previous crawl,
+# used for conditional requests
+CRAWL_STATE_FILE = 'data/crawl_state.json'
+
+# Links to these file types never lead to HTML pages worth scraping
+SKIPPED_EXTENSIONS = (
+    '.pdf', '.jpg', '.jpeg', '.png', '.gif', '.svg', '.webp', '.ico', '.css', '.js',
+    '.zip', '.mp4', '.mp3', '.mov', '.xml', '.json', '.doc', '.docx', '.ppt', '.pptx'
+)
+
+class FetchResult:
+    """Outcome of fetching a single URL"""
+    def __init__(self, url: str, status: int, text: str = "",
+                 etag: Optional[str] = None, last_modified: Optional[str] = None,
+                 content_type: str = "text/html", final_url: Optional[str] = None):
+        self.url = url
+        self.final_url = final_url or url
+        self.status = status
+        self.text = text
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_type = content_type
+    
+    @property
+    def not_modified(self) -> bool:
+        return self.status == 304
+
+class HttpFetcher:
     """
-    Scrapes the Able website for information about the company,
-    services, teams, industries, and locations.
+    Concurrent HTTP fetcher built on one shared requests.Session, so connections
+    are kept alive and reused. Retries with exponential backoff on connection
+    errors, 429 and 5xx responses, and caps concurrent requests per host.
     """
-    print("Starting to scrape Able's website...")
+    def __init__(self, timeout: float = 10.0, max_retries: int = 3, backoff_factor: float = 0.5,
+                 max_workers: int = 8, per_host_limit: int = 4,
+                 user_agent: str = "AbleSupportChatbot/1.0 (+https://able.co)"):
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.per_host_limit = per_host_limit
+        
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(["GET"]),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=max_workers, pool_maxsize=max_workers)
+        
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = user_agent
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        
+        self._host_limits: Dict[str, threading.BoundedSemaphore] = {}
+        self._host_limits_lock = threading.Lock()
+    
+    def _host_limit(self, url: str) -> threading.BoundedSemaphore:
+        """Get the semaphore bounding concurrent requests to the URL's host"""
+        host = urlparse(url).netloc
+        with self._host_limits_lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return self._host_limits[host]
+    
+    def fetch(self, url: str, validators: Optional[Dict[str, str]] = None) -> FetchResult:
+        """Fetch a URL, sending conditional headers if validators from a previous crawl are given"""
+        headers = {}
+        if validators:
+            if validators.get("etag"):
+                headers["If-None-Match"] = validators["etag"]
+            if validators.get("last_modified"):
+                headers["If-Modified-Since"] = validators["last_modified"]
+        
+        with self._host_limit(url):
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+        
+        if response.status_code == 304:
+            if not headers:
+                # Not Modified only makes sense as the answer to a conditional request
+                raise requests.HTTPError(f"304 Not Modified for unconditional GET {url}", response=response)
+            return FetchResult(url, 304, etag=validators.get("etag"), last_modified=validators.get("last_modified"))
+        
+        response.raise_for_status()  # Raise an exception for HTTP errors
+        return FetchResult(
+            url,
+            response.status_code,
+            response.text,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+            content_type=response.headers.get("Content-Type", "text/html"),
+            final_url=response.url
+        )
+    
+    def fetch_all(self, urls: List[str], state: Optional[Dict[str, Dict[str, str]]] = None
+                  ) -> Iterator[Tuple[str, Optional[FetchResult], Optional[Exception]]]:
+        """
+        Fetch URLs concurrently, yielding (url, result, error) as each one finishes.
+        If the caller stops early, fetches that have not started are cancelled.
+        """
+        state = state or {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.fetch, url, state.get(url)): url for url in urls}
+            try:
+                for future in as_completed(futures):
+                    url = futures[future]
+                    try:
+                        yield url, future.result(), None
+                    except requests.RequestException as e:
+                        yield url, None, e
+            finally:
+                # Otherwise leaving the executor would wait for every queued fetch
+                for future in futures:
+                    future.cancel()
+    
+    def close(self):
+        """Close pooled connections"""
+        self.session.close()
+
+def normalize_url(url: str, base_url: Optional[str] = None) -> Optional[str]:
+    """
+    Canonicalize a URL so equivalent links dedupe to one frontier entry:
+    resolve it against base_url, lowercase scheme and host, drop fragments,
+    default ports, tracking parameters and trailing slashes, and sort the query.
+    Returns None for links that are not http(s) pages.
+    """
+    if base_url:
+        url = urljoin(base_url, url)
+    parsed = urlparse(url.strip())
     
-    # URLs to scrape - add more as needed
-    urls = [
-        "https://able.co/",
-        "https://able.co/about",
-        "https://able.co/services",
-        "https://able.co/careers",
-        "https://able.co/contact",
-    ]
+    scheme = parsed.scheme.lower()
+    if scheme not in ("http", "https") or not parsed.hostname:
+        return None
     
-    all_data = {}
+    host = parsed.hostname.lower()
+    if parsed.port and not (scheme == "http" and parsed.port == 80) and not (scheme == "https" and parsed.port == 443):
+        host = f"{host}:{parsed.port}"
     
-    for url in urls:
-        print(f"Scraping {url}...")
+    path = re.sub(r'/{2,}', '/', parsed.path or '/')
+    if path.endswith(('/index.html', '/index.htm')):
+        path = path.rsplit('/', 1)[0] + '/'
+    if len(path) > 1:
+        path = path.rstrip('/')
+    if path.lower().endswith(SKIPPED_EXTENSIONS):
+        return None
+    
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if not key.lower().startswith('utm_') and key.lower() not in ('gclid', 'fbclid')
+    ))
+    
+    return urlunparse((scheme, host, path, '', query, ''))
+
+def page_name_for_url(url: str) -> str:
+    """Name used as the section key for a page in scraped_data.json"""
+    parsed = urlparse(url)
+    name = parsed.path.strip('/')
+    if parsed.query:
+        name = f"{name}?{parsed.query}"
+    return name or "home"
+
+def simhash(text: str, bits: int = 64) -> int:
+    """SimHash fingerprint of a text over word 3-gram shingles"""
+    words = re.findall(r'\w+', text.lower())
+    shingles = [' '.join(words[i:i + 3]) for i in range(max(1, len(words) - 2))]
+    
+    weights = [0] * bits
+    for shingle in shingles:
+        value = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=bits // 8).digest(), 'big')
+        for bit in range(bits):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    
+    return sum(1 << bit for bit in range(bits) if weights[bit] > 0)
+
+def page_text(page: Dict[str, Any]) -> str:
+    """Text content of a scraped page used for duplicate detection"""
+    return ' '.join(page.get('headings', []) + page.get('paragraphs', []))
+
+def parse_page(url: str, html: str, extractor=None) -> Tuple[Dict[str, Any], List[str]]:
+    """Extract title, headings and paragraphs from a page, plus the links it contains"""
+    return (extractor or get_extractor()).extract(url, html)
+
+def _load_json(filepath: str) -> Dict[str, Any]:
+    """Load a JSON object from disk, returning an empty dict if it is missing or corrupt"""
+    try:
+        with open(filepath, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def sitemap_urls(fetcher: HttpFetcher, site_url: str, max_sitemaps: int = 20) -> List[str]:
+    """Collect page URLs from a site's sitemap.xml, following sitemap indexes"""
+    parsed = urlparse(site_url)
+    pending = [f"{parsed.scheme}://{parsed.netloc}/sitemap.xml"]
+    seen = set()
+    urls = []
+    
+    while pending and len(seen) < max_sitemaps:
+        sitemap_url = pending.pop(0)
+        if sitemap_url in seen:
+            continue
+        seen.add(sitemap_url)
+        
         try:
-            response = requests.get(url)
-            response.raise_for_status()  # Raise an exception for HTTP errors
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Extract page title
-            title = soup.title.string if soup.title else url.split('/')[-1]
-            
-            # Extract page content - this is a simple approach
-            # In a real implementation, you'd want to target specific sections based on HTML structure
-            paragraphs = soup.find_all('p')
-            headings = soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
+            result = fetcher.fetch(sitemap_url)
+            root = ET.fromstring(result.text.encode('utf-8'))
+        except (requests.RequestException, ET.ParseError) as e:
+            print(f"Could not read sitemap {sitemap_url}: {e}")
+            continue
+        
+        # Sitemaps are namespaced; match on the local tag name only
+        for element in root.iter():
+            if element.tag.rsplit('}', 1)[-1] != 'loc' or not element.text:
+                continue
+            if root.tag.endswith('sitemapindex'):
+                pending.append(element.text.strip())
+            else:
+                urls.append(element.text.strip())
+    
+    return urls
+
+class ScrapedDataWriter:
+    """
+    Streams pages into the scraped_data.json object one at a time, so the crawl
+    never holds every page in memory. Writes go to a temporary file that replaces
+    the output only once the crawl finishes.
+    """
+    def __init__(self, output_file: str):
+        self.output_file = output_file
+        self.tmp_file = output_file + '.tmp'
+        self.count = 0
+        self._file = None
+    
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.output_file) or '.', exist_ok=True)
+        self._file = open(self.tmp_file, 'w')
+        self._file.write('{')
+        return self
+    
+    def write(self, page_name: str, page: Dict[str, Any]):
+        """Append one page to the output"""
+        body = json.dumps(page, indent=2).replace('\n', '\n  ')
+        self._file.write(f'{"," if self.count else ""}\n  {json.dumps(page_name)}: {body}')
+        self.count += 1
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            # Leave the previous output untouched if the crawl failed
+            self._file.close()
+            os.remove(self.tmp_file)
+            return False
+        
+        self._file.write('\n}' if self.count else '}')
+        self._file.close()
+        os.replace(self.tmp_file, self.output_file)
+        return False
+
+class SiteCrawler:
+    """
+    Bounded breadth-first crawler. Starts from seed URLs (plus the site's
+    sitemap.xml), follows same-domain links up to max_depth hops, stops after
+    max_pages pages, and skips pages whose SimHash is within
+    duplicate_distance bits of a page already kept. check_cancelled, if given,
+    is called before each page and stops the crawl by raising.
+    """
+    def __init__(self, seeds: List[str], fetcher: Optional[HttpFetcher] = None,
+                 max_pages: int = 200, max_depth: int = 3, use_sitemap: bool = True,
+                 duplicate_distance: int = 3, state: Optional[Dict[str, Dict[str, Any]]] = None,
+                 previous_data: Optional[Dict[str, Any]] = None,
+                 extractor: Optional[str] = None, html_dir: Optional[str] = None,
+                 check_cancelled: Optional[Callable[[], None]] = None):
+        self.fetcher = fetcher or HttpFetcher()
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.use_sitemap = use_sitemap
+        self.duplicate_distance = duplicate_distance
+        self.state = state if state is not None else {}
+        self.previous_data = previous_data or {}
+        self.extractor = get_extractor(extractor)
+        self.check_cancelled = check_cancelled or (lambda: None)
+        # Optionally keep the raw HTML of fetched pages, e.g. for extractor benchmarks
+        self.html_dir = html_dir
+        if html_dir:
+            os.makedirs(html_dir, exist_ok=True)
+        
+        self.seeds = [url for url in (normalize_url(seed) for seed in seeds) if url]
+        self.allowed_hosts: Set[str] = {urlparse(url).netloc for url in self.seeds}
+        
+        self.seen: Set[str] = set()
+        self.fingerprints: List[int] = []
+        self.stats = {"pages": 0, "unchanged": 0, "duplicates": 0, "errors": 0}
+    
+    def _is_duplicate(self, fingerprint: int) -> bool:
+        """Check whether a page is a near-duplicate of one already kept"""
+        return any(bin(fingerprint ^ other).count('1') <= self.duplicate_distance for other in self.fingerprints)
+    
+    def _enqueue(self, url: Optional[str], frontier: List[str]):
+        """Add a normalized same-site URL to the frontier if it has not been seen"""
+        if url and url not in self.seen and urlparse(url).netloc in self.allowed_hosts:
+            self.seen.add(url)
+            frontier.append(url)
+    
+    def crawl(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Yield (page_name, page_data) for each kept page as soon as it is scraped"""
+        frontier: List[str] = []
+        for url in self.seeds:
+            self._enqueue(url, frontier)
+        
+        if self.use_sitemap:
+            for host in sorted(self.allowed_hosts):
+                self.check_cancelled()
+                site = next(url for url in self.seeds if urlparse(url).netloc == host)
+                for url in sitemap_urls(self.fetcher, site):
+                    self._enqueue(normalize_url(url), frontier)
+        
+        depth = 0
+        next_frontier: List[str] = []
+        while depth <= self.max_depth and self.stats["pages"] < self.max_pages:
+            if not frontier:
+                if not next_frontier:
+                    break
+                frontier, next_frontier = next_frontier, []
+                depth += 1
+                continue
             
-            # Store data by URL/section for organization
-            page_name = url.split('/')[-1] if url.split('/')[-1] else "home"
-            all_data[page_name] = {
-                "title": title,
-                "url": url,
-                "headings": [h.get_text(strip=True) for h in headings if h.get_text(strip=True)],
-                "paragraphs": [p.get_text(strip=True) for p in paragraphs if p.get_text(strip=True)]
-            }
+            # Never fetch more of this level than the page budget can still use; the rest stays
+            # queued in case some of these pages turn out to be errors or duplicates
+            budget = self.max_pages - self.stats["pages"]
+            level, frontier = frontier[:budget], frontier[budget:]
             
-        except requests.RequestException as e:
-            print(f"Error scraping {url}: {e}")
+            for url, result, error in self.fetcher.fetch_all(level, self.state):
+                self.check_cancelled()
+                if self.stats["pages"] >= self.max_pages:
+                    break
+                
+                if error is not None:
+                    print(f"Error scraping {url}: {error}")
+                    self.stats["errors"] += 1
+                    continue
+                
+                page_name = page_name_for_url(url)
+                if result.not_modified and page_name in self.previous_data and "links" in self.state[url]:
+                    page = self.previous_data[page_name]
+                    links = self.state[url]["links"]
+                    self.stats["unchanged"] += 1
+                else:
+                    # One bad page (refetch failure, extractor error) must not end the whole crawl
+                    try:
+                        if result.not_modified:
+                            # We have validators but lost the page data; fetch it unconditionally
+                            result = self.fetcher.fetch(url)
+                        if 'html' not in result.content_type:
+                            continue
+                        if self.html_dir:
+                            html_file = os.path.join(self.html_dir, page_name.replace('/', '_').replace('?', '_') + '.html')
+                            with open(html_file, 'w', encoding='utf-8') as f:
+                                f.write(result.text)
+                        page, links = parse_page(url, result.text, self.extractor)
+                    except Exception as e:
+                        print(f"Error scraping {url}: {e}")
+                        self.stats["errors"] += 1
+                        continue
+                    # Resolve relative links against the final (post-redirect) URL
+                    links = sorted({link for link in (normalize_url(href, result.final_url) for href in links) if link})
+                    self.state[url] = {"etag": result.etag, "last_modified": result.last_modified, "links": links}
+                
+                if depth < self.max_depth:
+                    for link in links:
+                        self._enqueue(link, next_frontier)
+                
+                fingerprint = simhash(page_text(page))
+                if self._is_duplicate(fingerprint):
+                    print(f"Skipping near-duplicate {url}")
+                    self.stats["duplicates"] += 1
+                    continue
+                self.fingerprints.append(fingerprint)
+                
+                self.stats["pages"] += 1
+                print(f"Scraped {url} (depth {depth})")
+                yield page_name, page
+
+def scrape_able_website(urls: Optional[List[str]] = None,
+                        fetcher: Optional[HttpFetcher] = None,
+                        output_file: str = SCRAPED_DATA_FILE,
+                        state_file: str = CRAWL_STATE_FILE,
+                        max_pages: int = 200,
+                        max_depth: int = 3,
+                        use_sitemap: bool = True,
+                        extractor: Optional[str] = None,
+                        html_dir: Optional[str] = None,
+                        check_cancelled: Optional[Callable[[], None]] = None) -> Dict[str, int]:
+    """
+    Crawls the Able website for information about the company,
+    services, teams, industries, and locations.
     
-    # Ensure data directory exists
-    os.makedirs('data', exist_ok=True)
+    Starting from the seed URLs and sitemap.xml, same-domain links are followed
+    breadth-first within the page and depth budgets. Pages are fetched
+    concurrently and streamed to output_file as they finish. Pages that answer
+    a conditional request with 304 Not Modified keep the data from the previous
+    crawl. check_cancelled is called before each page; if it raises, the crawl
+    stops and the previous output and crawl state are left untouched. Returns
+    crawl statistics.
+    """
+    print("Starting to scrape Able's website...")
+    
+    own_fetcher = fetcher is None
+    fetcher = fetcher or HttpFetcher()
+    
+    # Validators, links and page data from the previous crawl
+    state = _load_json(state_file)
+    previous_data = _load_json(output_file)
+    
+    crawler = SiteCrawler(urls or DEFAULT_URLS, fetcher, max_pages=max_pages, max_depth=max_depth,
+                          use_sitemap=use_sitemap, state=state, previous_data=previous_data,
+                          extractor=extractor, html_dir=html_dir, check_cancelled=check_cancelled)
+    start_time = time.perf_counter()
+    
+    try:
+        with ScrapedDataWriter(output_file) as writer:
+            for page_name, page in crawler.crawl():
+                writer.write(page_name, page)
+    finally:
+        if own_fetcher:
+            fetcher.close()
+    
+    elapsed = time.perf_counter() - start_time
     
-    # Save raw scraped data
-    with open('data/scraped_data.json', 'w') as f:
-        json.dump(all_data, f, indent=2)
+    with open(state_file, 'w') as f:
+        json.dump(state, f, indent=2)
     
-    print(f"Scraping completed. Data saved to data/scraped_data.json")
-    return all_data
+    stats = crawler.stats
+    pages_per_sec = stats["pages"] / elapsed if elapsed > 0 else 0.0
+    print(f"Scraping completed: {stats['pages']} pages ({stats['unchanged']} unchanged, "
+          f"{stats['duplicates']} near-duplicates skipped, {stats['errors']} errors) in {elapsed:.2f}s, "
+          f"{pages_per_sec:.1f} pages/sec. Data saved to {output_file}")
+    return stats
 
 # Hard-coded data about Able in case scraping fails or for testing
 def get_fallback_data():
@@ -133,9 +535,9 @@ def get_fallback_data():
 if __name__ == "__main__":
     try:
         # Try web scraping first
-        scraped_data = scrape_able_website()
+        scrape_able_website()
     except Exception as e:
         print(f"Error during scraping: {e}")
         print("Using fallback data instead.")
         # Use fallback data if scraping fails
-        scraped_data = get_fallback_data()
+        get_fallback_data()
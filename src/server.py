@@ -0,0 +1,402 @@
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+from dotenv import load_dotenv
+from .chatbot import AbleSupportChatbot
+from .embeddings import VECTOR_STORE_DIR, SharedVectorStore, SimpleEmbeddings, vector_store_exists
+from .session_store import SessionStore, get_session_store
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Retrieval settings, matching the Streamlit app
+SEARCH_KWARGS = {"k": 3, "mmr": True, "min_score": 0.2}
+
+# Sessions hash onto this many locks, so turns within a session are serialized without a lock per session
+SESSION_LOCK_STRIPES = 256
+
+# Worker threads beyond max_concurrency, so /retrieve and /health are served while every chat slot is busy
+SPARE_WORKERS = 8
+
+# Largest number of results /retrieve returns
+MAX_RETRIEVE_K = 20
+
+# Requests larger than this are rejected before their body is read
+MAX_BODY_BYTES = 1 << 20
+
+STATUS_TEXT = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"
+}
+
+class HTTPError(Exception):
+    """An error that maps directly to an HTTP error response"""
+    def __init__(self, status: int, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+class Request:
+    """A parsed HTTP/1.1 request"""
+    def __init__(self, method: str, path: str, headers: Dict[str, str], body: bytes):
+        self.method = method
+        self.path = path
+        self.headers = headers
+        self.body = body
+
+    def json(self) -> Dict[str, Any]:
+        """Decode the body as a JSON object"""
+        try:
+            data = json.loads(self.body or b"{}")
+        except json.JSONDecodeError as e:
+            raise HTTPError(400, f"Invalid JSON body: {e}")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "Request body must be a JSON object")
+        return data
+
+    @property
+    def keep_alive(self) -> bool:
+        return self.headers.get("connection", "").lower() != "close"
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[Request]:
+    """Read one request from a connection, or return None when the client closed it"""
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError:
+        return None
+    except asyncio.LimitOverrunError:
+        raise HTTPError(413, "Request headers too large")
+
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, target, _ = lines[0].split(" ", 2)
+    except ValueError:
+        raise HTTPError(400, "Malformed request line")
+
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+
+    content_length = headers.get("content-length", "0") or "0"
+    if not content_length.isascii() or not content_length.isdigit():
+        raise HTTPError(400, f"Invalid Content-Length: {content_length!r}")
+    length = int(content_length)
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, f"Request body over {MAX_BODY_BYTES} bytes")
+    body = await reader.readexactly(length) if length else b""
+    return Request(method.upper(), urlsplit(target).path, headers, body)
+
+def _head(status: int, headers: Dict[str, str]) -> bytes:
+    """Serialize a status line and headers"""
+    lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, 'Unknown')}"]
+    lines.extend(f"{name}: {value}" for name, value in headers.items())
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+async def write_json(writer: asyncio.StreamWriter, status: int, payload: Dict[str, Any],
+                     keep_alive: bool = True, headers: Optional[Dict[str, str]] = None):
+    """Send a complete JSON response"""
+    body = json.dumps(payload).encode("utf-8")
+    all_headers = {
+        "Content-Type": "application/json",
+        "Content-Length": str(len(body)),
+        "Connection": "keep-alive" if keep_alive else "close"
+    }
+    all_headers.update(headers or {})
+    writer.write(_head(status, all_headers) + body)
+    await writer.drain()
+
+async def iterate_in_thread(make_iterator: Callable[[], Iterator[Any]], executor: ThreadPoolExecutor,
+                            max_buffered: int = 64) -> AsyncIterator[Any]:
+    """
+    Run a blocking iterator on a worker thread and yield its items as they are
+    produced. The hand-off queue is bounded, so a slow client stalls the worker
+    instead of buffering without limit; leaving early closes the iterator.
+    """
+    loop = asyncio.get_running_loop()
+    items: "asyncio.Queue" = asyncio.Queue(max_buffered)
+    done = object()
+    cancelled = threading.Event()
+
+    def put(item):
+        asyncio.run_coroutine_threadsafe(items.put(item), loop).result()
+
+    def produce():
+        iterator = make_iterator()
+        try:
+            for item in iterator:
+                if cancelled.is_set():
+                    break
+                put(item)
+        except Exception as e:
+            put(e)
+        finally:
+            close = getattr(iterator, "close", None)
+            if close:
+                close()
+            put(done)
+
+    worker = loop.run_in_executor(executor, produce)
+    try:
+        while True:
+            item = await items.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        cancelled.set()
+        # Drain so the producer is never left blocked on a full queue
+        while not worker.done():
+            try:
+                items.get_nowait()
+            except asyncio.QueueEmpty:
+                await asyncio.sleep(0.01)
+        await worker
+
+class ChatServer:
+    """
+    Asyncio HTTP API over AbleSupportChatbot and the shared vector store:
+
+    - POST /chat      {"session_id", "message", "stream"}  answer (or SSE token stream); a new
+                                                           session_id is issued when none is given
+    - POST /retrieve  {"query", "k"}                       matching chunks with scores
+    - GET  /health                                         store and load status
+
+    Blocking work (retrieval, the OpenAI call) runs on a pool of `workers`
+    threads, by default max_concurrency plus SPARE_WORKERS since a streamed
+    chat holds its thread until the answer is complete. At most max_concurrency
+    chats run at once; up to max_queue more wait for a slot and any beyond that
+    get 503 with Retry-After. Conversations live in the session store, and turns
+    within a session are serialized.
+    """
+    def __init__(self, shared_store: SharedVectorStore, workers: Optional[int] = None,
+                 max_concurrency: int = 32, max_queue: int = 128,
+                 use_response_cache: bool = True, session_store: Optional[SessionStore] = None):
+        self.shared_store = shared_store
+        self.retriever = shared_store.as_retriever(search_kwargs=SEARCH_KWARGS)
+        self.workers = workers or max_concurrency + SPARE_WORKERS
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="chat")
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.use_response_cache = use_response_cache
+        self.session_store = session_store or get_session_store()
+
+        self._session_locks: List[asyncio.Lock] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.waiting = 0
+        self.active = 0
+        self.rejected = 0
+        self.served = 0
+        self.started_at = time.time()
+
+    def get_chatbot(self, session_id: str) -> Tuple[AbleSupportChatbot, asyncio.Lock]:
+        """Return a chatbot for one turn of a session, and the lock serializing that session's turns"""
+        # Chatbots are cheap; the conversation itself is loaded from the session store
+        chatbot = AbleSupportChatbot(retriever=self.retriever, use_response_cache=self.use_response_cache,
+                                     session_store=self.session_store, session_id=session_id)
+        lock = self._session_locks[hash(session_id) % len(self._session_locks)]
+        return chatbot, lock
+
+    async def _acquire_slot(self, session_lock: asyncio.Lock):
+        """Wait for the session's turn and then a chat slot, shedding load once the wait queue is full"""
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise HTTPError(503, "Server busy, retry shortly", {"Retry-After": "1"})
+        self.waiting += 1
+        try:
+            # Lock the session first, so a turn queued behind its own session never sits on a slot
+            await session_lock.acquire()
+            try:
+                await self._slots.acquire()
+            except BaseException:
+                session_lock.release()
+                raise
+        finally:
+            self.waiting -= 1
+        self.active += 1
+
+    def _release_slot(self, session_lock: asyncio.Lock):
+        self.active -= 1
+        self._slots.release()
+        session_lock.release()
+
+    async def handle_chat(self, request: Request, writer: asyncio.StreamWriter):
+        data = request.json()
+        message = data.get("message")
+        if not isinstance(message, str) or not message.strip():
+            raise HTTPError(400, "'message' must be a non-empty string")
+        # Clients without a session id get a new conversation, and learn its id from the response
+        session_id = str(data.get("session_id") or uuid.uuid4().hex)
+        chatbot, session_lock = self.get_chatbot(session_id)
+
+        await self._acquire_slot(session_lock)
+        try:
+            if data.get("stream"):
+                await self._stream_chat(chatbot, message, session_id, writer, request.keep_alive)
+            else:
+                loop = asyncio.get_running_loop()
+                response = await loop.run_in_executor(self.executor, chatbot.get_response, message)
+                await write_json(writer, 200, {"session_id": session_id, "response": response},
+                                 request.keep_alive)
+            self.served += 1
+        finally:
+            self._release_slot(session_lock)
+
+    async def _stream_chat(self, chatbot: AbleSupportChatbot, message: str, session_id: str,
+                           writer: asyncio.StreamWriter, keep_alive: bool):
+        """Send the answer as server-sent events over a chunked response"""
+        writer.write(_head(200, {
+            "Content-Type": "text/event-stream",
+            "Cache-Control": "no-cache",
+            "Transfer-Encoding": "chunked",
+            "Connection": "keep-alive" if keep_alive else "close"
+        }))
+
+        def send(event: str):
+            data = event.encode("utf-8")
+            writer.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+
+        async for token in iterate_in_thread(lambda: chatbot.stream_response(message), self.executor):
+            send(f"data: {json.dumps({'session_id': session_id, 'token': token})}\n\n")
+            # Wait for the socket buffer to drain, so slow clients slow their own stream only
+            await writer.drain()
+        send("data: [DONE]\n\n")
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def handle_retrieve(self, request: Request, writer: asyncio.StreamWriter):
+        data = request.json()
+        query = data.get("query")
+        if not isinstance(query, str) or not query.strip():
+            raise HTTPError(400, "'query' must be a non-empty string")
+        k = data.get("k", SEARCH_KWARGS["k"])
+        if isinstance(k, bool) or not isinstance(k, int) or k < 1:
+            raise HTTPError(400, "'k' must be a positive integer")
+        search_kwargs = dict(SEARCH_KWARGS, k=min(k, MAX_RETRIEVE_K))
+
+        # Resolving the store may reload it from disk, so it runs on a worker thread too
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(
+            self.executor, lambda: self.shared_store.store.similarity_search_with_score(query, **search_kwargs)
+        )
+        await write_json(writer, 200, {
+            "documents": [{"content": doc["content"], "metadata": doc.get("metadata", {}), "score": score}
+                          for doc, score in results]
+        }, request.keep_alive)
+
+    def _store_status(self) -> Dict[str, Any]:
+        """Document count and generation of the current store; may reload it, so call it on a worker thread"""
+        store = self.shared_store.store
+        return {"documents": len(store.documents) - store.deleted_count, "generation": store.generation}
+
+    async def handle_health(self, request: Request, writer: asyncio.StreamWriter):
+        loop = asyncio.get_running_loop()
+        store_status = await loop.run_in_executor(self.executor, self._store_status)
+        await write_json(writer, 200, {
+            "status": "ok",
+            **store_status,
+            "sessions": self.session_store.stats(),
+            "active": self.active,
+            "waiting": self.waiting,
+            "served": self.served,
+            "rejected": self.rejected,
+            "uptime": round(time.time() - self.started_at, 1)
+        }, request.keep_alive)
+
+    ROUTES = {
+        ("POST", "/chat"): handle_chat,
+        ("POST", "/retrieve"): handle_retrieve,
+        ("GET", "/health"): handle_health
+    }
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve requests on one keep-alive connection until the client closes it"""
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except HTTPError as e:
+                    await write_json(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+
+                handler = self.ROUTES.get((request.method, request.path))
+                try:
+                    if handler is None:
+                        known_path = any(path == request.path for _, path in self.ROUTES)
+                        raise HTTPError(405 if known_path else 404, f"No route for {request.method} {request.path}")
+                    await handler(self, request, writer)
+                except HTTPError as e:
+                    await write_json(writer, e.status, {"error": str(e)}, request.keep_alive, e.headers)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    break
+                except Exception as e:
+                    print(f"Error handling {request.method} {request.path}: {e}")
+                    await write_json(writer, 500, {"error": "Internal server error"}, keep_alive=False)
+                    break
+
+                if not request.keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8000):
+        """Listen for connections until cancelled"""
+        # Created here so the semaphore belongs to the running event loop
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._session_locks = [asyncio.Lock() for _ in range(SESSION_LOCK_STRIPES)]
+        server = await asyncio.start_server(self.handle_connection, host, port, limit=64 * 1024)
+        print(f"Serving chatbot API on http://{host}:{port} "
+              f"({self.workers} workers, {self.max_concurrency} concurrent chats)")
+        async with server:
+            await server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the Able support chatbot over HTTP")
+    parser.add_argument("--host", default=os.getenv("CHATBOT_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("CHATBOT_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("CHATBOT_WORKERS", "0")) or None,
+                        help=f"threads for retrieval and OpenAI calls (default: max concurrency + {SPARE_WORKERS})")
+    parser.add_argument("--max-concurrency", type=int, default=int(os.getenv("CHATBOT_MAX_CONCURRENCY", "32")),
+                        help="chats processed at once")
+    parser.add_argument("--max-queue", type=int, default=int(os.getenv("CHATBOT_MAX_QUEUE", "128")),
+                        help="chats waiting for a slot before new ones are rejected with 503")
+    parser.add_argument("--vector-store", default=VECTOR_STORE_DIR)
+    parser.add_argument("--no-embedding-cache", action="store_true",
+                        help="do not read or write the on-disk embedding cache (e.g. against a mock API)")
+    parser.add_argument("--no-response-cache", action="store_true",
+                        help="always call the LLM instead of reusing answers to similar questions")
+    args = parser.parse_args()
+
+    # Let every chat slot stream from the API at once, unless the environment sets a lower limit
+    os.environ.setdefault("OPENAI_MAX_CONCURRENCY", str(args.max_concurrency))
+    embedding_function = SimpleEmbeddings(use_cache=not args.no_embedding_cache)
+    shared_store = SharedVectorStore(args.vector_store, embedding_function)
+    if not vector_store_exists(args.vector_store):
+        print(f"No vector store at {args.vector_store}; answers use no retrieved context until one is "
+              f"built with `python -m src.embeddings`")
+    server = ChatServer(shared_store, workers=args.workers, max_concurrency=args.max_concurrency,
+                        max_queue=args.max_queue, use_response_cache=not args.no_response_cache)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Keep in-memory conversations across restarts when there is a spill file
+        server.session_store.close()
+
+if __name__ == "__main__":
+    main()
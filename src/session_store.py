@@ -0,0 +1,213 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# Default on-disk spill tier; set CHATBOT_SESSION_SPILL="" to keep sessions in memory only
+SESSION_SPILL_FILE = "data/sessions.sqlite"
+
+# Seconds between sweeps of the spill tier for expired sessions
+SPILL_PURGE_INTERVAL = 60.0
+
+# Approximate bytes of bookkeeping per in-memory session (dict slot, key, tuple), on top of its data
+SESSION_ENTRY_OVERHEAD = 200
+
+class SessionStore:
+    """
+    Stores serialized conversations by session id. Recently used sessions live
+    in an in-memory LRU whose total size (data plus bookkeeping) never exceeds
+    max_bytes. Under memory pressure the least recently used sessions are spilled
+    to a SQLite file if spill_path is set, or dropped otherwise; a spilled session
+    moves back into memory on its next turn. Sessions idle for more than ttl
+    seconds are forgotten in both tiers.
+
+    The store only deals in bytes, so any object with the same get/put/delete
+    methods (e.g. one backed by Redis) can be passed to AbleSupportChatbot instead.
+    """
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl: float = 1800.0,
+                 spill_path: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.spill_path = spill_path
+
+        self.hits = 0
+        self.spill_hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.spills = 0
+
+        # session id -> (data, last used), least recently used first
+        self._sessions: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+        self._conn: Optional[sqlite3.Connection] = None
+        self._spilled = 0
+        self._purged_at = 0.0
+        if spill_path:
+            if os.path.dirname(spill_path):
+                os.makedirs(os.path.dirname(spill_path), exist_ok=True)
+            # Sessions are served from several threads, so share one guarded connection
+            self._conn = sqlite3.connect(spill_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "id TEXT PRIMARY KEY, data BLOB NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_used ON sessions (last_used)")
+            self._conn.commit()
+            self._purge_spilled(time.time())
+
+    @staticmethod
+    def _size(session_id: str, data: bytes) -> int:
+        return len(data) + len(session_id) + SESSION_ENTRY_OVERHEAD
+
+    def get(self, session_id: str) -> Optional[bytes]:
+        """Return a session's data, moving it back into memory if it was spilled"""
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                self._sessions[session_id] = (entry[0], now)
+                self._sessions.move_to_end(session_id)
+                self.hits += 1
+                return entry[0]
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT data, last_used FROM sessions WHERE id = ?", (session_id,)
+                ).fetchone()
+                if row is not None:
+                    # The memory tier owns the session again; the next spill writes a fresh copy
+                    self._conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+                    self._conn.commit()
+                    self._spilled -= 1
+                    if now - row[1] <= self.ttl:
+                        data = bytes(row[0])
+                        self._insert(session_id, data, now)
+                        self.spill_hits += 1
+                        return data
+                    self.expirations += 1
+
+            self.misses += 1
+            return None
+
+    def put(self, session_id: str, data: bytes):
+        """Store a session's data as its most recent version"""
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            self._insert(session_id, data, now)
+
+    def delete(self, session_id: str):
+        """Forget a session in both tiers"""
+        with self._lock:
+            self._remove(session_id)
+            if self._conn is not None:
+                deleted = self._conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,)).rowcount
+                self._conn.commit()
+                self._spilled -= deleted
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss/eviction counters and the size of each tier"""
+        with self._lock:
+            lookups = self.hits + self.spill_hits + self.misses
+            return {
+                "hits": self.hits,
+                "spill_hits": self.spill_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.spill_hits) / lookups if lookups else 0.0,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+                "spills": self.spills,
+                "sessions": len(self._sessions),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "spilled_sessions": self._spilled
+            }
+
+    def close(self):
+        """Spill every in-memory session (if there is a spill tier) and close the SQLite connection"""
+        with self._lock:
+            if self._conn is None:
+                return
+            self._spill(list(self._sessions.items()))
+            self._sessions.clear()
+            self.bytes = 0
+            self._conn.close()
+            self._conn = None
+
+    def _insert(self, session_id: str, data: bytes, now: float):
+        """Add or replace a session in memory, then enforce the memory cap; the caller must hold the lock"""
+        self._remove(session_id)
+        self._sessions[session_id] = (data, now)
+        self.bytes += self._size(session_id, data)
+
+        evicted = []
+        while self.bytes > self.max_bytes and self._sessions:
+            evicted_id, entry = self._sessions.popitem(last=False)
+            self.bytes -= self._size(evicted_id, entry[0])
+            evicted.append((evicted_id, entry))
+        if evicted:
+            self.evictions += len(evicted)
+            self._spill(evicted)
+
+    def _remove(self, session_id: str):
+        """Drop a session from memory; the caller must hold the lock"""
+        entry = self._sessions.pop(session_id, None)
+        if entry is not None:
+            self.bytes -= self._size(session_id, entry[0])
+
+    def _expire(self, now: float):
+        """Forget in-memory sessions idle past the ttl; the caller must hold the lock"""
+        # LRU order is also last-used order, so expired sessions are all at the front
+        while self._sessions:
+            session_id, (data, last_used) = next(iter(self._sessions.items()))
+            if now - last_used <= self.ttl:
+                break
+            self._sessions.popitem(last=False)
+            self.bytes -= self._size(session_id, data)
+            self.expirations += 1
+
+    def _spill(self, entries: List[Tuple[str, Tuple[bytes, float]]]):
+        """Write evicted sessions to the spill tier, if there is one; the caller must hold the lock"""
+        if self._conn is None or not entries:
+            return
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO sessions (id, data, last_used) VALUES (?, ?, ?)",
+            [(session_id, data, last_used) for session_id, (data, last_used) in entries]
+        )
+        self._conn.commit()
+        self.spills += len(entries)
+        self._spilled += len(entries)
+        now = time.time()
+        if now - self._purged_at >= SPILL_PURGE_INTERVAL:
+            self._purge_spilled(now)
+
+    def _purge_spilled(self, now: float):
+        """Delete spilled sessions idle past the ttl and recount the rest; the caller must hold the lock"""
+        expired = self._conn.execute("DELETE FROM sessions WHERE last_used < ?", (now - self.ttl,)).rowcount
+        self._conn.commit()
+        self.expirations += max(expired, 0)
+        self._spilled = self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        self._purged_at = now
+
+_shared_store: Optional[SessionStore] = None
+_shared_store_lock = threading.Lock()
+
+def get_session_store() -> SessionStore:
+    """Return the process-wide session store, configured from CHATBOT_SESSION_* environment variables"""
+    global _shared_store
+    with _shared_store_lock:
+        if _shared_store is None:
+            _shared_store = SessionStore(
+                max_bytes=int(os.getenv("CHATBOT_SESSION_MAX_BYTES", str(64 * 1024 * 1024))),
+                ttl=float(os.getenv("CHATBOT_SESSION_TTL", "1800")),
+                spill_path=os.getenv("CHATBOT_SESSION_SPILL", SESSION_SPILL_FILE) or None
+            )
+        return _shared_store
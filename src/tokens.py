@@ -0,0 +1,75 @@
+import re
+import threading
+from typing import List, Optional, Tuple
+
+# BPE encoding used by gpt-3.5-turbo and text-embedding-3-small
+ENCODING_NAME = "cl100k_base"
+
+# Word runs and single punctuation marks, roughly how BPE splits English text
+_PIECE = re.compile(r"\w+|[^\w\s]")
+
+# Characters per token the estimator assumes for word runs
+CHARS_PER_TOKEN = 4
+
+class EstimatingTokenizer:
+    """
+    Cheap token estimator used when no BPE tokenizer is available: every
+    punctuation mark is one token and words cost one token per ~4 characters.
+    """
+    name = "estimate"
+
+    def pieces(self, text: str) -> Tuple[List[int], List[int]]:
+        """Return (piece start offsets, cumulative token counts at each piece end)"""
+        starts = []
+        cumulative = []
+        total = 0
+        for match in _PIECE.finditer(text):
+            # Split word runs into one-token pieces like BPE would, so a long run
+            # (a URL, CJK text without spaces) can still be cut to fit a chunk
+            for start in range(match.start(), match.end(), CHARS_PER_TOKEN):
+                starts.append(start)
+                total += 1
+                cumulative.append(total)
+        return starts, cumulative
+
+    def count(self, text: str) -> int:
+        """Estimate the number of tokens in text"""
+        return sum((len(piece) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN for piece in _PIECE.findall(text))
+
+class TiktokenTokenizer:
+    """Exact BPE token counts with the local tiktoken tokenizer"""
+    name = "tiktoken"
+
+    def __init__(self, encoding_name: str = ENCODING_NAME):
+        import tiktoken
+        self.encoding = tiktoken.get_encoding(encoding_name)
+
+    def pieces(self, text: str) -> Tuple[List[int], List[int]]:
+        """Return (token start offsets, cumulative token counts at each token end)"""
+        tokens = self.encoding.encode(text, disallowed_special=())
+        _, starts = self.encoding.decode_with_offsets(tokens)
+        return starts, list(range(1, len(starts) + 1))
+
+    def count(self, text: str) -> int:
+        """Count the tokens in text"""
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+_default_tokenizer = None
+_default_tokenizer_lock = threading.Lock()
+
+def get_tokenizer():
+    """Return the shared tokenizer: tiktoken when it can be loaded, else the estimator"""
+    global _default_tokenizer
+    with _default_tokenizer_lock:
+        if _default_tokenizer is None:
+            try:
+                _default_tokenizer = TiktokenTokenizer()
+            except Exception as e:
+                # tiktoken downloads its encoding on first use, which fails offline
+                print(f"Using estimated token counts ({type(e).__name__}: tiktoken unavailable)")
+                _default_tokenizer = EstimatingTokenizer()
+        return _default_tokenizer
+
+def count_tokens(text: str, tokenizer: Optional[object] = None) -> int:
+    """Count (or estimate) the tokens in text"""
+    return (tokenizer or get_tokenizer()).count(text)
@@ -0,0 +1,69 @@
+import json
+import random
+
+import pytest
+
+from src import data_processor
+from src.data_processor import iter_json_object
+
+DOCUMENTS = [
+    {},
+    {"a": 36559.071, "b": 2},
+    {"a": 1e10},
+    {"a": -1.5e-7, "b": 0, "c": -0.0, "d": 12345678901234567890},
+    {"a": True, "b": False, "c": None, "d": "x", "e": 1E+5},
+    {"page": {"url": "https://example.com/", "headings": ["A", "B"], "scores": [1.25, 3e4, -7]}},
+    {"quoted \"key\"": "value with , : { } [ ] and \\u00e9", "n": 7},
+]
+
+def random_value(rng: random.Random, depth: int = 0):
+    kind = rng.randrange(7 if depth < 3 else 5)
+    if kind == 0:
+        return rng.randint(-10 ** 6, 10 ** 6)
+    if kind == 1:
+        return rng.uniform(-1e6, 1e6) * 10 ** rng.randint(-12, 12)
+    if kind == 2:
+        return rng.choice([True, False, None])
+    if kind == 3:
+        return "".join(rng.choice("ab c,:{}[]\"\\é1.e") for _ in range(rng.randint(0, 12)))
+    if kind == 4:
+        return rng.randint(0, 9)
+    if kind == 5:
+        return [random_value(rng, depth + 1) for _ in range(rng.randint(0, 4))]
+    return {f"k{i}": random_value(rng, depth + 1) for i in range(rng.randint(0, 4))}
+
+def random_documents(count: int):
+    rng = random.Random(0)
+    return [{f"key{i}": random_value(rng) for i in range(rng.randint(1, 6))} for _ in range(count)]
+
+@pytest.mark.parametrize("read_size", range(1, 17))
+def test_iter_json_object_matches_json_load_at_every_read_size(tmp_path, monkeypatch, read_size):
+    monkeypatch.setattr(data_processor, "READ_SIZE", read_size)
+    path = tmp_path / "data.json"
+    for document in DOCUMENTS + random_documents(40):
+        for text in (json.dumps(document), json.dumps(document, indent=2)):
+            path.write_text(text)
+            assert dict(iter_json_object(str(path))) == json.loads(text)
+
+def test_iter_json_object_rejects_truncated_numbers(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_processor, "READ_SIZE", 2)
+    path = tmp_path / "data.json"
+    path.write_text('{"a": 36559.')
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_object(str(path)))
+
+def test_processed_data_records_its_tokenizer(tmp_path):
+    source = tmp_path / "scraped.json"
+    source.write_text(json.dumps({"https://example.com/": {"title": "Example", "paragraphs": ["Some text."] * 50}}))
+    output = str(tmp_path / "processed.jsonl")
+
+    count = data_processor.process_scraped_data(str(source), str(source), output)
+    metadata = data_processor.read_processed_metadata(output)
+    assert metadata["tokenizer"] == data_processor.get_tokenizer().name
+    assert metadata["count"] == count > 0
+    assert data_processor.processed_data_is_current(output)
+
+    class OtherTokenizer:
+        name = "other"
+    assert not data_processor.processed_data_is_current(output, OtherTokenizer())
+    assert not data_processor.processed_data_is_current(str(tmp_path / "missing.jsonl"))
@@ -0,0 +1,31 @@
+import numpy as np
+
+from src.embedding_cache import EmbeddingCache
+
+def test_hot_tier_keeps_float32_arrays(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+    embedding = np.random.rand(1536).tolist()
+    cache.put("model", "text", embedding)
+
+    vector = cache.get("model", "text")
+    assert isinstance(vector, np.ndarray) and vector.dtype == np.float32
+    assert not vector.flags.writeable
+    assert np.allclose(vector, embedding)
+
+    reopened = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+    assert np.array_equal(reopened.get("model", "text"), vector)
+
+def test_hot_hits_refresh_disk_recency(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"), max_entries=2)
+    cache.put("model", "old", [1.0, 0.0])
+    cache.put("model", "new", [0.0, 1.0])
+    cache._conn.execute("UPDATE embeddings SET last_used = 0 WHERE key = ?", (cache.make_key("model", "old"),))
+    cache._conn.execute("UPDATE embeddings SET last_used = 1 WHERE key = ?", (cache.make_key("model", "new"),))
+
+    # Served from the hot tier only; the disk row must still count as recently used
+    assert cache.get("model", "old") is not None
+    cache.put("model", "third", [1.0, 1.0])
+
+    fresh = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+    assert fresh.get("model", "old") is not None
+    assert fresh.get("model", "new") is None
@@ -0,0 +1,69 @@
+import hashlib
+
+import numpy as np
+
+from src.embeddings import EmbeddingError, SimpleVectorStore
+
+DOCUMENTS = [
+    {"content": f"document {i} about topic{i % 7} careers",
+     "metadata": {"source": f"https://example.com/{i}", "section": "about", "type": "paragraph", "index": i}}
+    for i in range(250)
+]
+
+class FakeEmbeddings:
+    """Deterministic embeddings; every call fails while down is set"""
+    def __init__(self, down: bool = False):
+        self.down = down
+        self.calls = 0
+
+    def _vector(self, text: str):
+        seed = int(hashlib.md5(text.encode("utf-8")).hexdigest()[:8], 16)
+        return np.random.default_rng(seed).standard_normal(16).tolist()
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        if self.down:
+            raise EmbeddingError("embeddings API unavailable")
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+def test_failed_embedding_degrades_to_lexical_search(tmp_path):
+    embeddings = FakeEmbeddings(down=True)
+    store = SimpleVectorStore(embeddings)
+    store.persist_path = str(tmp_path)
+
+    stats = store.sync_documents(iter(DOCUMENTS), batch_size=100)
+    assert stats["unembedded"] == len(DOCUMENTS)
+    # The API is not hammered once per batch after it failed
+    assert embeddings.calls == 1
+
+    loaded = SimpleVectorStore.load(str(tmp_path), embeddings)
+    results = loaded.similarity_search_with_score("topic3 careers", k=3)
+    assert results and all("topic3" in doc["content"] for doc, _ in results)
+    assert loaded.similarity_search_batch(["topic3", "topic4"], k=2)[1]
+
+def test_next_sync_embeds_rows_left_unembedded(tmp_path):
+    store = SimpleVectorStore(FakeEmbeddings(down=True))
+    store.persist_path = str(tmp_path)
+    store.sync_documents(iter(DOCUMENTS))
+
+    loaded = SimpleVectorStore.load(str(tmp_path), FakeEmbeddings())
+    stats = loaded.sync_documents(iter(DOCUMENTS))
+    assert stats["unembedded"] == 0 and stats["changed"] == len(DOCUMENTS)
+    loaded.compact()
+    assert loaded.embeddings.shape == (len(DOCUMENTS), 16)
+    assert loaded.embeddings.any(axis=1).all()
+
+def test_partial_failure_keeps_embedded_batches(tmp_path):
+    embeddings = FakeEmbeddings()
+    store = SimpleVectorStore(embeddings)
+    store.persist_path = str(tmp_path)
+    store.sync_documents(iter(DOCUMENTS[:100]))
+
+    embeddings.down = True
+    stats = store.sync_documents(iter(DOCUMENTS))
+    assert stats["unembedded"] == 150
+    assert store.embeddings.shape == (len(DOCUMENTS), 16)
+    assert store.embeddings.any(axis=1).sum() == 100
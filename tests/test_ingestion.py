@@ -0,0 +1,102 @@
+import json
+import os
+import threading
+import time
+
+from src.data_processor import JsonLinesWriter, iter_processed_data, read_processed_metadata
+from src.embeddings import SharedVectorStore, SimpleVectorStore, vector_store_exists
+from src.ingestion import IngestionWorker
+from src.tokens import get_tokenizer
+
+CHUNKS = [
+    {"content": f"chunk {i} about careers at Able",
+     "metadata": {"source": "https://example.com/", "section": "about", "type": "paragraph", "index": i}}
+    for i in range(20)
+]
+
+class FakeEmbeddings:
+    def embed_documents(self, texts):
+        return [[1.0, float(len(text)), float(i % 3)] for i, text in enumerate(texts)]
+
+    def embed_query(self, text):
+        return [1.0, float(len(text)), 0.0]
+
+def run(worker, source="processed"):
+    job = worker.submit(source)
+    while not job.done:
+        time.sleep(0.01)
+    return job
+
+def test_swaps_never_leave_the_store_missing(tmp_path):
+    store_path = str(tmp_path / "vector_store")
+    processed = str(tmp_path / "processed.jsonl")
+    with JsonLinesWriter(processed, {"tokenizer": get_tokenizer().name}) as writer:
+        for chunk in CHUNKS:
+            writer.write(chunk)
+
+    # Start from an unversioned store, as written by earlier releases
+    legacy = SimpleVectorStore(FakeEmbeddings())
+    legacy.persist_path = store_path
+    legacy.sync_documents(CHUNKS[:5])
+    shared = SharedVectorStore(store_path, FakeEmbeddings(), check_interval=0)
+
+    missing = []
+    stop = threading.Event()
+    def watch():
+        while not stop.is_set():
+            if not vector_store_exists(store_path, str(tmp_path / "none.pkl")):
+                missing.append(time.time())
+    watcher = threading.Thread(target=watch)
+    watcher.start()
+
+    worker = IngestionWorker(store_path, processed, on_swap=shared.reload, embedding_function=FakeEmbeddings())
+    try:
+        for _ in range(3):
+            assert run(worker).status == "succeeded"
+    finally:
+        stop.set()
+        watcher.join()
+        worker.shutdown()
+
+    assert not missing
+    assert len(shared.store.documents) == len(CHUNKS)
+    # Only the pointer, the live version and the one before it are left
+    entries = os.listdir(store_path)
+    assert "CURRENT" in entries and len(entries) == 3
+    assert open(os.path.join(store_path, "CURRENT")).read().strip() in entries
+
+def test_chunks_are_embedded_while_processing_and_published_at_the_swap(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("data")
+    pages = {f"page{i}": {"url": f"https://example.com/{i}",
+                          "paragraphs": [f"Paragraph {i}.{j} " * 30 for j in range(5)]}
+             for i in range(100)}
+    with open("data/scraped_data.json", "w") as f:
+        json.dump(pages, f)
+    with open("data/processed.jsonl", "w") as f:
+        f.write(json.dumps(CHUNKS[0]) + "\n")
+
+    class CancellingEmbeddings(FakeEmbeddings):
+        def embed_documents(self, texts):
+            # The live processed data must not change while the job runs
+            assert open("data/processed.jsonl").read() == json.dumps(CHUNKS[0]) + "\n"
+            job.cancel()
+            return super().embed_documents(texts)
+
+    worker = IngestionWorker("data/vector_store", "data/processed.jsonl", embedding_function=CancellingEmbeddings())
+    try:
+        job = worker.submit("processed")
+        while not job.done:
+            time.sleep(0.01)
+        assert job.status == "cancelled"
+        assert sorted(os.listdir("data")) == ["processed.jsonl", "scraped_data.json"]
+
+        worker.embedding_function = FakeEmbeddings()
+        job = run(worker)
+        assert job.status == "succeeded"
+    finally:
+        worker.shutdown()
+
+    store = SimpleVectorStore.load("data/vector_store", FakeEmbeddings())
+    assert len(list(iter_processed_data("data/processed.jsonl"))) == len(store.documents) == 500
+    assert read_processed_metadata("data/processed.jsonl")["tokenizer"] == get_tokenizer().name
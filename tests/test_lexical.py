@@ -0,0 +1,54 @@
+import itertools
+import json
+import os
+
+import pytest
+
+from src import lexical
+from src.lexical import STOPWORDS, BM25Index, LocalAnswerEngine, content_terms, get_local_engine, tokenize
+
+STOPWORD_TEXTS = """
+a an and are as at be by can do does for from has have how i in is it its me my of on or our
+tell that the their there this to was we what when where which who why will with you your
+""".split()
+
+DOCUMENTS = [
+    {"content": "We've tested hundreds of AI tools. This does what it says: it is how we work.", "metadata": {}},
+    {"content": "Is this what you were looking for? Does it have what they need?", "metadata": {}},
+    {"content": "Able builds digital products for startups and established brands.", "metadata": {}},
+]
+
+def test_every_stopword_is_dropped_after_stemming():
+    assert content_terms(tokenize(" ".join(STOPWORD_TEXTS))) == []
+
+@pytest.mark.parametrize("query", [
+    "What is this?", "this does", "Does it?", "What was that?", "Who has it?", "Is there?",
+    " ".join(STOPWORD_TEXTS)
+] + [" ".join(pair) for pair in itertools.combinations(["what", "is", "this", "does", "has", "was", "its"], 2)])
+def test_stopword_only_queries_never_match(query):
+    engine = LocalAnswerEngine(documents=DOCUMENTS)
+    assert engine.match(query) is None
+
+def test_bm25_ignores_stopwords():
+    index = BM25Index()
+    for doc in DOCUMENTS:
+        index.add(doc["content"])
+    assert index.search("what does this do", k=3) == []
+    assert not any(word in index.postings for word in STOPWORDS)
+    assert index.search("digital products", k=1)[0][0] == 2
+
+def test_shared_engine_follows_new_processed_data(tmp_path, monkeypatch):
+    processed = tmp_path / "processed.jsonl"
+    monkeypatch.setattr(lexical, "PROCESSED_DATA_FILE", str(processed))
+    monkeypatch.setattr(lexical, "ENGINE_CHECK_INTERVAL", 0.0)
+    monkeypatch.setattr(lexical, "_shared_engine", None)
+
+    assert get_local_engine().documents == []
+    engine = get_local_engine()
+    assert get_local_engine() is engine
+
+    # Ingestion replaces the file as a whole
+    staged = tmp_path / "processed.jsonl.staging"
+    staged.write_text("".join(json.dumps(doc) + "\n" for doc in DOCUMENTS))
+    os.replace(staged, processed)
+    assert get_local_engine().match("digital products for startups").source == "chunk"
@@ -0,0 +1,51 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.scraper import scrape_able_website
+
+class SiteHandler(BaseHTTPRequestHandler):
+    """An endless site: every page links to ten new ones"""
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        page = self.path.strip("/") or "0"
+        links = "".join(f'<a href="/{page}{i}">next</a>' for i in range(10))
+        body = f"<html><body><h1>Page {page}</h1><p>Text of page {page}.</p>{links}</body></html>".encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class Cancelled(Exception):
+    pass
+
+@pytest.fixture
+def site():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SiteHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+
+def test_crawl_checks_cancellation_per_page(site, tmp_path):
+    output_file = tmp_path / "scraped.json"
+    output_file.write_text('{"previous": {"paragraphs": ["Previous crawl"]}}')
+    state_file = tmp_path / "state.json"
+    checks = []
+
+    def check_cancelled():
+        checks.append(1)
+        if len(checks) > 5:
+            raise Cancelled()
+
+    with pytest.raises(Cancelled):
+        scrape_able_website([site], output_file=str(output_file), state_file=str(state_file),
+                            max_pages=100, use_sitemap=False, check_cancelled=check_cancelled)
+
+    assert len(checks) == 6
+    # A cancelled crawl leaves the previous output and crawl state alone
+    assert output_file.read_text() == '{"previous": {"paragraphs": ["Previous crawl"]}}'
+    assert not state_file.exists()